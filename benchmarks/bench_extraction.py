@@ -0,0 +1,54 @@
+"""Compare per-page CPU time of the fast and the full extraction paths.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_extraction
+"""
+import json
+import time
+
+from price_tracker.shops.generic import GenericShop
+
+FILLER = ''.join(
+    f'<div class="tile" id="t{i}"><a href="/p/{i}"><img src="/i/{i}.jpg">'
+    f'<span class="name">Item {i}</span><span class="old">{i},99 zł</span>'
+    f'</a></div>' for i in range(3000))
+SCRIPT = '<script>var state = ' + json.dumps(
+    {'items': list(range(20000))}) + ';</script>'
+
+PAGES = {
+    'selector': ('span.price',
+                 f'<html><body>{FILLER}<span class="price">1 299,00 zł</span>'
+                 f'{SCRIPT}</body></html>'),
+    'data-attribute': ('div.p',
+                       f'<html><body>{FILLER}<div class="p" '
+                       f'data-product-gtm=\'{{"current_price": "349,90"}}\'>'
+                       f'</div>{SCRIPT}</body></html>'),
+    'json-ld': ('span.price',
+                '<html><head><script type="application/ld+json">'
+                '{"offers": {"price": 49.99}}</script></head>'
+                f'<body>{FILLER}{SCRIPT}</body></html>'),
+}
+
+
+def cpu_per_page(func, html: str, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        func(html)
+    return (time.process_time() - start) / repeat
+
+
+def main(repeat: int = 5) -> None:
+    print(f'{"page":<16}{"size":>10}{"full [ms]":>12}{"fast [ms]":>12}'
+          f'{"speedup":>10}')
+    for name, (selector, html) in PAGES.items():
+        shop = GenericShop(selector)
+        assert shop.extract_price(html) == shop.extract_price_full(html)
+        full = cpu_per_page(shop.extract_price_full, html, repeat)
+        fast = cpu_per_page(shop.extract_price, html, repeat)
+        print(f'{name:<16}{len(html):>10}{full * 1000:>12.2f}'
+              f'{fast * 1000:>12.2f}{full / fast:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
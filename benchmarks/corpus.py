@@ -0,0 +1,70 @@
+"""Synthetic product pages used by the benchmarks."""
+import json
+import random
+from typing import Dict, Tuple
+
+KINDS = ('selector', 'data-attribute', 'json-ld', 'large')
+
+# selector configured for each kind of page
+SELECTORS: Dict[str, str] = {
+    'selector': 'span.price',
+    'data-attribute': 'div.product-box',
+    'json-ld': 'span.price',
+    'large': 'div#product-price',
+}
+
+
+def _format(price: float, rng: random.Random) -> str:
+    whole, cents = f'{price:.2f}'.split('.')
+    if len(whole) > 3 and rng.random() < 0.5:
+        whole = f'{whole[:-3]}\xa0{whole[-3:]}'
+    return rng.choice([f'{whole},{cents} zł', f'{whole},{cents} PLN',
+                       f'{whole}.{cents} €', f'${whole}.{cents}'])
+
+
+def _listing(rng: random.Random, tiles: int) -> str:
+    return ''.join(
+        f'<li class="tile"><a href="/p/{i}"><img src="/img/{i}.webp" '
+        f'alt="Item {i}"><span class="name">Item {i}</span>'
+        f'<span class="old-price">{rng.randint(10, 999)},99 zł</span>'
+        f'</a></li>' for i in range(tiles))
+
+
+def make_page(kind: str, index: int) -> Tuple[str, float]:
+    """Return the HTML of page ``index`` of ``kind`` and its price."""
+    rng = random.Random(f'{kind}-{index}')
+    price = round(rng.uniform(5, 5000), 2)
+    text = _format(price, rng)
+    head = (f'<head><meta charset="utf-8"><title>Product {index}</title>'
+            f'<link rel="stylesheet" href="/s.css"></head>')
+    nav = '<nav><ul>' + ''.join(
+        f'<li><a href="/c/{i}">Category {i}</a></li>' for i in range(40)
+    ) + '</ul></nav>'
+    if kind == 'selector':
+        body = (f'{nav}<main><h1>Product {index}</h1>'
+                f'<div class="buy"><span class="price">{text}</span></div>'
+                f'<ul class="related">{_listing(rng, 20)}</ul></main>')
+    elif kind == 'data-attribute':
+        gtm = json.dumps({'id': index, 'current_price': f'{price:.2f}'})
+        # the box has no text of its own, so the attribute is what is read
+        body = (f'{nav}<main><h1>Product {index}</h1><div class="product-box" '
+                f"data-product-gtm='{gtm}'></div>"
+                f'<ul class="related">{_listing(rng, 20)}</ul></main>')
+    elif kind == 'json-ld':
+        ld = json.dumps({'@context': 'https://schema.org', '@type': 'Product',
+                         'name': f'Product {index}',
+                         'offers': {'@type': 'Offer', 'price': price,
+                                    'priceCurrency': 'PLN'}})
+        head = head.replace('</head>', '<script type="application/ld+json">'
+                                       f'{ld}</script></head>')
+        body = (f'{nav}<main><h1>Product {index}</h1>'
+                f'<ul class="related">{_listing(rng, 20)}</ul></main>')
+    elif kind == 'large':
+        state = json.dumps({'items': [rng.random() for _ in range(20000)]})
+        body = (f'{nav}<main><h1>Product {index}</h1>'
+                f'<ul class="related">{_listing(rng, 1500)}</ul>'
+                f'<div id="product-price">{text}</div></main>'
+                f'<script>window.__STATE__ = {state};</script>')
+    else:
+        raise ValueError(f'Unknown page kind {kind}')
+    return f'<!doctype html><html>{head}<body>{body}</body></html>', price
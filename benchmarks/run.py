@@ -0,0 +1,201 @@
+"""Offline benchmark suite.
+
+Run from the repository root::
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --sizes 1000 --compare results.json
+
+Results are written as JSON (one record per benchmark with the median time
+in seconds). With ``--compare`` every benchmark slower than the previous
+run by more than ``--threshold`` is reported and the exit status is 1.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from price_tracker.pricing import parse_prices
+from price_tracker.products import Product, ProductStore
+from price_tracker.shops.generic import GenericShop, parse_price
+from price_tracker.tracker import PriceTracker
+
+from .corpus import KINDS, SELECTORS, make_page
+from .stub_server import StubShop
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def measure(func: Callable[[], None], repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'median': statistics.median(times), 'min': min(times),
+            'repeat': repeat}
+
+
+def bench_parse_price(results: List[dict], repeat: int) -> None:
+    texts = ['29,99 zł', '1 234,56 zł', '1.234,56 zł', '1 234.56$',
+             '\xa0999,00\xa0PLN', '€12.50'] * 1000
+
+    def run() -> None:
+        for text in texts:
+            parse_price(text)
+
+    results.append({'name': 'parse_price', 'items': len(texts),
+                    **measure(run, repeat)})
+    results.append({'name': 'parse_prices', 'items': len(texts),
+                    **measure(lambda: parse_prices(texts), repeat)})
+
+
+def _check(kind: str, price: float, expected: float) -> None:
+    """Refuse to time an extraction that returns the wrong price."""
+    if price != expected:
+        raise AssertionError(f'{kind}: extracted {price}, expected {expected}')
+
+
+def bench_extract(results: List[dict], repeat: int) -> None:
+    for kind in KINDS:
+        html, expected = make_page(kind, 0)
+        shop = GenericShop(SELECTORS[kind])
+        _check(kind, shop.extract_price(html), expected)
+        results.append({'name': f'extract_price[{kind}]', 'bytes': len(html),
+                        **measure(lambda: shop.extract_price(html), repeat)})
+
+
+def bench_get_price(results: List[dict], repeat: int, stub: StubShop) -> None:
+    for kind in KINDS:
+        shop = GenericShop(SELECTORS[kind])
+        url = stub.url(kind, 1)
+        _check(kind, shop.get_price(url), make_page(kind, 1)[1])
+        results.append({'name': f'get_price[{kind}]',
+                        **measure(lambda: shop.get_price(url), repeat)})
+
+
+def _products(count: int, stub: StubShop) -> List[Product]:
+    products = []
+    for i in range(count):
+        kind = KINDS[i % 3]  # large pages are benchmarked separately
+        products.append(Product(name=f'Product {i}', url=stub.url(kind, i),
+                                shop=kind, selector=SELECTORS[kind],
+                                price_history=[100.0] * 24,
+                                last_price=100.0))
+    return products
+
+
+def bench_store(results: List[dict], sizes: List[int], repeat: int,
+                stub: StubShop, workdir: Path) -> None:
+    for size in sizes:
+        path = workdir / f'store-{size}.json'
+        store = ProductStore(path)
+        store.products = _products(size, stub)
+        results.append({'name': f'ProductStore.save[{size}]',
+                        **measure(store.save, repeat)})
+        results.append({'name': f'ProductStore.load[{size}]',
+                        **measure(lambda: ProductStore(path), repeat)})
+
+
+def bench_check_prices(results: List[dict], sizes: List[int],
+                       stub: StubShop, workdir: Path, workers: int,
+                       processes: int) -> None:
+    for size in sizes:
+        path = workdir / f'tracker-{size}.json'
+        store = ProductStore(path)
+        store.products = _products(size, stub)
+        store.save()
+        tracker = PriceTracker(str(path), shops_path=str(workdir / 'shops.json'),
+                               smtp_path=str(workdir / 'smtp.json'),
+                               workers=workers, per_host=workers,
+                               processes=processes)
+        with open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(devnull):
+            timing = measure(tracker.check_prices, 1)
+        tracker.close()
+        results.append({'name': f'check_prices[{size}]', 'items': size,
+                        'workers': workers, 'processes': processes,
+                        **timing})
+
+
+def compare(results: List[dict], previous_path: Path,
+            threshold: float) -> List[str]:
+    previous = {r['name']: r for r in
+                json.loads(previous_path.read_text())['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(result['name'])
+        if old and result['median'] > old['median'] * (1 + threshold):
+            regressions.append(
+                f"{result['name']}: {old['median']:.4f}s -> "
+                f"{result['median']:.4f}s")
+    return regressions
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='catalogue sizes, comma separated')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='stub server delay per request in seconds')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--processes', type=int, default=0,
+                        help='worker processes for check_prices (0 = threads)')
+    parser.add_argument('--output', type=Path)
+    parser.add_argument('--compare', type=Path,
+                        help='previous results to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+
+    results: List[dict] = []
+    with StubShop(args.latency) as stub, \
+            tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        bench_parse_price(results, args.repeat)
+        bench_extract(results, args.repeat)
+        bench_get_price(results, args.repeat, stub)
+        bench_store(results, sizes, args.repeat, stub, workdir)
+        bench_check_prices(results, sizes, stub, workdir, args.workers,
+                           args.processes)
+
+    for result in results:
+        print(f"{result['name']:<40}{result['median'] * 1000:>12.2f} ms")
+
+    report = {
+        'timestamp': time.time(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'latency': args.latency,
+        'results': results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Cold start benchmark of the web interface.
+
+Run from the repository root::
+
+    python -m benchmarks.startup --products 100000
+
+A store with ``--products`` products is written to a temporary directory
+and ``web.create_app()`` is started in a fresh interpreter. The time until
+the first HTTP response and until the index lists the products is
+reported; the exit status is 1 when the first response takes longer than
+``--limit`` seconds.
+"""
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import List
+
+from price_tracker.products import Product, ProductStore
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVER = '''
+import sys
+sys.path.insert(0, {root!r})
+import web
+web.create_app({store!r}, {shops!r}, {smtp!r}).run(port={port})
+'''
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _write_store(path: Path, count: int) -> None:
+    store = ProductStore(path)
+    store.products = [
+        Product(name=f'Product {i}', url=f'http://shop{i % 50}.example/{i}',
+                shop='shop', selector='span.price',
+                price_history=[100.0] * 24, last_price=100.0)
+        for i in range(count)]
+    store.save()
+
+
+def _wait_for(url: str, ready, timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                if ready(response.read()):
+                    return time.perf_counter()
+        except OSError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(url)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--limit', type=float, default=1.0,
+                        help='maximum seconds until the first response')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        _write_store(workdir / 'products.json', args.products)
+        (workdir / 'shops.json').write_text(
+            json.dumps({'shops': {'shop': 'span.price'}}))
+        port = _free_port()
+        code = SERVER.format(root=str(ROOT),
+                             store=str(workdir / 'products.json'),
+                             shops=str(workdir / 'shops.json'),
+                             smtp=str(workdir / 'smtp.json'), port=port)
+        url = f'http://127.0.0.1:{port}/'
+        start = time.perf_counter()
+        server = subprocess.Popen([sys.executable, '-c', code], cwd=tmp,
+                                  stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL)
+        try:
+            first = _wait_for(url, lambda body: True, args.timeout) - start
+            loaded = _wait_for(url, lambda body: b'Loading products' not in body,
+                               args.timeout) - start
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f'products          {args.products}')
+    print(f'first response    {first * 1000:10.1f} ms')
+    print(f'products listed   {loaded * 1000:10.1f} ms')
+    return 1 if first > args.limit else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Local HTTP server serving the synthetic benchmark corpus."""
+import socket
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+from .corpus import make_page
+
+
+@lru_cache(maxsize=4096)
+def _page(kind: str, index: int) -> bytes:
+    return make_page(kind, index)[0].encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self) -> None:
+        super().setup()
+        # headers and body are written separately; avoid delayed-ACK stalls
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self) -> None:
+        # paths look like /<kind>/<index>
+        try:
+            _, kind, index = self.path.split('/')
+            body = _page(kind, int(index) % 1000)
+        except ValueError:
+            self.send_error(404)
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class StubShop:
+    """Serve the corpus on ``127.0.0.1`` with an optional per-request delay.
+
+    Use as a context manager; ``url(kind, index)`` returns page addresses.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self._server: ThreadingHTTPServer | None = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address
+
+    def url(self, kind: str, index: int) -> str:
+        host, port = self.address
+        return f'http://{host}:{port}/{kind}/{index}'
+
+    def __enter__(self) -> 'StubShop':
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.latency = self.latency
+        threading.Thread(target=self._server.serve_forever,
+                         daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
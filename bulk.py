@@ -0,0 +1,55 @@
+"""Import or export tracked products as CSV or JSONL.
+
+    python bulk.py import catalog.csv
+    python bulk.py export products.jsonl
+    python bulk.py export - --format csv > products.csv
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from price_tracker.bulk import (FORMATS, export_products, format_for,
+                                import_products, read_rows)
+from price_tracker.products import open_store
+from price_tracker.shop_store import ShopStore
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=('import', 'export'))
+    parser.add_argument('file', help="path of the file, '-' for stdin/stdout")
+    parser.add_argument('--format', choices=FORMATS,
+                        help='file format (default: from the file extension)')
+    parser.add_argument('--store', default='products.json')
+    parser.add_argument('--shops', default='shops.json')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args(argv)
+    fmt = args.format or format_for(args.file)
+    store = open_store(Path(args.store))
+
+    if args.command == 'export':
+        if args.file == '-':
+            count = export_products(store.products, sys.stdout, fmt)
+        else:
+            with open(args.file, 'w', encoding='utf-8', newline='') as f:
+                count = export_products(store.products, f, fmt)
+        print(f'Exported {count} products', file=sys.stderr)
+        return 0
+
+    shops = ShopStore(Path(args.shops)).shops
+    if args.file == '-':
+        report = import_products(store, shops, read_rows(sys.stdin, fmt),
+                                 args.batch_size)
+    else:
+        with open(args.file, encoding='utf-8-sig', newline='') as f:
+            report = import_products(store, shops, read_rows(f, fmt),
+                                     args.batch_size)
+    print(f'Added {report.added} products, skipped {report.duplicates} '
+          f'duplicates and {report.invalid} invalid rows', file=sys.stderr)
+    for error in report.errors:
+        print(f'  {error}', file=sys.stderr)
+    return 1 if report.invalid else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
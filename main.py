@@ -3,7 +3,8 @@ from price_tracker.tracker import PriceTracker
 
 def main() -> None:
     tracker = PriceTracker('products.json', interval=3600,
-                          shops_path='shops.json', smtp_path='smtp.json')
+                          shops_path='shops.json', smtp_path='smtp.json',
+                          workers=8, per_host=2)
 
     # Example of adding a product
     # tracker.add_product('Example Product', 'http://example.com/product', 'shopa')
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class ArchiveEntry:
+    digest: str
+    fetched: float
+
+
+class PageArchive:
+    """Keep the last fetched HTML of every URL, compressed, on disk.
+
+    Pages are stored once per SHA-256 digest of their content under
+    ``directory/blobs`` and an index maps URLs to digests. Pages older
+    than ``max_age`` seconds are dropped, then the least recently fetched
+    ones until the compressed pages take at most ``max_bytes``. The index
+    is written by ``save``.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = 512 * 1024 * 1024,
+                 max_age: float = 30 * 86400,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.clock = clock
+        self._lock = threading.Lock()
+        # URLs in the order they were last fetched
+        self._entries: 'OrderedDict[str, ArchiveEntry]' = OrderedDict()
+        # compressed size and number of URLs of every stored blob
+        self._sizes: Dict[str, int] = {}
+        self._refs: Dict[str, int] = {}
+        self.size = 0
+        self.load()
+
+    @property
+    def _index_path(self) -> Path:
+        return self.directory / 'index.json'
+
+    @staticmethod
+    def blob_path(directory: Path, digest: str) -> Path:
+        return directory / 'blobs' / digest[:2] / digest[2:]
+
+    @classmethod
+    def read_blob(cls, directory: Path, digest: str) -> str:
+        """Return the page stored under ``digest`` in ``directory``."""
+        data = cls.blob_path(directory, digest).read_bytes()
+        return zlib.decompress(data).decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._entries
+
+    def load(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._refs.clear()
+            self.size = 0
+            if self._index_path.exists():
+                data = json.loads(self._index_path.read_text())
+                for url, item in data.get('pages', {}).items():
+                    entry = ArchiveEntry(**item)
+                    path = self.blob_path(self.directory, entry.digest)
+                    if entry.digest not in self._sizes:
+                        if not path.exists():
+                            continue
+                        self._sizes[entry.digest] = path.stat().st_size
+                        self.size += self._sizes[entry.digest]
+                    self._refs[entry.digest] = (
+                        self._refs.get(entry.digest, 0) + 1)
+                    self._entries[url] = entry
+            self._evict()
+
+    def save(self) -> None:
+        with self._lock:
+            data = {'pages': {url: asdict(entry)
+                              for url, entry in self._entries.items()}}
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = self._index_path.with_name('index.json.tmp')
+            tmp.write_text(json.dumps(data))
+            os.replace(tmp, self._index_path)
+
+    @classmethod
+    def write_blob(cls, directory: Path, html: str) -> str:
+        """Store ``html`` in ``directory`` unless present; return its digest.
+
+        Blobs are only ever replaced by identical content, so other
+        processes may write to the same archive.
+        """
+        raw = html.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        path = cls.blob_path(directory, digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f'{path.name}.{os.getpid()}.'
+                                 f'{threading.get_ident()}.tmp')
+            tmp.write_bytes(zlib.compress(raw, 6))
+            os.replace(tmp, path)
+        return digest
+
+    def put(self, url: str, html: str) -> str:
+        """Store ``html`` as the page of ``url``; return its digest."""
+        digest = self.write_blob(self.directory, html)
+        self.record(url, digest, self.clock())
+        return digest
+
+    def record(self, url: str, digest: str, fetched: float) -> None:
+        """Make the stored blob ``digest`` the page of ``url``.
+
+        Used for pages written by ``write_blob`` in worker processes; a
+        blob that is gone meanwhile is ignored.
+        """
+        with self._lock:
+            if digest not in self._sizes:
+                try:
+                    size = self.blob_path(self.directory,
+                                          digest).stat().st_size
+                except FileNotFoundError:
+                    return
+                self._sizes[digest] = size
+                self.size += size
+            old = self._entries.pop(url, None)
+            self._entries[url] = ArchiveEntry(digest, fetched)
+            self._refs[digest] = self._refs.get(digest, 0) + 1
+            if old is not None:
+                self._release(old.digest)
+            self._evict()
+
+    def entry(self, url: str) -> Optional[ArchiveEntry]:
+        with self._lock:
+            return self._entries.get(url)
+
+    def get(self, url: str) -> Optional[str]:
+        """Return the archived page of ``url``, ``None`` if there is none."""
+        entry = self.entry(url)
+        if entry is None:
+            return None
+        try:
+            return self.read_blob(self.directory, entry.digest)
+        except FileNotFoundError:
+            # evicted meanwhile
+            return None
+
+    def _release(self, digest: str) -> None:
+        self._refs[digest] -= 1
+        if self._refs[digest]:
+            return
+        del self._refs[digest]
+        self.size -= self._sizes.pop(digest)
+        self.blob_path(self.directory, digest).unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        cutoff = self.clock() - self.max_age
+        while self._entries:
+            url, entry = next(iter(self._entries.items()))
+            if entry.fetched >= cutoff and self.size <= self.max_bytes:
+                break
+            del self._entries[url]
+            self._release(entry.digest)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'pages': len(self._entries), 'blobs': len(self._sizes),
+                    'bytes': self.size}
+
+    def urls(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+
+@dataclass
+class ReextractResult:
+    name: str
+    url: str
+    last_price: float
+    price: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ReextractReport:
+    """Prices extracted again from the archived pages of a shop."""
+    shop: str
+    selector: Optional[str]
+    results: List[ReextractResult]
+    seconds: float = 0.0
+
+    @property
+    def found(self) -> int:
+        return sum(r.price is not None for r in self.results)
+
+    @property
+    def changed(self) -> int:
+        return sum(r.price is not None and r.price != r.last_price
+                   for r in self.results)
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - self.found
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'shop': self.shop, 'selector': self.selector,
+                'products': len(self.results), 'found': self.found,
+                'changed': self.changed, 'failed': self.failed,
+                'seconds': self.seconds,
+                'results': [asdict(r) for r in self.results]}
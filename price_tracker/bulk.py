@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from typing import IO, Any, Collection, Dict, Iterable, Iterator, List
+
+from .pricing import parser_for
+from .products import Product, ProductStore
+
+FIELDS = ('name', 'url', 'shop', 'selector', 'price', 'interval')
+FORMATS = ('csv', 'jsonl')
+# error messages kept in an ``ImportReport``; the rest are only counted
+MAX_ERRORS = 100
+
+
+@dataclass
+class ImportReport:
+    added: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def error(self, row: int, message: str) -> None:
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f'row {row}: {message}')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'added': self.added, 'duplicates': self.duplicates,
+                'invalid': self.invalid, 'errors': list(self.errors)}
+
+
+def format_for(filename: str, default: str = 'csv') -> str:
+    """Return ``'csv'`` or ``'jsonl'`` judging by the file extension."""
+    suffix = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if suffix in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    if suffix == 'csv':
+        return 'csv'
+    return default
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Dict[str, Any]]:
+    """Yield the rows of a CSV or JSONL ``stream`` one at a time.
+
+    Unreadable JSONL lines are yielded as ``{'_error': message}`` so that
+    they are reported with the right row number.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    if fmt != 'jsonl':
+        raise ValueError(f'Unknown format {fmt}')
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield {'_error': f'invalid JSON ({exc})'}
+            continue
+        yield row if isinstance(row, dict) else {'_error': 'not an object'}
+
+
+def _product(row: Dict[str, Any], shops: Collection[str]) -> Product:
+    name = str(row.get('name') or '').strip()
+    url = str(row.get('url') or '').strip()
+    shop = str(row.get('shop') or '').strip()
+    if not name or not url:
+        raise ValueError('name and url are required')
+    if shop not in shops:
+        raise ValueError(f'unknown shop {shop!r}')
+    price = row.get('price') or 0.0
+    if isinstance(price, str):
+        price = parser_for(shop).parse(price).value
+    interval = int(row.get('interval') or 0)
+    if interval < 0:
+        raise ValueError('interval must not be negative')
+    return Product(name=name, url=url, shop=shop,
+                   selector=str(row.get('selector') or '').strip(),
+                   price_history=[float(price)] if price else [],
+                   last_price=float(price), interval=interval)
+
+
+def import_products(store: ProductStore, shops: Collection[str],
+                    rows: Iterable[Dict[str, Any]],
+                    batch_size: int = 1000) -> ImportReport:
+    """Add products from ``rows`` to ``store``.
+
+    Rows whose URL is already tracked (or appeared earlier in ``rows``)
+    are skipped, as are rows naming a shop outside ``shops``. The store is
+    persisted once per ``batch_size`` added products rather than once per
+    product.
+    """
+    report = ImportReport()
+    rows = iter(rows)
+    number = 0
+    done = False
+    while not done:
+        with store.batch():
+            pending = 0
+            for row in rows:
+                number += 1
+                if '_error' in row:
+                    report.error(number, row['_error'])
+                    continue
+                try:
+                    product = _product(row, shops)
+                except (TypeError, ValueError) as exc:
+                    report.error(number, str(exc))
+                    continue
+                if store.products_for_url(product.url):
+                    report.duplicates += 1
+                    continue
+                store.add(product)
+                report.added += 1
+                pending += 1
+                if pending >= batch_size:
+                    break
+            else:
+                done = True
+    return report
+
+
+def export_rows(products: Iterable[Product]) -> Iterator[Dict[str, Any]]:
+    for product in products:
+        yield {'name': product.name, 'url': product.url,
+               'shop': product.shop, 'selector': product.selector,
+               'price': product.last_price, 'interval': product.interval}
+
+
+def iter_export(products: Iterable[Product], fmt: str) -> Iterator[str]:
+    """Yield ``products`` as CSV or JSONL text, one line at a time."""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt}')
+    if fmt == 'jsonl':
+        for row in export_rows(products):
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, FIELDS, lineterminator='\n')
+
+    def take() -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    writer.writeheader()
+    yield take()
+    for row in export_rows(products):
+        writer.writerow(row)
+        yield take()
+
+
+def export_products(products: Iterable[Product], stream: IO[str],
+                    fmt: str) -> int:
+    """Write ``products`` to ``stream``; return the number written."""
+    count = 0
+    for line in iter_export(products, fmt):
+        stream.write(line)
+        count += 1
+    # the CSV header line is not a product
+    return count - 1 if fmt == 'csv' else count
@@ -0,0 +1,79 @@
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# events returned by a single ``read`` at most
+READ_LIMIT = 1000
+
+
+class ChangeLog:
+    """Append-only JSONL log of price changes.
+
+    Each event is one line. The offset of an event is the byte position
+    just after its line, so a consumer that has handled an event resumes by
+    reading from that event's offset.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._cond = threading.Condition()
+        self._file = open(path, 'ab')
+        self._end = path.stat().st_size
+        if self._end and not self._tail_is_newline():
+            # a line cut short by a crash is skipped by ``read``
+            self._write(b'\n')
+
+    def _tail_is_newline(self) -> bool:
+        with open(self.path, 'rb') as fh:
+            fh.seek(-1, 2)
+            return fh.read(1) == b'\n'
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._file.flush()
+        self._end += len(data)
+
+    @property
+    def end(self) -> int:
+        """Offset after the last event."""
+        with self._cond:
+            return self._end
+
+    def append(self, event: Dict[str, Any]) -> int:
+        """Add ``event`` to the log and return its offset."""
+        line = json.dumps(event, ensure_ascii=False) + '\n'
+        with self._cond:
+            self._write(line.encode('utf-8'))
+            self._cond.notify_all()
+            return self._end
+
+    def read(self, offset: int = 0, limit: int = READ_LIMIT
+             ) -> List[Tuple[int, Dict[str, Any]]]:
+        """Return up to ``limit`` ``(offset, event)`` pairs after ``offset``."""
+        end = self.end
+        events: List[Tuple[int, Dict[str, Any]]] = []
+        if offset >= end:
+            return events
+        with open(self.path, 'rb') as fh:
+            if offset > 0:
+                fh.seek(offset - 1)
+                if fh.read(1) != b'\n':
+                    # not at the start of a line; resume at the next one
+                    fh.readline()
+            while len(events) < limit and fh.tell() < end:
+                line = fh.readline()
+                try:
+                    events.append((fh.tell(), json.loads(line)))
+                except ValueError:
+                    continue
+        return events
+
+    def wait(self, offset: int, timeout: float) -> bool:
+        """Wait until events after ``offset`` exist; ``False`` on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._end > offset, timeout)
+
+    def close(self) -> None:
+        with self._cond:
+            self._file.close()
@@ -0,0 +1,138 @@
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+
+def host_of(url: str) -> str:
+    """Return the lower-cased host part of ``url``."""
+    return (urlsplit(url).hostname or '').lower()
+
+
+class HostLimiter:
+    """Limit the number of simultaneous requests sent to a single host."""
+
+    def __init__(self, per_host: int = 2) -> None:
+        self.per_host = max(1, per_host)
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._semaphores.get(host)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.per_host)
+                self._semaphores[host] = sem
+            return sem
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        """Hold one of the request slots of ``url``'s host."""
+        sem = self._semaphore(host_of(url))
+        with sem:
+            yield
+
+
+class HostUnavailable(Exception):
+    """Raised instead of contacting a host whose circuit is open."""
+
+    def __init__(self, host: str) -> None:
+        super().__init__(f'{host} is unavailable after repeated failures')
+        self.host = host
+
+
+def is_host_failure(exc: BaseException) -> bool:
+    """Return whether ``exc`` means the host failed, not the page.
+
+    Connection errors, timeouts and server errors (5xx, 429) count; missing
+    pages and prices that cannot be extracted do not.
+    """
+    flag = getattr(exc, 'host_failure', None)
+    if flag is not None:
+        return flag
+    if isinstance(exc, HostUnavailable):
+        return True
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is not None and status < 500 and status != 429:
+        return False
+    # ``requests`` exceptions derive from ``OSError``
+    return isinstance(exc, OSError)
+
+
+@dataclass
+class HostState:
+    state: str = 'closed'
+    failures: int = 0
+    # ``clock()`` time at which an open circuit lets a probe through
+    retry_at: float = 0.0
+    last_error: str = ''
+
+
+class CircuitBreaker:
+    """Stop sending requests to hosts that keep failing.
+
+    After ``threshold`` consecutive failures the host's circuit opens and
+    ``allow`` refuses it for ``cooldown`` seconds. Then a single probe is
+    let through (half-open): success closes the circuit, failure opens it
+    for another cool-down. ``threshold`` 0 disables the breaker.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, HostState] = {}
+
+    def allow(self, url: str) -> bool:
+        """Return whether a request to ``url``'s host may be sent now."""
+        if not self.threshold:
+            return True
+        with self._lock:
+            state = self._hosts.get(host_of(url))
+            if state is None or state.state == 'closed':
+                return True
+            if state.state == 'open' and self.clock() >= state.retry_at:
+                state.state = 'half-open'
+                return True
+            return False
+
+    def record(self, url: str, error: Optional[BaseException] = None) -> None:
+        """Record the outcome of a request to ``url``'s host.
+
+        ``error`` is the exception it failed with, ``None`` on success.
+        """
+        if not self.threshold:
+            return
+        host = host_of(url)
+        with self._lock:
+            if error is None or not is_host_failure(error):
+                self._hosts.pop(host, None)
+                return
+            state = self._hosts.setdefault(host, HostState())
+            state.failures += 1
+            state.last_error = f'{type(error).__name__}: {error}'
+            if state.state == 'half-open' or (
+                    state.state == 'closed'
+                    and state.failures >= self.threshold):
+                state.state = 'open'
+                state.retry_at = self.clock() + self.cooldown
+
+    def reset(self, host: str) -> None:
+        """Close the circuit of ``host``."""
+        with self._lock:
+            self._hosts.pop(host.lower(), None)
+
+    def states(self) -> Dict[str, Dict]:
+        """Return hosts with recent failures and their circuit state."""
+        now = self.clock()
+        with self._lock:
+            return {host: {'state': s.state, 'failures': s.failures,
+                           'retry_in': max(0.0, s.retry_at - now)
+                           if s.state == 'open' else 0.0,
+                           'error': s.last_error}
+                    for host, s in self._hosts.items()}
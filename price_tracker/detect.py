@@ -0,0 +1,163 @@
+import json
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .pricing import PriceParser, parse_price
+from .shops.generic import _CURRENT_PRICE_RE, _PRICE_RE, _find_price_in_json
+
+JSONLD_SELECTOR = "script[type='application/ld+json']"
+PRICE_TEXT_RE = re.compile(r'\d+[\.,]\d+\s*(?:zł|pln|eur|€|usd|\$)?', re.I)
+_PRICE_HINT_RE = re.compile(r'price|cena|amount|cost', re.I)
+_OLD_PRICE_RE = re.compile(r'old|was|before|regular|strike|crossed|omnibus',
+                           re.I)
+_DATA_ATTRS = ('data-product-gtm', 'data-product', 'data-gtm')
+
+
+@dataclass
+class Candidate:
+    selector: str
+    price: float
+    source: str
+    score: float
+    currency: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def selector_for(element: 'Tag') -> str:
+    """Return a ``tag#id`` or ``tag.class`` selector for ``element``."""
+    selector = element.name
+    if element.get('id'):
+        selector += f"#{element.get('id')}"
+    elif element.get('class'):
+        selector += '.' + '.'.join(element.get('class'))
+    return selector
+
+
+def _hints(element: 'Tag') -> str:
+    """Return id, class and itemprop values of ``element`` and its parents."""
+    from bs4.element import Tag
+    parts = []
+    for node in [element, *list(element.parents)[:3]]:
+        if not isinstance(node, Tag):
+            continue
+        parts.append(node.get('id') or '')
+        parts.extend(node.get('class') or [])
+        parts.append(node.get('itemprop') or '')
+    return ' '.join(parts)
+
+
+def detect_candidates(html: str, limit: int = 5) -> List[Candidate]:
+    """Return up to ``limit`` selector candidates, best first.
+
+    The document is walked once, collecting JSON-LD blocks, price data
+    attributes and price-like text together. Text candidates score higher
+    when they sit in price-like markup, carry a currency and their
+    selector is unique in the page; old/crossed-out prices score lower.
+    """
+    from bs4 import BeautifulSoup
+    from bs4.element import NavigableString
+    soup = BeautifulSoup(html, 'html.parser')
+    # prices on one page share a number format, learned from the first ones
+    prices = PriceParser()
+    found: List[Tuple[Candidate, int]] = []
+    selector_counts: Counter = Counter()
+    for position, element in enumerate(soup.find_all(True)):
+        selector = selector_for(element)
+        selector_counts[selector] += 1
+
+        if element.name == 'script':
+            if (element.get('type') == 'application/ld+json'
+                    and element.string):
+                try:
+                    val = _find_price_in_json(json.loads(element.string))
+                    if val is not None:
+                        found.append((Candidate(JSONLD_SELECTOR,
+                                                parse_price(str(val)),
+                                                'json-ld', 7.0), position))
+                except Exception:
+                    pass
+            continue
+        if element.name == 'style':
+            continue
+
+        for attr in _DATA_ATTRS:
+            value = element.get(attr)
+            if not value:
+                continue
+            match = _CURRENT_PRICE_RE.search(value) or _PRICE_RE.search(value)
+            if match:
+                try:
+                    price = parse_price(match.group(1))
+                except ValueError:
+                    continue
+                found.append((Candidate(selector, price, 'data-attribute',
+                                        6.0), position))
+                break
+
+        for text in element.find_all(string=PRICE_TEXT_RE, recursive=False):
+            if not isinstance(text, NavigableString):
+                continue
+            try:
+                parsed = prices.parse(str(text))
+            except ValueError:
+                continue
+            if not parsed.value:
+                continue
+            hints = _hints(element)
+            score = 1.0
+            if _PRICE_HINT_RE.search(hints):
+                score += 2.0
+            if element.get('itemprop') == 'price':
+                score += 1.0
+            if parsed.currency:
+                score += 0.5
+            if _OLD_PRICE_RE.search(hints) or element.name in ('del', 's'):
+                score -= 3.5
+            found.append((Candidate(selector, parsed.value, 'text', score,
+                                    parsed.currency), position))
+            break
+
+    ranked: Dict[str, Tuple[Candidate, int]] = {}
+    for candidate, position in found:
+        if (candidate.source == 'text'
+                and selector_counts[candidate.selector] == 1):
+            candidate.score += 1.0
+        best = ranked.get(candidate.selector)
+        if best is None or candidate.score > best[0].score:
+            ranked[candidate.selector] = (candidate, position)
+    ordered = sorted(ranked.values(), key=lambda c: (-c[0].score, c[1]))
+    return [candidate for candidate, _ in ordered[:limit]]
+
+
+class RecentPages:
+    """Small in-memory cache of recently downloaded pages."""
+
+    def __init__(self, max_pages: int = 32, ttl: float = 600.0) -> None:
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._pages: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+
+    def put(self, url: str, html: str) -> None:
+        with self._lock:
+            self._pages[url] = (time.monotonic(), html)
+            self._pages.move_to_end(url)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+    def get(self, url: str) -> Optional[str]:
+        with self._lock:
+            item = self._pages.get(url)
+            if item is None:
+                return None
+            stored, html = item
+            if time.monotonic() - stored > self.ttl:
+                del self._pages[url]
+                return None
+            return html
@@ -0,0 +1,95 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Sequence, Tuple
+
+from .history import PriceHistory
+
+Point = Tuple[float, float]
+METHODS = ('lttb', 'minmax')
+
+
+def points_between(timestamps: Sequence[float], prices: Sequence[float],
+                   start: Optional[float] = None,
+                   end: Optional[float] = None) -> List[Point]:
+    """Return the ``(timestamp, price)`` pairs with ``start <= ts <= end``.
+
+    ``timestamps`` must be sorted, as appended histories are; the range is
+    found by bisection.
+    """
+    lo = 0 if start is None else bisect_left(timestamps, start)
+    hi = len(timestamps) if end is None else bisect_right(timestamps, end)
+    return list(zip(timestamps[lo:hi], prices[lo:hi]))
+
+
+def history_points(history: Sequence[float], start: Optional[float] = None,
+                   end: Optional[float] = None) -> Tuple[List[Point], str]:
+    """Return the points of ``history`` in a range and what their x is.
+
+    Histories kept without timestamps (plain lists) use the observation
+    index as x, and ``start`` / ``end`` are indexes then.
+    """
+    if isinstance(history, PriceHistory):
+        return points_between(history.timestamps, history.prices,
+                              start, end), 'time'
+    return points_between(range(len(history)), history, start, end), 'index'
+
+
+def lttb(points: Sequence[Point], threshold: int) -> List[Point]:
+    """Downsample ``points`` to ``threshold`` points keeping their shape.
+
+    Largest-Triangle-Three-Buckets: the first and last points are kept and
+    from every bucket in between the point forming the largest triangle
+    with the previously kept point and the average of the next bucket.
+    """
+    n = len(points)
+    if threshold >= n:
+        return list(points)
+    if threshold < 3:
+        return [points[0], points[-1]][:max(threshold, 0)]
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    kept = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        following = points[end:min(int((i + 2) * every) + 1, n)] or points[-1:]
+        avg_x = sum(p[0] for p in following) / len(following)
+        avg_y = sum(p[1] for p in following) / len(following)
+        ax, ay = points[kept]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area, best = area, j
+        sampled.append(points[best])
+        kept = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(points: Sequence[Point], threshold: int) -> List[Point]:
+    """Keep the lowest and highest point of ``threshold // 2`` buckets."""
+    n = len(points)
+    buckets = threshold // 2
+    if threshold >= n:
+        return list(points)
+    if buckets < 1:
+        return list(points[:max(threshold, 0)])
+    sampled: List[Point] = []
+    for i in range(buckets):
+        bucket = points[i * n // buckets:(i + 1) * n // buckets]
+        low = min(range(len(bucket)), key=lambda j: bucket[j][1])
+        high = max(range(len(bucket)), key=lambda j: bucket[j][1])
+        for j in sorted({low, high}):
+            sampled.append(bucket[j])
+    return sampled
+
+
+def downsample(points: Sequence[Point], threshold: int,
+               method: str = 'lttb') -> List[Point]:
+    if method == 'lttb':
+        return lttb(points, threshold)
+    if method == 'minmax':
+        return minmax(points, threshold)
+    raise ValueError(f'Unknown method {method}')
@@ -0,0 +1,165 @@
+import hashlib
+import struct
+import time
+from array import array
+from pathlib import Path
+from typing import (Callable, Iterable, Iterator, List, Optional, Sequence,
+                    Tuple)
+
+# one history record: timestamp (seconds since epoch) and price, both as
+# little-endian doubles
+RECORD = struct.Struct('<dd')
+
+Loader = Callable[[], Tuple[array, array]]
+Writer = Callable[[float, float], None]
+
+
+class PriceHistory:
+    """Prices with their timestamps, read from storage on first access.
+
+    Behaves like a read-only sequence of prices; ``points`` yields the
+    ``(timestamp, price)`` pairs. A timestamp of ``0.0`` means the time of
+    the observation is unknown (entries migrated from old files).
+    """
+
+    def __init__(self, loader: Optional[Loader] = None,
+                 writer: Optional[Writer] = None) -> None:
+        self._loader = loader
+        self._writer = writer
+        self._timestamps: Optional[array] = None
+        self._prices: Optional[array] = None
+        if loader is None:
+            self._timestamps = array('d')
+            self._prices = array('d')
+
+    @classmethod
+    def from_prices(cls, prices: Iterable[float],
+                    timestamp: float = 0.0) -> 'PriceHistory':
+        history = cls()
+        for price in prices:
+            history.append(price, timestamp)
+        return history
+
+    @property
+    def loaded(self) -> bool:
+        return self._prices is not None
+
+    def _load(self) -> array:
+        if self._prices is None:
+            self._timestamps, self._prices = self._loader()
+        return self._prices
+
+    @property
+    def timestamps(self) -> array:
+        self._load()
+        return self._timestamps
+
+    @property
+    def prices(self) -> array:
+        return self._load()
+
+    def points(self) -> Iterator[Tuple[float, float]]:
+        prices = self._load()
+        return zip(self._timestamps, prices)
+
+    def append(self, price: float, timestamp: Optional[float] = None) -> None:
+        if timestamp is None:
+            timestamp = time.time()
+        if self._writer is not None:
+            self._writer(timestamp, price)
+        # when not loaded yet the new point will be read with the rest
+        if self._prices is not None:
+            self._timestamps.append(timestamp)
+            self._prices.append(price)
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self._load())
+
+    def __getitem__(self, index):
+        result = self._load()[index]
+        return list(result) if isinstance(index, slice) else result
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (PriceHistory, list, tuple, array)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        if self._prices is None:
+            return 'PriceHistory(<not loaded>)'
+        return f'PriceHistory({list(self._prices)!r})'
+
+
+def append_price(history: Sequence[float], price: float,
+                 timestamp: Optional[float] = None) -> None:
+    """Append ``price`` to either a ``PriceHistory`` or a plain list."""
+    if isinstance(history, PriceHistory):
+        history.append(price, timestamp)
+    else:
+        history.append(price)
+
+
+def _split(raw: bytes) -> Tuple[array, array]:
+    data = array('d')
+    data.frombytes(raw[:len(raw) - len(raw) % RECORD.size])
+    if struct.pack('=d', 1.0) != struct.pack('<d', 1.0):
+        data.byteswap()
+    return data[0::2], data[1::2]
+
+
+def history_key(url: str, selector: str = '') -> str:
+    """Return the key of the history of the product at ``url``.
+
+    Products on one URL differ by selector; products without one keep the
+    key (and the segment) they had when histories were keyed by URL.
+    """
+    return f'{url}\n{selector}' if selector else url
+
+
+class HistoryStore:
+    """Append-only binary history files, one segment per product.
+
+    Segments are addressed by a key from ``history_key``.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def segment(self, key: str) -> Path:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return self.directory / f'{digest}.bin'
+
+    def exists(self, key: str) -> bool:
+        return self.segment(key).exists()
+
+    def read(self, key: str) -> Tuple[array, array]:
+        path = self.segment(key)
+        if not path.exists():
+            return array('d'), array('d')
+        return _split(path.read_bytes())
+
+    def append(self, key: str, timestamp: float, price: float) -> None:
+        with self.segment(key).open('ab') as fh:
+            fh.write(RECORD.pack(timestamp, price))
+
+    def write(self, key: str, points: Iterable[Tuple[float, float]]) -> None:
+        """Replace the segment of ``key`` with ``points``."""
+        data: List[bytes] = [RECORD.pack(ts, price) for ts, price in points]
+        self.segment(key).write_bytes(b''.join(data))
+
+    def rename(self, old: str, new: str) -> None:
+        self.segment(old).replace(self.segment(new))
+
+    def remove(self, key: str) -> None:
+        self.segment(key).unlink(missing_ok=True)
+
+    def open(self, key: str) -> PriceHistory:
+        """Return a lazily loaded history backed by the segment of ``key``."""
+        return PriceHistory(
+            loader=lambda: self.read(key),
+            writer=lambda ts, price: self.append(key, ts, price),
+        )
@@ -0,0 +1,100 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .products import Product
+
+
+@dataclass
+class CheckJob:
+    """Progress of a manually started price check."""
+    id: str
+    total: int
+    done: int = 0
+    failures: int = 0
+    started: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self.finished is None
+
+    def record(self, product: Product, exc: Optional[Exception]) -> None:
+        self.done += 1
+        if exc is not None:
+            self.failures += 1
+
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until the job is done."""
+        if not self.running:
+            return 0.0
+        if not self.done:
+            return None
+        elapsed = time.time() - self.started
+        return elapsed / self.done * (self.total - self.done)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'state': ('running' if self.running else
+                      'failed' if self.error else 'done'),
+            'done': self.done,
+            'total': self.total,
+            'failures': self.failures,
+            'started': self.started,
+            'finished': self.finished,
+            'eta': self.eta(),
+            'error': self.error,
+        }
+
+
+class JobManager:
+    """Run price checks in background threads, one at a time.
+
+    ``run`` is called with the products to check and a progress callback
+    taking ``(product, exception_or_None)``. Starting a check while another
+    one is running returns the running job instead of starting a new one.
+    """
+
+    def __init__(self, products: Callable[[], List[Product]],
+                 run: Callable[[List[Product], Callable], None],
+                 keep: int = 20) -> None:
+        self._products = products
+        self._run = run
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._jobs: 'OrderedDict[str, CheckJob]' = OrderedDict()
+        self._current: Optional[CheckJob] = None
+
+    def start(self) -> CheckJob:
+        with self._lock:
+            if self._current is not None and self._current.running:
+                return self._current
+            products = self._products()
+            job = CheckJob(id=uuid.uuid4().hex[:12], total=len(products))
+            self._current = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.keep:
+                self._jobs.popitem(last=False)
+        threading.Thread(target=self._execute, args=(job, products),
+                         name=f'check-{job.id}', daemon=True).start()
+        return job
+
+    def _execute(self, job: CheckJob, products: List[Product]) -> None:
+        try:
+            self._run(products, job.record)
+        except Exception as exc:
+            job.error = str(exc)
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id: str) -> Optional[CheckJob]:
+        return self._jobs.get(job_id)
+
+    @property
+    def current(self) -> Optional[CheckJob]:
+        return self._current
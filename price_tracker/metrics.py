@@ -0,0 +1,207 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+# series by metric name as returned by ``MetricsRegistry.drain``: counter
+# values, or histogram ``(counts, sum, count)``
+MetricsData = Dict[str, List[Tuple[Labels, Any]]]
+
+SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+           10.0, 30.0)
+BYTES = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> Dict:
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return {'buckets': cumulative, 'sum': self.sum, 'count': self.count}
+
+
+class MetricsRegistry:
+    """Counters and histograms keyed by metric name and labels.
+
+    Updates take one short lock, so instrumentation can stay enabled in
+    production. Labels missing from a call are filled from the calling
+    thread's ``context``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._types: Dict[str, str] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._local = threading.local()
+
+    def counter(self, name: str, help: str) -> None:
+        self._help[name] = help
+        self._types[name] = 'counter'
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name: str, help: str,
+                  buckets: Tuple[float, ...] = SECONDS) -> None:
+        self._help[name] = help
+        self._types[name] = 'histogram'
+        self._buckets[name] = buckets
+        self._histograms.setdefault(name, {})
+
+    def _labels(self, labels: Dict[str, str]) -> Labels:
+        context = getattr(self._local, 'labels', None)
+        if context:
+            labels = {**context, **labels}
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    @contextmanager
+    def context(self, **labels: str) -> Iterator[None]:
+        """Add ``labels`` to metrics recorded by this thread in the block."""
+        previous = getattr(self._local, 'labels', None)
+        self._local.labels = {**(previous or {}), **labels}
+        try:
+            yield
+        finally:
+            self._local.labels = previous
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms[name]
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram(self._buckets[name])
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block in histogram ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def drain(self) -> 'MetricsData':
+        """Return the raw series recorded so far and start over.
+
+        Worker processes send this to the parent, which ``merge``s it.
+        """
+        with self._lock:
+            data: MetricsData = {}
+            for name, series in self._counters.items():
+                data[name] = [(k, v) for k, v in series.items()]
+                series.clear()
+            for name, series in self._histograms.items():
+                data[name] = [(k, (h.counts, h.sum, h.count))
+                              for k, h in series.items()]
+                series.clear()
+            return data
+
+    def merge(self, data: 'MetricsData') -> None:
+        """Add series returned by another registry's ``drain``."""
+        with self._lock:
+            for name, items in data.items():
+                if name in self._counters:
+                    series = self._counters[name]
+                    for key, value in items:
+                        series[key] = series.get(key, 0.0) + value
+                    continue
+                hists = self._histograms[name]
+                for key, (counts, total, count) in items:
+                    hist = hists.get(key)
+                    if hist is None:
+                        hist = hists[key] = Histogram(self._buckets[name])
+                    hist.counts = [a + b for a, b in zip(hist.counts, counts)]
+                    hist.sum += total
+                    hist.count += count
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        """Return all series as plain data."""
+        with self._lock:
+            data: Dict[str, List[Dict]] = {}
+            for name, series in self._counters.items():
+                data[name] = [{'labels': dict(k), 'value': v}
+                              for k, v in series.items()]
+            for name, series in self._histograms.items():
+                data[name] = [{'labels': dict(k), **h.snapshot()}
+                              for k, h in series.items()]
+            return data
+
+    def render(self) -> str:
+        """Return all series in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name in sorted(snapshot):
+            lines.append(f'# HELP {name} {self._help[name]}')
+            lines.append(f'# TYPE {name} {self._types[name]}')
+            for item in snapshot[name]:
+                labels = item['labels']
+                if 'value' in item:
+                    lines.append(f'{name}{_format(labels)} {item["value"]}')
+                    continue
+                for bound, count in item['buckets']:
+                    lines.append(f'{name}_bucket'
+                                 f'{_format(labels, le=repr(float(bound)))} '
+                                 f'{count}')
+                lines.append(f'{name}_bucket{_format(labels, le="+Inf")} '
+                             f'{item["count"]}')
+                lines.append(f'{name}_sum{_format(labels)} {item["sum"]}')
+                lines.append(f'{name}_count{_format(labels)} {item["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace('\n', '\\n')
+            .replace('"', '\\"'))
+
+
+def _format(labels: Dict[str, str], le: Optional[str] = None) -> str:
+    items = list(labels.items())
+    if le is not None:
+        items.append(('le', le))
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+# registry shared by the whole process
+registry = MetricsRegistry()
+registry.histogram('price_tracker_fetch_seconds',
+                   'Time to download a product page.')
+registry.histogram('price_tracker_fetch_bytes',
+                   'Size of downloaded product pages.', BYTES)
+registry.histogram('price_tracker_parse_seconds',
+                   'Time to extract a price from a downloaded page.')
+registry.counter('price_tracker_extractions_total',
+                 'Prices extracted, by extraction path.')
+registry.histogram('price_tracker_persist_seconds',
+                   'Time spent writing the product store.')
+registry.histogram('price_tracker_notify_seconds',
+                   'Time spent sending price drop notifications.')
+registry.counter('price_tracker_failures_total',
+                 'Failed price checks, by exception type.')
@@ -1,22 +1,84 @@
-import smtplib
-from email.message import EmailMessage
-from typing import Optional
+from typing import Optional, Tuple
 
+# ``smtplib`` and ``email`` are imported when the first message is sent
 
-def send_email(recipient: str, subject: str, body: str,
-               smtp_server: str = 'localhost',
-               smtp_port: int = 25,
-               username: Optional[str] = None,
-               password: Optional[str] = None) -> None:
-    """Send a simple text email."""
+
+def build_message(recipient: str, subject: str, body: str,
+                  username: Optional[str] = None) -> 'EmailMessage':
+    """Return a plain text message sent from ``username``."""
+    from email.message import EmailMessage
     msg = EmailMessage()
     msg['From'] = username or 'price-tracker@example.com'
     msg['To'] = recipient
     msg['Subject'] = subject
     msg.set_content(body)
+    return msg
+
 
-    with smtplib.SMTP(smtp_server, smtp_port) as s:
+def _connect(smtp_server: str, smtp_port: int, username: Optional[str],
+             password: Optional[str]) -> 'smtplib.SMTP':
+    import smtplib
+    s = smtplib.SMTP(smtp_server, smtp_port)
+    try:
         if username and password:
             s.starttls()
             s.login(username, password)
+    except Exception:
+        s.close()
+        raise
+    return s
+
+
+def send_email(recipient: str, subject: str, body: str,
+               smtp_server: str = 'localhost',
+               smtp_port: int = 25,
+               username: Optional[str] = None,
+               password: Optional[str] = None) -> None:
+    """Send a simple text email."""
+    msg = build_message(recipient, subject, body, username)
+    with _connect(smtp_server, smtp_port, username, password) as s:
         s.send_message(msg)
+
+
+class SmtpConnection:
+    """An authenticated SMTP connection reused between messages.
+
+    The connection is opened on the first ``send`` and re-opened when the
+    server settings change or the server has dropped it.
+    """
+
+    def __init__(self) -> None:
+        self._smtp: Optional['smtplib.SMTP'] = None
+        self._settings: Optional[Tuple] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._smtp is not None
+
+    def send(self, msg: 'EmailMessage', smtp_server: str = 'localhost',
+             smtp_port: int = 25, username: Optional[str] = None,
+             password: Optional[str] = None) -> None:
+        import smtplib
+        settings = (smtp_server, smtp_port, username, password)
+        if self._smtp is not None and settings != self._settings:
+            self.close()
+        if self._smtp is None:
+            self._smtp = _connect(*settings)
+            self._settings = settings
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # idle connections are commonly closed by the server
+            self.close()
+            self._smtp = _connect(*settings)
+            self._settings = settings
+            self._smtp.send_message(msg)
+
+    def close(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from .metrics import registry
+from .notification import SmtpConnection, build_message
+from .smtp_config import SmtpConfig
+
+
+@dataclass
+class PriceDrop:
+    name: str
+    url: str
+    old: float
+    new: float
+    # the new price is the lowest ever recorded for the product
+    lowest: bool = False
+
+
+_STOP = object()
+
+
+class Notifier:
+    """Send price drop emails from a background thread.
+
+    Drops queued within ``window`` seconds of the first one are sent as a
+    single digest over one SMTP connection kept open between digests (and
+    closed after ``idle_timeout`` seconds without traffic). Failed sends
+    are retried ``retries`` times, waiting ``backoff`` seconds before the
+    first retry and twice as long before each next one.
+    """
+
+    def __init__(self, recipient: str, config: Callable[[], SmtpConfig],
+                 window: float = 30.0, retries: int = 5,
+                 backoff: float = 2.0, max_backoff: float = 300.0,
+                 idle_timeout: float = 60.0) -> None:
+        self.recipient = recipient
+        self.config = config
+        self.window = window
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.idle_timeout = idle_timeout
+        self.connection = SmtpConnection()
+        self.sent = 0
+        self.failed = 0
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run,
+                                                name='price-notifier',
+                                                daemon=True)
+                self._thread.start()
+
+    def notify(self, drop: PriceDrop) -> None:
+        """Queue ``drop`` for delivery; never blocks on the network."""
+        self.start()
+        self._queue.put(drop)
+
+    def flush(self) -> None:
+        """Wait until every queued drop has been handled."""
+        self._queue.join()
+
+    def stop(self, wait: bool = True) -> None:
+        """Deliver pending drops and stop the background thread.
+
+        With ``wait=False`` the thread finishes on its own and this returns
+        right away.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        if wait:
+            thread.join()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self.connection.close()
+                continue
+            stop = item is _STOP
+            batch: List[PriceDrop] = [] if stop else [item]
+            handled = 1
+            deadline = time.monotonic() + self.window
+            while not stop:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                handled += 1
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+            try:
+                if batch:
+                    self._deliver(batch)
+            finally:
+                for _ in range(handled):
+                    self._queue.task_done()
+            if stop:
+                self.connection.close()
+                return
+
+    def _digest(self, batch: List[PriceDrop]):
+        lines = [f'Price drop for {d.name}: {d.old} -> {d.new}'
+                 f"{' (lowest price ever)' if d.lowest else ''}\n"
+                 f'URL: {d.url}' for d in batch]
+        if len(batch) == 1:
+            subject = f'Price drop: {batch[0].name}'
+        else:
+            subject = f'Price drops: {len(batch)} products'
+        cfg = self.config()
+        return build_message(self.recipient, subject, '\n\n'.join(lines),
+                             cfg.username)
+
+    def _deliver(self, batch: List[PriceDrop]) -> None:
+        msg = self._digest(batch)
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            cfg = self.config()
+            try:
+                with registry.timer('price_tracker_notify_seconds'):
+                    self.connection.send(msg, smtp_server=cfg.server,
+                                         smtp_port=cfg.port,
+                                         username=cfg.username,
+                                         password=cfg.password)
+                self.sent += len(batch)
+                return
+            except Exception as exc:
+                self.connection.close()
+                if attempt == self.retries:
+                    self.failed += len(batch)
+                    print(f'Failed to send price drop email: {exc}')
+                    return
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
@@ -0,0 +1,126 @@
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+
+@dataclass
+class CacheEntry:
+    price: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class PageCache:
+    """Remember HTTP validators and extracted prices per URL and selector.
+
+    Entries are kept in least-recently-used order and the oldest ones are
+    dropped once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, path: Optional[Path] = None,
+                 max_entries: int = 10000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self.load()
+
+    @staticmethod
+    def _key(url: str, selector: str) -> str:
+        return f'{url}\n{selector}'
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self) -> None:
+        self._entries = OrderedDict()
+        if self.path is None or not self.path.exists():
+            return
+        data = json.loads(self.path.read_text())
+        for key, item in data.get('entries', {}).items():
+            self._entries[key] = CacheEntry(**item)
+        self._evict()
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            data = {'entries': {k: vars(e) for k, e in self._entries.items()}}
+        self.path.write_text(json.dumps(data))
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, url: str, selector: str) -> Optional[CacheEntry]:
+        """Return the entry for ``url`` without touching the counters."""
+        with self._lock:
+            key = self._key(url, selector)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def request_headers(self, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """Return conditional request headers for ``entry``."""
+        headers: Dict[str, str] = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def store(self, url: str, selector: str, price: float,
+              etag: Optional[str], last_modified: Optional[str]) -> None:
+        """Record a full download of ``url``."""
+        with self._lock:
+            self.misses += 1
+            key = self._key(url, selector)
+            if not etag and not last_modified:
+                # nothing to revalidate with next time
+                self._entries.pop(key, None)
+                return
+            self._entries[key] = CacheEntry(price=price, etag=etag,
+                                            last_modified=last_modified)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def export(self, keys: Iterable[Tuple[str, str]]
+               ) -> Dict[Tuple[str, str], Optional[CacheEntry]]:
+        """Return the entries of ``(url, selector)`` pairs, ``None`` for
+        pairs without one."""
+        with self._lock:
+            return {(url, selector):
+                    self._entries.get(self._key(url, selector))
+                    for url, selector in keys}
+
+    def merge(self, entries: Dict[Tuple[str, str], Optional[CacheEntry]],
+              hits: int = 0, misses: int = 0) -> None:
+        """Take over entries ``export``ed by a cache in a worker process."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            for (url, selector), entry in entries.items():
+                key = self._key(url, selector)
+                if entry is None:
+                    self._entries.pop(key, None)
+                    continue
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+            self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self._entries)}
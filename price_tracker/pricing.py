@@ -0,0 +1,194 @@
+import re
+import threading
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple, Union
+
+CURRENCIES = {
+    'zł': 'PLN', 'pln': 'PLN',
+    '€': 'EUR', 'eur': 'EUR', 'euro': 'EUR',
+    '$': 'USD', 'usd': 'USD',
+    '£': 'GBP', 'gbp': 'GBP',
+}
+# languages writing ``1 234,56``; everything else defaults to ``1,234.56``
+COMMA_DECIMAL_LANGUAGES = {
+    'bg', 'cs', 'da', 'de', 'es', 'fi', 'fr', 'hr', 'hu', 'it', 'lt', 'lv',
+    'nb', 'nl', 'no', 'pl', 'pt', 'ro', 'ru', 'sk', 'sl', 'sv', 'tr', 'uk',
+}
+CACHE_SIZE = 8192
+
+_CURRENCY = r'(zł|pln|euro|eur|usd|\$|€|gbp|£)'
+_CURRENCY_RE = re.compile('(?i)' + _CURRENCY)
+_SPACES = str.maketrans('', '', ' \xa0\u202f\t\r\n')
+
+
+def _fast_pattern(decimal: str, thousands: str) -> Pattern:
+    # currency, number with grouped thousands, decimals, currency
+    return re.compile(
+        rf'(?i)\s*(?:{_CURRENCY}\s*)?'
+        rf'(-?\d{{1,3}}(?:[{thousands}\s]\d{{3}})+|-?\d+)'
+        rf'(?:{re.escape(decimal)}(\d+))?\s*(?:{_CURRENCY}\.?)?\s*')
+
+
+_FAST_PATTERNS = {'.': _fast_pattern('.', ','), ',': _fast_pattern(',', '.')}
+_GROUPING = {
+    '.': str.maketrans('', '', ', \xa0\u202f\t'),
+    ',': str.maketrans('', '', '. \xa0\u202f\t'),
+}
+_SEPARATED_RE = re.compile(r'-?\d[\d.,]*\d')
+
+
+def parse_price(text: str) -> float:
+    """Clean a price string and convert it to ``float``.
+
+    The function removes currency identifiers (zł, PLN, €, $, etc.),
+    strips whitespace, replaces comma with a dot and removes thousands
+    separators (space or non‑breaking space).
+    """
+    cleaned = text.strip()
+    cleaned = re.sub(r"(?i)(zł|pln|eur|euro|usd|\$|€|gbp|£)", "", cleaned)
+    cleaned = cleaned.replace("\xa0", "").replace(" ", "")
+    cleaned = cleaned.replace(",", ".")
+    cleaned = re.sub(r"[^0-9.\-]", "", cleaned)
+    cleaned = cleaned.strip(".")
+    if cleaned.count(".") > 1:
+        last = cleaned.rfind(".")
+        cleaned = cleaned[:last].replace(".", "") + cleaned[last:]
+    if not cleaned or cleaned == ".":
+        raise ValueError(f"Could not parse price: {text}")
+    return float(cleaned)
+
+
+@dataclass(frozen=True)
+class Price:
+    value: float
+    currency: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class NumberFormat:
+    """Decimal separator and default currency of a shop's prices."""
+    decimal: str = '.'
+    currency: Optional[str] = None
+
+
+def _split(text: str) -> Tuple[str, Optional[str]]:
+    """Return ``text`` without currency marks or spaces, and its currency."""
+    match = _CURRENCY_RE.search(text)
+    if match is None:
+        return text.translate(_SPACES), None
+    return (_CURRENCY_RE.sub('', text).translate(_SPACES),
+            CURRENCIES[match.group(1).lower()])
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_fast(text: str, decimal: str) -> Optional[Price]:
+    match = _FAST_PATTERNS[decimal].fullmatch(text)
+    if match is None:
+        return None
+    before, whole, fraction, after = match.groups()
+    currency = before or after
+    value = float(f"{whole.translate(_GROUPING[decimal])}.{fraction or '0'}")
+    return Price(value, CURRENCIES[currency.lower()] if currency else None)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_guess(text: str) -> Price:
+    return Price(parse_price(text), _split(text)[1])
+
+
+def infer_format(text: str) -> Optional[NumberFormat]:
+    """Return the number format of ``text`` or ``None`` if it is ambiguous.
+
+    ``1 234,56`` and ``12.50`` tell the decimal separator apart, while a
+    single separator followed by three digits (``1,234``) could be either.
+    """
+    number, currency = _split(text)
+    if not _SEPARATED_RE.fullmatch(number):
+        return None
+    last = max(number.rfind('.'), number.rfind(','))
+    if last < 0:
+        return None
+    sep = number[last]
+    other = ',' if sep == '.' else '.'
+    if number.count(sep) > 1:
+        decimal = other
+    elif other not in number and len(number) - last - 1 == 3:
+        return None
+    else:
+        decimal = sep
+    if not _FAST_PATTERNS[decimal].fullmatch(text):
+        return None
+    return NumberFormat(decimal, currency)
+
+
+def format_for_locale(locale: str) -> Optional[NumberFormat]:
+    """Return the number format of a locale name such as ``pl_PL``."""
+    language = re.split(r'[_.@-]', locale.strip().lower(), 1)[0]
+    if not language:
+        return None
+    return NumberFormat(',' if language in COMMA_DECIMAL_LANGUAGES else '.')
+
+
+class PriceParser:
+    """Parse the prices of one shop, learning its number format.
+
+    Until the format is known every text goes through ``parse_price``; the
+    first unambiguous text fixes the decimal separator (and currency) and
+    later texts are read with a single regex. Texts that do not fit the
+    learned format still fall back to ``parse_price``. Results for repeated
+    texts are memoized.
+    """
+
+    def __init__(self, number_format: Optional[NumberFormat] = None) -> None:
+        self.format = number_format
+
+    def parse(self, text: str) -> Price:
+        fmt = self.format
+        price = _parse_fast(text, fmt.decimal) if fmt is not None else None
+        if price is None:
+            price = _parse_guess(text)
+            if fmt is None:
+                self.format = infer_format(text)
+                return price
+        if price.currency is None:
+            return replace(price, currency=fmt.currency)
+        if fmt.currency is None:
+            self.format = replace(fmt, currency=price.currency)
+        return price
+
+    def parse_many(self, texts: Iterable[str]) -> List[Optional[Price]]:
+        """Parse ``texts`` in order; unparseable texts give ``None``."""
+        prices: List[Optional[Price]] = []
+        for text in texts:
+            try:
+                prices.append(self.parse(text))
+            except ValueError:
+                prices.append(None)
+        return prices
+
+
+def parse_prices(texts: Iterable[str],
+                 locale_hint: Union[str, NumberFormat, None] = None
+                 ) -> List[Optional[Price]]:
+    """Parse a batch of price texts written in one number format.
+
+    ``locale_hint`` (``'pl_PL'``, ``'en'`` or a ``NumberFormat``) fixes the
+    format up front; without it the format is learned from the batch.
+    """
+    if isinstance(locale_hint, str):
+        locale_hint = format_for_locale(locale_hint)
+    return PriceParser(locale_hint).parse_many(texts)
+
+
+_parsers: Dict[str, PriceParser] = {}
+_parsers_lock = threading.Lock()
+
+
+def parser_for(shop: str) -> PriceParser:
+    """Return the parser shared by all products of ``shop``."""
+    with _parsers_lock:
+        parser = _parsers.get(shop)
+        if parser is None:
+            parser = _parsers[shop] = PriceParser()
+        return parser
@@ -1,7 +1,18 @@
 import json
+import os
+import threading
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Any
+from types import MappingProxyType
+from typing import (Iterator, List, Dict, Any, Mapping, Optional, Sequence,
+                    Tuple)
+
+from .changes import ChangeLog
+from .history import HistoryStore, PriceHistory, append_price, history_key
+from .metrics import registry
+from .stats import PriceStats
 
 
 @dataclass
@@ -10,51 +21,333 @@ class Product:
     url: str
     shop: str
     selector: str = ''
-    price_history: List[float] = field(default_factory=list)
+    # a plain list, or a lazily loaded ``PriceHistory`` when the store keeps
+    # histories outside of the product file
+    price_history: Sequence[float] = field(default_factory=list)
     last_price: float = 0.0
+    # seconds between checks; 0 means the shop's or the tracker's default
+    interval: int = 0
+    # running aggregates of ``price_history``; ``None`` for products saved
+    # before statistics were kept, computed on their next update
+    stats: Optional[PriceStats] = None
+
+
+@dataclass(frozen=True)
+class StoreSnapshot:
+    """Read-only view of the products of a store at one point in time.
+
+    Taking and reading a snapshot never waits for writers. Products added
+    or removed later do not show up in it; the ``Product`` objects are
+    shared with the store, so their prices are the current ones.
+    """
+    products: Tuple[Product, ...] = ()
+    by_url: Mapping[str, Tuple[Product, ...]] = field(
+        default_factory=lambda: MappingProxyType({}))
+    version: int = -1
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def find_by_url(self, url: str, selector: Optional[str] = None
+                    ) -> Product:
+        return _first_match(self.by_url.get(url, ()), url, selector)
+
+
+def _first_match(products: Sequence[Product], url: str,
+                 selector: Optional[str]) -> Product:
+    """Return the first of ``products`` at ``url`` using ``selector``.
+
+    Any selector matches when it is ``None``.
+    """
+    for product in products:
+        if selector is None or product.selector == selector:
+            return product
+    raise ValueError(f'Product with url {url} not found')
 
 
 class ProductStore:
-    def __init__(self, path: Path):
+    """Products persisted to a JSON file.
+
+    Every change runs under one lock, so writes from the checking thread
+    and from web requests are serialized; readers that must not wait use
+    ``snapshot``.
+    """
+
+    def __init__(self, path: Path, history_dir: Optional[Path] = None):
         self.path = path
-        self.products: List[Product] = []
+        self._lock = threading.RLock()
+        # products in insertion order keyed by ``id(product)`` plus indexes
+        # by URL and by shop name; all three are kept in sync by
+        # ``_insert`` / ``_discard``
+        self._items: Dict[int, Product] = {}
+        self._by_url: Dict[str, List[Product]] = {}
+        self._by_shop: Dict[str, Dict[int, Product]] = {}
+        # incremented whenever products are added or removed
+        self.version = 0
+        # binary per-product history segments; when ``None`` the history is
+        # stored inline in the JSON file
+        self.history = HistoryStore(history_dir) if history_dir else None
+        # per-thread nesting depth of ``batch`` blocks and whether a save
+        # was deferred
+        self._local = threading.local()
+        self._dirty = False
+        # published by ``_publish`` after changes to the set of products
+        self._snapshot = StoreSnapshot()
+        # receives an event for every price change when set
+        self.changes: Optional[ChangeLog] = None
         self.load()
 
+    @property
+    def products(self) -> List[Product]:
+        with self._lock:
+            return list(self._items.values())
+
+    @products.setter
+    def products(self, products: List[Product]) -> None:
+        with self._lock:
+            self._items = {}
+            self._by_url = {}
+            self._by_shop = {}
+            for product in products:
+                self._insert(product)
+            self._publish()
+
+    def snapshot(self) -> StoreSnapshot:
+        """Return the products as of the last completed change.
+
+        Changes made inside a ``batch`` are published when it ends.
+        """
+        return self._snapshot
+
+    def _publish(self) -> None:
+        if self._snapshot.version == self.version:
+            return
+        by_url = {url: tuple(same) for url, same in self._by_url.items()}
+        self._snapshot = StoreSnapshot(tuple(self._items.values()),
+                                       MappingProxyType(by_url),
+                                       self.version)
+
+    @property
+    def _batch_depth(self) -> int:
+        return getattr(self._local, 'depth', 0)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, product: Product) -> bool:
+        return self._items.get(id(product)) is product
+
+    def _insert(self, product: Product) -> None:
+        self.version += 1
+        key = id(product)
+        self._items[key] = product
+        self._by_url.setdefault(product.url, []).append(product)
+        self._by_shop.setdefault(product.shop, {})[key] = product
+
+    def _discard(self, product: Product) -> None:
+        self.version += 1
+        key = id(product)
+        del self._items[key]
+        # equal duplicates are allowed, so match by identity
+        same_url = [p for p in self._by_url[product.url] if p is not product]
+        if same_url:
+            self._by_url[product.url] = same_url
+        else:
+            del self._by_url[product.url]
+        shop = self._by_shop[product.shop]
+        del shop[key]
+        if not shop:
+            del self._by_shop[product.shop]
+
     def load(self) -> None:
+        with self._lock:
+            self._load()
+
+    def _load(self) -> None:
         if not self.path.exists():
             self.products = []
             return
         data = json.loads(self.path.read_text())
-        self.products = []
+        products = []
         for item in data.get('products', []):
             if 'selector' not in item:
                 item['selector'] = ''
-            self.products.append(Product(**item))
+            if self.history is not None:
+                item['price_history'] = self._open_history(
+                    item['url'], item['selector'],
+                    item.get('price_history', []))
+            item['stats'] = PriceStats.from_dict(item.get('stats'))
+            products.append(Product(**item))
+        self.products = products
+
+    def _open_history(self, url: str, selector: str,
+                      inline: Sequence[float]) -> PriceHistory:
+        """Return the history of a product, moving ``inline`` prices to disk.
+
+        A segment still keyed by the URL alone is taken over by the first
+        product at that URL.
+        """
+        key = history_key(url, selector)
+        if not self.history.exists(key):
+            if key != url and self.history.exists(url):
+                self.history.rename(url, key)
+            elif inline:
+                self.history.write(key, [(0.0, price) for price in inline])
+        return self.history.open(key)
+
+    def _to_dict(self, product: Product) -> Dict[str, Any]:
+        data = dict(vars(product))
+        if self.history is not None:
+            del data['price_history']
+        else:
+            data['price_history'] = list(product.price_history)
+        if product.stats is None:
+            del data['stats']
+        else:
+            data['stats'] = product.stats.to_dict()
+        return data
 
     def save(self) -> None:
-        data = {'products': [vars(p) for p in self.products]}
-        self.path.write_text(json.dumps(data, indent=2))
+        with self._lock:
+            data = {'products': [self._to_dict(p)
+                                 for p in self._items.values()]}
+            # write to a temporary file first so a crash never leaves a
+            # truncated ``products.json`` behind
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            with registry.timer('price_tracker_persist_seconds'):
+                tmp.write_text(json.dumps(data, indent=2))
+                os.replace(tmp, self.path)
+            self._dirty = False
+
+    def _changed(self) -> None:
+        if self._batch_depth:
+            self._dirty = True
+        else:
+            self._publish()
+            self.save()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Persist all changes made inside the block at once.
+
+        Batches are per thread: changes made by other threads meanwhile
+        are saved as usual (together with this batch's so far).
+        """
+        self._local.depth = self._batch_depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth -= 1
+            if not self._batch_depth:
+                with self._lock:
+                    self._publish()
+                    if self._dirty:
+                        self.save()
 
     def add(self, product: Product) -> None:
-        self.products.append(product)
-        self.save()
-
-    def find_by_url(self, url: str) -> Product:
-        for p in self.products:
-            if p.url == url:
-                return p
-        raise ValueError(f'Product with url {url} not found')
-
-    def update_price(self, product: Product, new_price: float) -> None:
-        product.price_history.append(new_price)
-        product.last_price = new_price
-        self.save()
-
-    def remove(self, url: str) -> None:
-        """Remove a product matching ``url`` from the store."""
-        for i, prod in enumerate(self.products):
-            if prod.url == url:
-                del self.products[i]
-                self.save()
+        with self._lock:
+            if self.history is not None and not isinstance(
+                    product.price_history, PriceHistory):
+                now = time.time()
+                key = history_key(product.url, product.selector)
+                self.history.write(key,
+                                   [(now, p) for p in product.price_history])
+                product.price_history = self.history.open(key)
+            self.stats_for(product)
+            self._insert(product)
+            self._changed()
+
+    def find_by_url(self, url: str, selector: Optional[str] = None
+                    ) -> Product:
+        """Return the first product at ``url`` using ``selector``, if given."""
+        with self._lock:
+            return _first_match(self._by_url.get(url, ()), url, selector)
+
+    def products_for_url(self, url: str) -> List[Product]:
+        """Return all products tracked at ``url``."""
+        with self._lock:
+            return list(self._by_url.get(url, ()))
+
+    def products_for_shop(self, name: str) -> List[Product]:
+        """Return all products belonging to shop ``name``."""
+        with self._lock:
+            return list(self._by_shop.get(name, {}).values())
+
+    def shop_names(self) -> List[str]:
+        """Return names of shops referenced by at least one product."""
+        with self._lock:
+            return list(self._by_shop)
+
+    def rename_shop(self, old_name: str, new_name: str) -> None:
+        """Move all products of ``old_name`` to ``new_name``."""
+        with self._lock:
+            moved = self._by_shop.pop(old_name, None)
+            if not moved:
                 return
-        raise ValueError(f'Product with url {url} not found')
+            for product in moved.values():
+                product.shop = new_name
+            self._by_shop.setdefault(new_name, {}).update(moved)
+            self._changed()
+
+    def stats_for(self, product: Product) -> PriceStats:
+        """Return the statistics of ``product``.
+
+        Products saved before statistics were kept get them computed from
+        their history once; after that ``update_price`` maintains them.
+        """
+        if product.stats is None:
+            product.stats = PriceStats.from_history(product.price_history)
+        return product.stats
+
+    def update_price(self, product: Product, new_price: float) -> bool:
+        """Record ``new_price``; return whether it is the lowest ever.
+
+        Prices of products removed meanwhile are dropped.
+        """
+        with self._lock:
+            if product not in self:
+                return False
+            now = time.time()
+            lowest = self.stats_for(product).add(new_price, now)
+            append_price(product.price_history, new_price, now)
+            self._log_change(product, new_price, now, lowest)
+            product.last_price = new_price
+            self._changed()
+            return lowest
+
+    def _log_change(self, product: Product, new_price: float,
+                    timestamp: float, lowest: bool) -> None:
+        """Append a change event unless the price stayed the same.
+
+        Events are written right away, also inside ``batch`` blocks.
+        """
+        if self.changes is None or new_price == product.last_price:
+            return
+        self.changes.append({'time': timestamp, 'url': product.url,
+                             'name': product.name, 'shop': product.shop,
+                             'old': product.last_price, 'new': new_price,
+                             'lowest': lowest})
+
+    def remove(self, url: str, selector: Optional[str] = None) -> None:
+        """Remove a product matching ``url`` and ``selector``, if given."""
+        with self._lock:
+            product = self.find_by_url(url, selector)
+            self._discard(product)
+            if self.history is not None and not any(
+                    p.selector == product.selector
+                    for p in self._by_url.get(url, ())):
+                self.history.remove(history_key(url, product.selector))
+            self._changed()
+
+
+def open_store(path: Path,
+               history_dir: Optional[Path] = None) -> ProductStore:
+    """Return a product store for ``path`` choosing the backend by suffix.
+
+    ``history_dir`` is only used by the JSON backend; the SQLite backend
+    keeps price history in its own table.
+    """
+    if path.suffix in ('.db', '.sqlite', '.sqlite3'):
+        from .sqlite_store import SqliteProductStore
+        return SqliteProductStore(path)
+    return ProductStore(path, history_dir)
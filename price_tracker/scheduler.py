@@ -0,0 +1,102 @@
+import heapq
+import itertools
+import random
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .concurrency import host_of
+from .products import Product
+
+
+class Scheduler:
+    """Priority queue of products ordered by the time they are next due.
+
+    ``interval_for`` returns the check interval of a product in seconds.
+    Each new due time is moved by a random fraction (``jitter``) of that
+    interval so that checks do not arrive in bursts, and requests to one
+    host are spaced at least ``host_delay`` seconds apart.
+    """
+
+    def __init__(self, interval_for: Callable[[Product], float],
+                 jitter: float = 0.1, host_delay: float = 0.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 rng: Optional[random.Random] = None) -> None:
+        self.interval_for = interval_for
+        self.jitter = jitter
+        self.host_delay = host_delay
+        self.clock = clock
+        self._rng = rng or random.Random()
+        self._heap: List[Tuple[float, int, int, Product]] = []
+        self._seq = itertools.count()
+        # products currently known to the scheduler; heap entries of
+        # products no longer listed here are skipped when popped
+        self._scheduled: Dict[int, Product] = {}
+        self._host_ready: Dict[str, float] = {}
+        # ``ProductStore.version`` seen by the last ``sync`` (set by callers)
+        self.version = -1
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+    def _push(self, due: float, product: Product) -> None:
+        heapq.heappush(self._heap, (due, next(self._seq), id(product), product))
+
+    def add(self, product: Product, due: Optional[float] = None) -> None:
+        """Schedule a new product.
+
+        Without ``due`` the first check is spread over the jitter window.
+        """
+        if due is None:
+            spread = self.jitter * self.interval_for(product)
+            due = self.clock() + self._rng.uniform(0, spread)
+        self._scheduled[id(product)] = product
+        self._push(due, product)
+
+    def discard(self, product: Product) -> None:
+        self._scheduled.pop(id(product), None)
+
+    def sync(self, products: Iterable[Product]) -> None:
+        """Schedule new ``products`` and forget the ones no longer listed."""
+        current = {id(p): p for p in products}
+        for key in list(self._scheduled):
+            if current.get(key) is not self._scheduled[key]:
+                del self._scheduled[key]
+        for key, product in current.items():
+            if key not in self._scheduled:
+                self.add(product)
+
+    def next_due(self) -> Optional[float]:
+        while self._heap:
+            due, _, key, product = self._heap[0]
+            if self._scheduled.get(key) is product:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: Optional[float] = None) -> List[Product]:
+        """Return products that are due and whose host may be contacted."""
+        now = self.clock() if now is None else now
+        ready = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key, product = heapq.heappop(self._heap)
+            if self._scheduled.get(key) is not product:
+                continue
+            host = host_of(product.url)
+            slot = self._host_ready.get(host, 0.0)
+            if slot > now:
+                self._push(slot, product)
+                continue
+            self._host_ready[host] = now + self.host_delay
+            ready.append(product)
+        return ready
+
+    def reschedule(self, products: Iterable[Product],
+                   now: Optional[float] = None) -> None:
+        """Put checked ``products`` back with their next due time."""
+        now = self.clock() if now is None else now
+        for product in products:
+            if self._scheduled.get(id(product)) is not product:
+                continue
+            interval = self.interval_for(product)
+            offset = self._rng.uniform(-self.jitter, self.jitter) * interval
+            self._push(now + interval + offset, product)
@@ -0,0 +1,140 @@
+import codecs
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from .concurrency import host_of
+from .metrics import registry
+
+
+def _accept_encoding() -> str:
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+        except ImportError:
+            return 'gzip, deflate'
+    return 'gzip, deflate, br'
+
+
+@dataclass
+class HttpConfig:
+    pool_connections: int = 10
+    pool_maxsize: int = 10
+    connect_timeout: float = 5.0
+    read_timeout: float = 20.0
+    user_agent: str = 'price-tracker/1.0'
+    # ``(connect, read)`` timeouts of hosts that need other limits
+    host_timeouts: Dict[str, Tuple[float, float]] = field(
+        default_factory=dict)
+    # read product pages incrementally, stopping once the price markup has
+    # been seen (see ``GenericShop``) and after ``max_bytes`` at most
+    stream: bool = False
+    max_bytes: int = 5 * 1024 * 1024
+    chunk_size: int = 65536
+
+
+class SessionPool:
+    """Keep one keep-alive ``requests.Session`` per host.
+
+    ``requests`` itself is imported when the first session is created.
+    """
+
+    def __init__(self, config: Optional[HttpConfig] = None) -> None:
+        self.config = config or HttpConfig()
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, 'requests.Session'] = {}
+
+    def _new_session(self) -> 'requests.Session':
+        import requests
+        from requests.adapters import HTTPAdapter
+        cfg = self.config
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=cfg.pool_connections,
+                              pool_maxsize=cfg.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'User-Agent': cfg.user_agent,
+            'Accept-Encoding': _accept_encoding(),
+        })
+        return session
+
+    def session_for(self, url: str) -> 'requests.Session':
+        host = host_of(url)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._new_session()
+                self._sessions[host] = session
+            return session
+
+    def get(self, url: str, **kwargs) -> 'requests.Response':
+        cfg = self.config
+        host = host_of(url)
+        kwargs.setdefault('timeout', cfg.host_timeouts.get(
+            host, (cfg.connect_timeout, cfg.read_timeout)))
+        with registry.timer('price_tracker_fetch_seconds', host=host):
+            response = self.session_for(url).get(url, **kwargs)
+        if not kwargs.get('stream'):
+            registry.observe('price_tracker_fetch_bytes',
+                             len(response.content), host=host)
+        return response
+
+    def configure(self, config: HttpConfig) -> None:
+        """Replace the configuration and drop existing sessions."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+            self.config = config
+        for session in sessions:
+            session.close()
+
+    def close(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+        for session in sessions:
+            session.close()
+
+
+def iter_text(response: 'requests.Response', max_bytes: int = 0,
+              chunk_size: int = 65536,
+              on_limit: Optional[Callable[[], None]] = None) -> Iterator[str]:
+    """Yield the body of a streamed ``response`` decoded chunk by chunk.
+
+    Reading stops after ``max_bytes`` (when non-zero), calling ``on_limit``
+    if the body was longer. The bytes read are recorded in
+    ``price_tracker_fetch_bytes`` when the iterator finishes or is closed.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(
+            response.encoding or 'utf-8')(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    read = 0
+    try:
+        for chunk in response.iter_content(chunk_size):
+            if max_bytes and read + len(chunk) >= max_bytes:
+                chunk = chunk[:max_bytes - read]
+                read += len(chunk)
+                if on_limit is not None:
+                    on_limit()
+                yield decoder.decode(chunk, final=True)
+                return
+            read += len(chunk)
+            yield decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+    finally:
+        registry.observe('price_tracker_fetch_bytes', read,
+                         host=host_of(response.url))
+
+
+# pool shared by all shop modules of the process
+default_pool = SessionPool()
+
+
+def get(url: str, **kwargs) -> 'requests.Response':
+    """Send a GET request through the shared session pool."""
+    return default_pool.get(url, **kwargs)
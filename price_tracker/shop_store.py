@@ -1,18 +1,28 @@
 import json
-from dataclasses import dataclass
+import os
+import threading
+from dataclasses import dataclass, replace
 from pathlib import Path
 from typing import Dict
 
-@dataclass
+@dataclass(frozen=True)
 class ShopDef:
     name: str
     selector: str
+    # seconds between checks of the shop's products; 0 means the default
+    interval: int = 0
 
 class ShopStore:
-    """Persist shop definitions to a JSON file."""
+    """Persist shop definitions to a JSON file.
+
+    Changes are serialized by a lock and replace ``shops`` with a new
+    dictionary, so readers can use it without locking; it is never
+    modified in place.
+    """
 
     def __init__(self, path: Path) -> None:
         self.path = path
+        self._lock = threading.RLock()
         self.shops: Dict[str, ShopDef] = {}
         self.load()
 
@@ -21,36 +31,52 @@ class ShopStore:
             self.shops = {}
             return
         data = json.loads(self.path.read_text())
-        self.shops = {
-            name: ShopDef(name=name, selector=sel)
-            for name, sel in data.get('shops', {}).items()
-        }
+        shops = {}
+        for name, value in data.get('shops', {}).items():
+            # plain selector strings are the original format
+            if isinstance(value, str):
+                value = {'selector': value}
+            shops[name] = ShopDef(name=name, **value)
+        self.shops = shops
 
     def save(self) -> None:
-        data = {'shops': {name: shop.selector for name, shop in self.shops.items()}}
-        self.path.write_text(json.dumps(data, indent=2))
+        with self._lock:
+            data = {'shops': {
+                name: ({'selector': shop.selector, 'interval': shop.interval}
+                       if shop.interval else shop.selector)
+                for name, shop in self.shops.items()
+            }}
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            tmp.write_text(json.dumps(data, indent=2))
+            os.replace(tmp, self.path)
 
-    def add(self, shop: ShopDef) -> None:
-        self.shops[shop.name] = shop
+    def _publish(self, shops: Dict[str, ShopDef]) -> None:
+        self.shops = shops
         self.save()
 
+    def add(self, shop: ShopDef) -> None:
+        with self._lock:
+            self._publish({**self.shops, shop.name: shop})
+
     def update(self, shop: ShopDef) -> None:
-        self.shops[shop.name] = shop
-        self.save()
+        with self._lock:
+            self._publish({**self.shops, shop.name: shop})
 
     def remove(self, name: str) -> None:
-        if name not in self.shops:
-            raise ValueError(f'Shop {name} not found')
-        del self.shops[name]
-        self.save()
+        with self._lock:
+            if name not in self.shops:
+                raise ValueError(f'Shop {name} not found')
+            shops = dict(self.shops)
+            del shops[name]
+            self._publish(shops)
 
     def rename(self, old_name: str, new_name: str) -> None:
         """Rename a shop definition."""
-        if old_name not in self.shops:
-            raise ValueError(f'Shop {old_name} not found')
-        if new_name in self.shops:
-            raise ValueError(f'Shop {new_name} already exists')
-        shop = self.shops.pop(old_name)
-        shop.name = new_name
-        self.shops[new_name] = shop
-        self.save()
+        with self._lock:
+            if old_name not in self.shops:
+                raise ValueError(f'Shop {old_name} not found')
+            if new_name in self.shops:
+                raise ValueError(f'Shop {new_name} already exists')
+            shops = dict(self.shops)
+            shops[new_name] = replace(shops.pop(old_name), name=new_name)
+            self._publish(shops)
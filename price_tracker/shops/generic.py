@@ -1,30 +1,35 @@
 import re
 import json
-import requests
-from bs4 import BeautifulSoup
+from functools import lru_cache
+from typing import Dict, List, Optional, Pattern, Sequence, Union
 
+from .. import sessions
+from ..archive import PageArchive
+from ..metrics import registry
+from ..page_cache import CacheEntry, PageCache
+from ..pricing import PriceParser, parse_price
 from .base import ShopModule
 
+_SIMPLE_SELECTOR_RE = re.compile(
+    r'^([a-zA-Z][\w-]*)?(#[\w-]+)?((?:\.[\w-]+)*)$')
+_JSONLD_RE = re.compile(
+    r'<script[^>]*application/ld\+json[^>]*>(.*?)</script\s*>', re.I | re.S)
+_JSONLD_OPEN_RE = re.compile(r'<script[^>]*application/ld\+json[^>]*>', re.I)
+_TAG_NAME_RE = re.compile(r'<([a-zA-Z][\w-]*)')
+_VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img',
+                        'input', 'link', 'meta', 'source', 'track', 'wbr'))
+_CURRENT_PRICE_RE = re.compile(r'"current_price"\s*:\s*"?([0-9.,]+)"?')
+_PRICE_RE = re.compile(r'"price"\s*:\s*"?([0-9.,]+)"?')
 
-def parse_price(text: str) -> float:
-    """Clean a price string and convert it to ``float``.
 
-    The function removes currency identifiers (zł, PLN, €, $, etc.),
-    strips whitespace, replaces comma with a dot and removes thousands
-    separators (space or non‑breaking space).
-    """
-    cleaned = text.strip()
-    cleaned = re.sub(r"(?i)(zł|pln|eur|euro|usd|\$|€|gbp|£)", "", cleaned)
-    cleaned = cleaned.replace("\xa0", "").replace(" ", "")
-    cleaned = cleaned.replace(",", ".")
-    cleaned = re.sub(r"[^0-9.\-]", "", cleaned)
-    cleaned = cleaned.strip(".")
-    if cleaned.count(".") > 1:
-        last = cleaned.rfind(".")
-        cleaned = cleaned[:last].replace(".", "") + cleaned[last:]
-    if not cleaned or cleaned == ".":
-        raise ValueError(f"Could not parse price: {text}")
-    return float(cleaned)
+@lru_cache(maxsize=None)
+def _html_parser() -> str:
+    """Return ``'lxml'`` when it is installed, else ``'html.parser'``."""
+    try:
+        import lxml  # noqa: F401
+        return 'lxml'
+    except ImportError:
+        return 'html.parser'
 
 
 def _find_price_in_json(data):
@@ -49,22 +54,384 @@ def _find_price_in_json(data):
                 return found
     return None
 
+def _record_path(path: str) -> None:
+    registry.inc('price_tracker_extractions_total', path=path)
+
+
+def _price_from_jsonld(text: Optional[str]) -> Optional[float]:
+    if not text:
+        return None
+    try:
+        data = json.loads(text)
+    except Exception:
+        return None
+    val = _find_price_in_json(data)
+    if val is None:
+        return None
+    return parse_price(str(val))
+
+
+def _price_from_jsonld_markup(html: str) -> Optional[float]:
+    """Read JSON-LD blocks directly from the markup without parsing it."""
+    if 'ld+json' not in html:
+        return None
+    for match in _JSONLD_RE.finditer(html):
+        price = _price_from_jsonld(match.group(1))
+        if price is not None:
+            return price
+    return None
+
+
+def _strainer_for(selector: str) -> Optional['SoupStrainer']:
+    """Return a strainer for a single ``tag#id.class`` selector.
+
+    ``None`` means the selector is too complex to restrict the parse.
+    """
+    match = _SIMPLE_SELECTOR_RE.match(selector.strip())
+    if not match or not any(match.groups()):
+        return None
+    tag, id_, classes = match.groups()
+    attrs = {}
+    if id_:
+        attrs['id'] = id_[1:]
+    if classes:
+        # any of the classes will do, ``select_one`` checks the rest
+        attrs['class'] = classes[1:].split('.')[0]
+    from bs4 import SoupStrainer
+    return SoupStrainer(tag or True, attrs)
+
+
+def _prescan_patterns(selector: str) -> List[Pattern]:
+    """Return regexes that must all match a page containing ``selector``.
+
+    They check cheaply whether the id and classes of a simple selector
+    occur in the markup as attribute values.
+    """
+    match = _SIMPLE_SELECTOR_RE.match(selector.strip())
+    if not match:
+        return []
+    tag, id_, classes = match.groups()
+    patterns = []
+    if id_:
+        patterns.append(re.compile(
+            r'\bid\s*=\s*["\']?' + re.escape(id_[1:]) + r'(?![\w-])'))
+    for name in classes[1:].split('.') if classes else ():
+        patterns.append(re.compile(
+            r'\bclass\s*=\s*["\']?(?:[^"\'>]*\s)?' + re.escape(name)
+            + r'(?![\w-])'))
+    return patterns
+
+
+@lru_cache(maxsize=256)
+def _tag_re(name: str) -> Pattern:
+    return re.compile(r'<(/?)' + re.escape(name) + r'(?=[\s/>])[^>]*>', re.I)
+
+
+class PageWatch:
+    """Tell when a page arriving in chunks has shown its price markup.
+
+    ``feed`` returns ``True`` once the first element matching a simple
+    ``tag#id.class`` selector has been closed, or a JSON-LD block carrying
+    a price has ended. Only the part of the page still needed for that is
+    kept, so a long page is scanned once.
+    """
+
+    # kept before the scan positions for tags cut by a chunk boundary
+    OVERLAP = 4096
+
+    def __init__(self, selector: str) -> None:
+        match = _SIMPLE_SELECTOR_RE.match(selector.strip())
+        simple = bool(match and any(match.groups()))
+        self._tag = match.group(1).lower() if simple and match.group(1) \
+            else None
+        self._patterns = _prescan_patterns(selector) if simple else []
+        self._watch_element = simple
+        self._buffer = ''
+        self._element_pos = 0
+        self._jsonld_pos = 0
+        # name and nesting depth of the matching element once opened
+        self._name: Optional[str] = None
+        self._depth = 0
+
+    def feed(self, chunk: str) -> bool:
+        self._buffer += chunk
+        if self._element_closed() or self._jsonld_closed():
+            return True
+        keep = max(0, min(self._element_pos, self._jsonld_pos) - self.OVERLAP)
+        if keep:
+            self._buffer = self._buffer[keep:]
+            self._element_pos -= keep
+            self._jsonld_pos -= keep
+        return False
+
+    def _open_tag(self) -> bool:
+        """Look for the opening tag of the element; ``True`` if void."""
+        buffer = self._buffer
+        if self._patterns:
+            first, rest = self._patterns[0], self._patterns[1:]
+            for match in first.finditer(buffer, self._element_pos):
+                start = buffer.rfind('<', 0, match.start())
+                end = buffer.find('>', match.end())
+                if end < 0:
+                    self._element_pos = max(start, 0)
+                    return False
+                tag = buffer[start:end + 1]
+                name = _TAG_NAME_RE.match(tag)
+                if start < 0 or name is None:
+                    continue
+                if self._tag and name.group(1).lower() != self._tag:
+                    continue
+                if all(p.search(tag) for p in rest):
+                    return self._opened(name.group(1).lower(), tag, end + 1)
+            self._element_pos = max(self._element_pos,
+                                    len(buffer) - self.OVERLAP)
+            return False
+        match = _tag_re(self._tag).search(buffer, self._element_pos)
+        while match is not None and match.group(1):
+            match = _tag_re(self._tag).search(buffer, match.end())
+        if match is None:
+            self._element_pos = max(self._element_pos,
+                                    len(buffer) - self.OVERLAP)
+            return False
+        return self._opened(self._tag, match.group(0), match.end())
+
+    def _opened(self, name: str, tag: str, end: int) -> bool:
+        self._name = name
+        self._depth = 1
+        self._element_pos = end
+        return name in _VOID_TAGS or tag.endswith('/>')
+
+    def _element_closed(self) -> bool:
+        if not self._watch_element:
+            return False
+        if self._name is None:
+            if self._open_tag():
+                return True
+            if self._name is None:
+                return False
+        for match in _tag_re(self._name).finditer(self._buffer,
+                                                  self._element_pos):
+            self._element_pos = match.end()
+            if match.group(1):
+                self._depth -= 1
+                if not self._depth:
+                    return True
+            elif not match.group(0).endswith('/>'):
+                self._depth += 1
+        return False
+
+    def _jsonld_closed(self) -> bool:
+        buffer = self._buffer
+        for match in _JSONLD_RE.finditer(buffer, self._jsonld_pos):
+            self._jsonld_pos = match.end()
+            if _price_from_jsonld(match.group(1)) is not None:
+                return True
+        # wait at an unfinished block, otherwise only keep a short tail
+        opened = _JSONLD_OPEN_RE.search(buffer, self._jsonld_pos)
+        self._jsonld_pos = (opened.start() if opened else
+                            max(self._jsonld_pos, len(buffer) - self.OVERLAP))
+        return False
+
+
 class GenericShop(ShopModule):
     """Shop module defined by a CSS selector."""
 
-    def __init__(self, selector: str) -> None:
+    def __init__(self, selector: str, cache: Optional[PageCache] = None,
+                 prices: Optional[PriceParser] = None,
+                 archive: Optional[PageArchive] = None) -> None:
         self.selector = selector
+        self.cache = cache
+        # keeps the downloaded pages for offline re-extraction (optional)
+        self.archive = archive
+        # learns the number format of the shop's price elements
+        self.prices = prices or PriceParser()
+        # everything derived from the selector is prepared on first use,
+        # so that registering shops does not import bs4 and soupsieve
+        self._prepared = False
+
+    def _prepare(self) -> None:
+        import soupsieve
+        self._strainer = _strainer_for(self.selector)
+        self._prescan = _prescan_patterns(self.selector)
+        try:
+            self._matcher = soupsieve.compile(self.selector)
+        except Exception:
+            # invalid selectors fail when used, as they always did
+            self._matcher = None
+        self._prepared = True
+
+    def __getstate__(self):
+        # compiled matchers, the cache and the archive stay in the owning
+        # process; ``workers.check_shard`` gives workers their own
+        return {'selector': self.selector,
+                'format': self.prices.format}
+
+    def __setstate__(self, state):
+        self.__init__(state['selector'],
+                      prices=PriceParser(state.get('format')))
+
+    def _select(self, soup):
+        if not self._prepared:
+            self._prepare()
+        if self._matcher is not None:
+            return self._matcher.select_one(soup)
+        return soup.select_one(self.selector)
 
     def get_price(self, url: str) -> float:
-        response = requests.get(url)
+        if sessions.default_pool.config.stream:
+            return self._get_price_streamed(url)
+        if self.cache is None:
+            response = sessions.get(url)
+            response.raise_for_status()
+            html = self._archived(url, response.text)
+            with registry.timer('price_tracker_parse_seconds'):
+                return self.extract_price(html)
+
+        entry = self.cache.lookup(url, self.selector)
+        response = sessions.get(url,
+                                headers=self.cache.request_headers(entry))
+        if response.status_code == 304 and entry is not None:
+            self.cache.record_hit()
+            _record_path('not-modified')
+            return entry.price
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        element = soup.select_one(self.selector)
+        html = self._archived(url, response.text)
+        with registry.timer('price_tracker_parse_seconds'):
+            price = self.extract_price(html)
+        self.cache.store(url, self.selector, price,
+                         response.headers.get('ETag'),
+                         response.headers.get('Last-Modified'))
+        return price
+
+    def _get_price_streamed(self, url: str) -> float:
+        entry = None
+        headers = {}
+        if self.cache is not None:
+            entry = self.cache.lookup(url, self.selector)
+            headers = self.cache.request_headers(entry)
+        response = sessions.get(url, headers=headers, stream=True)
+        try:
+            if response.status_code == 304 and entry is not None:
+                self.cache.record_hit()
+                _record_path('not-modified')
+                return entry.price
+            response.raise_for_status()
+            price = self._read_price(url, response)
+        finally:
+            response.close()
+        if self.cache is not None:
+            self.cache.store(url, self.selector, price,
+                             response.headers.get('ETag'),
+                             response.headers.get('Last-Modified'))
+        return price
+
+    def _archived(self, url: str, html: str) -> str:
+        if self.archive is not None:
+            self.archive.put(url, html)
+        return html
+
+    def _read_price(self, url: str, response) -> float:
+        """Read ``response`` until its price markup is complete.
 
-        price_text = (element.text or '').strip() if element else ''
+        The page is archived only when it was read to its end.
+        """
+        config = sessions.default_pool.config
+        cut: List[bool] = []
+        chunks = sessions.iter_text(response, config.max_bytes,
+                                    config.chunk_size,
+                                    on_limit=lambda: cut.append(True))
+        watch: Optional[PageWatch] = PageWatch(self.selector)
+        parts: List[str] = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                if watch is not None and watch.feed(chunk):
+                    try:
+                        with registry.timer('price_tracker_parse_seconds'):
+                            return self.extract_price(''.join(parts))
+                    except ValueError:
+                        # the price was not readable from what arrived so
+                        # far; fall back to reading the rest of the page
+                        watch = None
+        finally:
+            chunks.close()
+        html = ''.join(parts)
+        if not cut:
+            self._archived(url, html)
+        with registry.timer('price_tracker_parse_seconds'):
+            return self.extract_price(html)
+
+    def extract_price(self, html: str) -> float:
+        """Return the price found in the ``html`` of a product page.
+
+        The selector is first looked up in a tree restricted to matching
+        elements and JSON-LD blocks are read straight from the markup; the
+        whole page is parsed only when both of these come up empty.
+        """
+        from bs4 import BeautifulSoup
+        if not self._prepared:
+            self._prepare()
+        strainer = self._strainer
+        element = None
+        if strainer is None:
+            soup = BeautifulSoup(html, _html_parser())
+            element = self._select(soup)
+        elif all(p.search(html) for p in self._prescan):
+            soup = BeautifulSoup(html, _html_parser(), parse_only=strainer)
+            element = self._select(soup)
+
+        price = self._price_from_element(element)
+        if price is not None:
+            _record_path('element' if strainer is None else 'strained')
+            return price
+
+        price = _price_from_jsonld_markup(html)
+        if price is not None:
+            _record_path('json-ld-scan')
+            return price
+
+        if strainer is not None and element is None:
+            return self.extract_price_full(html)
+        if element is None:
+            raise ValueError(f'Price element not found using selector {self.selector}')
+        raise ValueError('Price not found in element or JSON-LD')
+
+    def extract_price_full(self, html: str) -> float:
+        """Extract the price by parsing the complete document."""
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser')
+        element = self._select(soup)
+
+        price = self._price_from_element(element)
+        if price is not None:
+            _record_path('full')
+            return price
+
+        # Fallback to JSON-LD scripts
+        for script in soup.find_all('script', type='application/ld+json'):
+            price = _price_from_jsonld(script.string)
+            if price is not None:
+                _record_path('full')
+                return price
+
+        if element is None:
+            raise ValueError(f'Price element not found using selector {self.selector}')
+        raise ValueError('Price not found in element or JSON-LD')
+
+    def _price_from_soup(self, soup) -> Optional[float]:
+        try:
+            return self._price_from_element(self._select(soup))
+        except Exception:
+            # e.g. an invalid selector; ``extract_price_full`` reports it
+            return None
+
+    def _price_from_element(self, element) -> Optional[float]:
+        if element is None:
+            return None
+        price_text = (element.text or '').strip()
         if price_text:
             try:
-                price = parse_price(price_text)
+                price = self.prices.parse(price_text).value
                 if price:
                     return price
             except Exception:
@@ -72,29 +439,135 @@ class GenericShop(ShopModule):
 
         # Fallback: some shops store the price in data attributes like
         # "data-product-gtm" as JSON with fields such as "current_price".
-        if element:
-            for attr in ('data-product-gtm', 'data-product', 'data-gtm'):
-                attr_val = element.get(attr)
-                if not attr_val:
-                    continue
-                match = re.search(r'"current_price"\s*:\s*"?([0-9.,]+)"?', attr_val)
-                if not match:
-                    match = re.search(r'"price"\s*:\s*"?([0-9.,]+)"?', attr_val)
-                if match:
-                    return parse_price(match.group(1))
-
-        # Fallback to JSON-LD scripts
-        for script in soup.find_all('script', type='application/ld+json'):
-            if not script.string:
-                continue
-            try:
-                data = json.loads(script.string)
-            except Exception:
+        for attr in ('data-product-gtm', 'data-product', 'data-gtm'):
+            attr_val = element.get(attr)
+            if not attr_val:
                 continue
-            val = _find_price_in_json(data)
-            if val is not None:
-                return parse_price(str(val))
+            match = _CURRENT_PRICE_RE.search(attr_val)
+            if not match:
+                match = _PRICE_RE.search(attr_val)
+            if match:
+                return parse_price(match.group(1))
+        return None
 
-        if element is None:
-            raise ValueError(f'Price element not found using selector {self.selector}')
-        raise ValueError('Price not found in element or JSON-LD')
+
+def extract_prices(html: str, shops: Sequence[GenericShop]
+                   ) -> List[Union[float, Exception]]:
+    """Return the price found by each of ``shops`` in one page.
+
+    The page is parsed once and every selector runs against the same
+    tree; JSON-LD is scanned at most once. Shops that find nothing fall
+    back to ``extract_price_full``. A single shop uses ``extract_price``.
+    Failures are returned, not raised.
+    """
+    if len(shops) == 1:
+        try:
+            return [shops[0].extract_price(html)]
+        except Exception as exc:
+            return [exc]
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, _html_parser())
+    jsonld: Optional[float] = None
+    scanned = False
+    results: List[Union[float, Exception]] = []
+    for shop in shops:
+        price = shop._price_from_soup(soup)
+        if price is not None:
+            _record_path('shared')
+            results.append(price)
+            continue
+        if not scanned:
+            jsonld, scanned = _price_from_jsonld_markup(html), True
+        if jsonld is not None:
+            _record_path('json-ld-scan')
+            results.append(jsonld)
+            continue
+        try:
+            results.append(shop.extract_price_full(html))
+        except Exception as exc:
+            results.append(exc)
+    return results
+
+
+def _shared_entries(cache: Optional[PageCache], url: str,
+                    shops: Sequence[GenericShop]
+                    ) -> Optional[List[CacheEntry]]:
+    """Return the cache entries of ``shops`` if all exist and carry the
+    same validators, so that one conditional request covers them."""
+    if cache is None:
+        return None
+    entries = [cache.lookup(url, shop.selector) for shop in shops]
+    first = entries[0]
+    if first is None or any(
+            entry is None or (entry.etag, entry.last_modified)
+            != (first.etag, first.last_modified) for entry in entries):
+        return None
+    return entries
+
+
+def get_prices(url: str, shops: Sequence[ShopModule]
+               ) -> List[Union[float, Exception]]:
+    """Check the page at ``url`` with each of ``shops``.
+
+    Generic shops share a single download and parse of the page; other
+    shop modules fetch it themselves. The result for each shop is its
+    price or the exception raised while checking it.
+    """
+    # the same extractor may be listed for several products; it runs once
+    distinct: Dict[int, ShopModule] = {}
+    for shop in shops:
+        distinct.setdefault(id(shop), shop)
+    generic = [shop for shop in distinct.values()
+               if isinstance(shop, GenericShop)]
+    prices: Dict[int, Union[float, Exception]] = {}
+    if len(generic) > 1:
+        prices.update(zip(map(id, generic), _shared_prices(url, generic)))
+    for key, shop in distinct.items():
+        if key in prices:
+            continue
+        try:
+            prices[key] = shop.get_price(url)
+        except Exception as exc:
+            prices[key] = exc
+    return [prices[id(shop)] for shop in shops]
+
+
+def _shared_prices(url: str, shops: List[GenericShop]
+                   ) -> List[Union[float, Exception]]:
+    # generic shops of one tracker share its page cache
+    cache = shops[0].cache
+    config = sessions.default_pool.config
+    entries = _shared_entries(cache, url, shops)
+    headers = cache.request_headers(entries[0]) if entries else {}
+    try:
+        response = sessions.get(url, headers=headers, stream=config.stream)
+        try:
+            if response.status_code == 304 and entries:
+                for entry in entries:
+                    cache.record_hit()
+                    _record_path('not-modified')
+                return [entry.price for entry in entries]
+            response.raise_for_status()
+            cut: List[bool] = []
+            if config.stream:
+                html = ''.join(sessions.iter_text(
+                    response, config.max_bytes, config.chunk_size,
+                    on_limit=lambda: cut.append(True)))
+            else:
+                html = response.text
+        finally:
+            response.close()
+    except Exception as exc:
+        return [exc] * len(shops)
+    if not cut:
+        # generic shops of one tracker share its archive as well
+        shops[0]._archived(url, html)
+    with registry.timer('price_tracker_parse_seconds'):
+        prices = extract_prices(html, shops)
+    if cache is not None:
+        for shop, price in zip(shops, prices):
+            if not isinstance(price, Exception):
+                cache.store(url, shop.selector, price,
+                            response.headers.get('ETag'),
+                            response.headers.get('Last-Modified'))
+    return prices
@@ -1,16 +1,15 @@
-import requests
-from bs4 import BeautifulSoup
-
+from .. import sessions
+from ..pricing import parser_for
 from .base import ShopModule
-from .generic import parse_price
 
 class ShopA(ShopModule):
     """Example shop implementation."""
 
     def get_price(self, url: str) -> float:
-        response = requests.get(url)
+        response = sessions.get(url)
         response.raise_for_status()
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(response.text, 'html.parser')
         # Example: price contained in span with class 'price'
         price_text = soup.select_one('span.price').text
-        return parse_price(price_text)
+        return parser_for('shop_a').parse(price_text).value
@@ -0,0 +1,284 @@
+import json
+import sqlite3
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .history import PriceHistory, append_price
+from .metrics import registry
+from .products import Product, ProductStore
+from .stats import PriceStats
+
+_PRODUCTS = '''(
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    name TEXT NOT NULL,
+    shop TEXT NOT NULL,
+    selector TEXT NOT NULL DEFAULT '',
+    last_price REAL NOT NULL DEFAULT 0,
+    interval INTEGER NOT NULL DEFAULT 0,
+    stats TEXT
+)'''
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS products {_PRODUCTS};
+CREATE TABLE IF NOT EXISTS observations (
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    ts REAL,
+    price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS observations_product
+    ON observations(product_id);
+'''
+
+# columns of ``products`` besides ``id``, in the order of ``_row``
+_COLUMNS = 'url, name, shop, selector, last_price, interval, stats'
+
+_INSERT = f'INSERT INTO products ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)'
+
+_UPDATE = '''
+UPDATE products SET url = ?, name = ?, shop = ?, selector = ?,
+    last_price = ?, interval = ?, stats = ?
+WHERE id = ?
+'''
+
+_OBSERVE = 'INSERT INTO observations (product_id, ts, price) VALUES (?, ?, ?)'
+
+
+class SqliteProductStore(ProductStore):
+    """Product store kept in an SQLite database running in WAL mode.
+
+    Every price update is stored as a separate row in ``observations``.
+    Inside a ``batch`` block all observations are written in a single
+    transaction when the block ends. Rows are keyed by their id, so several
+    products may share a URL.
+    """
+
+    def __init__(self, path: Path):
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in
+                   self._conn.execute('PRAGMA table_info(products)')}
+        if 'interval' not in columns:
+            # databases created before per-product intervals existed
+            self._conn.execute('ALTER TABLE products ADD COLUMN '
+                               'interval INTEGER NOT NULL DEFAULT 0')
+        if 'stats' not in columns:
+            # statistics are computed from the history on the next update
+            self._conn.execute('ALTER TABLE products ADD COLUMN stats TEXT')
+        self._drop_unique_url()
+        # row id of every stored product by ``id(product)``
+        self._row_ids: Dict[int, int] = {}
+        # products added and observations made since the last commit
+        self._new: List[Tuple[Product, Optional[float]]] = []
+        self._observations: List[Tuple[float | None, float, Product]] = []
+        super().__init__(path)
+
+    def _drop_unique_url(self) -> None:
+        """Rebuild ``products`` of databases that allowed one per URL."""
+        sql = self._conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'products'"
+        ).fetchone()[0]
+        if 'UNIQUE' not in sql:
+            return
+        # dropping the old table must not cascade to the observations
+        self._conn.execute('PRAGMA foreign_keys=OFF')
+        with self._conn:
+            self._conn.execute(f'CREATE TABLE products_new {_PRODUCTS}')
+            self._conn.execute(
+                f'INSERT INTO products_new (id, {_COLUMNS}) '
+                f'SELECT id, {_COLUMNS} FROM products')
+            self._conn.execute('DROP TABLE products')
+            self._conn.execute('ALTER TABLE products_new RENAME TO products')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def load(self) -> None:
+        with self._lock:
+            products = []
+            self._row_ids = {}
+            for row_id, name, url, shop, selector, last_price, interval, \
+                    stats in self._conn.execute(
+                        'SELECT id, name, url, shop, selector, last_price, '
+                        'interval, stats FROM products ORDER BY id'):
+                product = Product(
+                    name=name, url=url, shop=shop, selector=selector,
+                    price_history=self._open_history(row_id),
+                    last_price=last_price, interval=interval,
+                    stats=PriceStats.from_dict(
+                        json.loads(stats) if stats else None))
+                self._row_ids[id(product)] = row_id
+                products.append(product)
+            self.products = products
+
+    def _open_history(self, row_id: int) -> PriceHistory:
+        return PriceHistory(loader=lambda: self._read_history(row_id))
+
+    def _read_history(self, row_id: int) -> Tuple[array, array]:
+        timestamps = array('d')
+        prices = array('d')
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT ts, price FROM observations WHERE product_id = ? '
+                'ORDER BY rowid', (row_id,)).fetchall()
+            rows += [(ts, price) for ts, price, p in self._observations
+                     if self._row_ids.get(id(p)) == row_id]
+        for ts, price in rows:
+            timestamps.append(ts or 0.0)
+            prices.append(price)
+        return timestamps, prices
+
+    @staticmethod
+    def _row(product: Product
+             ) -> Tuple[str, str, str, str, float, int, Optional[str]]:
+        stats = product.stats
+        return (product.url, product.name, product.shop, product.selector,
+                product.last_price, product.interval,
+                json.dumps(stats.to_dict()) if stats else None)
+
+    def _insert_new(self,
+                    products: List[Tuple[Product, Optional[float]]]) -> None:
+        """Insert ``products`` with their whole price history."""
+        for product, _ in products:
+            cursor = self._conn.execute(_INSERT, self._row(product))
+            self._row_ids[id(product)] = cursor.lastrowid
+        self._conn.executemany(_OBSERVE, [
+            (self._row_ids[id(p)], ts, price)
+            for p, ts in products for price in p.price_history
+        ])
+
+    def _pending_observations(self) -> List[Tuple[int, float | None, float]]:
+        return [(self._row_ids[id(p)], ts, price)
+                for ts, price, p in self._observations
+                if id(p) in self._row_ids]
+
+    def save(self) -> None:
+        with self._lock, registry.timer('price_tracker_persist_seconds'), \
+                self._conn:
+            # prices recorded for products added in this batch are already
+            # part of the history ``_insert_new`` writes
+            observations = self._pending_observations()
+            # products assigned through ``products`` have no row yet either
+            pending = {id(p) for p, _ in self._new}
+            products = self.products
+            self._insert_new(self._new + [
+                (p, None) for p in products
+                if id(p) not in self._row_ids and id(p) not in pending])
+            self._row_ids = {id(p): self._row_ids[id(p)] for p in products}
+            self._conn.executemany(_UPDATE, [
+                self._row(p) + (self._row_ids[id(p)],) for p in products])
+            self._conn.executemany(_OBSERVE, observations)
+            self._new = []
+            self._observations = []
+            self._dirty = False
+
+    def add(self, product: Product) -> None:
+        self._add(product, time.time())
+
+    def _add(self, product: Product, timestamp: Optional[float]) -> None:
+        """Add ``product``; its initial history is stamped ``timestamp``."""
+        with self._lock:
+            self.stats_for(product)
+            self._insert(product)
+            if self._batch_depth:
+                self._new.append((product, timestamp))
+                self._dirty = True
+                return
+            with self._conn:
+                self._insert_new([(product, timestamp)])
+            self._publish()
+
+    def update_price(self, product: Product, new_price: float) -> bool:
+        with self._lock:
+            if product not in self:
+                return False
+            now = time.time()
+            lowest = self.stats_for(product).add(new_price, now)
+            self._log_change(product, new_price, now, lowest)
+            product.last_price = new_price
+            self._observations.append((now, new_price, product))
+            append_price(product.price_history, new_price, now)
+            if self._batch_depth:
+                self._dirty = True
+                return lowest
+            with registry.timer('price_tracker_persist_seconds'), \
+                    self._conn:
+                self._conn.executemany(_OBSERVE,
+                                       self._pending_observations())
+                self._conn.execute(
+                    'UPDATE products SET last_price = ?, stats = ? '
+                    'WHERE id = ?',
+                    (new_price, self._row(product)[-1],
+                     self._row_ids.get(id(product))))
+                self._observations = [o for o in self._observations
+                                      if id(o[2]) not in self._row_ids]
+            return lowest
+
+    def remove(self, url: str, selector: Optional[str] = None) -> None:
+        """Remove a product matching ``url`` and ``selector``, if given."""
+        with self._lock:
+            product = self.find_by_url(url, selector)
+            self._discard(product)
+            self._new = [n for n in self._new if n[0] is not product]
+            self._observations = [o for o in self._observations
+                                  if o[2] is not product]
+            row_id = self._row_ids.pop(id(product), None)
+            with self._conn:
+                self._conn.execute('DELETE FROM products WHERE id = ?',
+                                   (row_id,))
+            self._publish()
+
+    def rename_shop(self, old_name: str, new_name: str) -> None:
+        """Move all products of ``old_name`` to ``new_name``."""
+        with self._lock:
+            moved = self._by_shop.pop(old_name, None)
+            if not moved:
+                return
+            for product in moved.values():
+                product.shop = new_name
+            self._by_shop.setdefault(new_name, {}).update(moved)
+            if self._batch_depth:
+                self._dirty = True
+                return
+            with self._conn:
+                self._conn.execute(
+                    'UPDATE products SET shop = ? WHERE shop = ?',
+                    (new_name, old_name))
+
+
+def migrate_json(json_path: Path, db_path: Path) -> int:
+    """Copy products from a JSON store into an SQLite store.
+
+    Products already present in the database (same URL and selector) are
+    left untouched. Returns the number of imported products.
+    """
+    source = ProductStore(json_path)
+    target = SqliteProductStore(db_path)
+    known = {(p.url, p.selector) for p in target.products}
+    imported = 0
+    with target.batch():
+        for product in source.products:
+            if (product.url, product.selector) in known:
+                continue
+            # observation times are not known for histories kept in JSON
+            target._add(product, None)
+            known.add((product.url, product.selector))
+            imported += 1
+    target.close()
+    return imported
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('usage: python -m price_tracker.sqlite_store '
+                 'products.json products.db')
+    count = migrate_json(Path(sys.argv[1]), Path(sys.argv[2]))
+    print(f'Imported {count} products into {sys.argv[2]}')
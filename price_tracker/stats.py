@@ -0,0 +1,76 @@
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from .history import PriceHistory
+
+# number of observations covered by the short and long moving averages
+SHORT_SPAN = 7
+LONG_SPAN = 30
+
+
+@dataclass
+class PriceStats:
+    """Running aggregates of a product's price history.
+
+    ``add`` updates them in constant time, so trends and "lowest price
+    ever" checks never have to scan the history. Timestamps of ``0.0`` mean
+    unknown (histories kept without timestamps).
+    """
+    count: int = 0
+    low: float = 0.0
+    low_at: float = 0.0
+    high: float = 0.0
+    high_at: float = 0.0
+    mean: float = 0.0
+    # exponential moving averages over about SHORT_SPAN / LONG_SPAN checks
+    avg_short: float = 0.0
+    avg_long: float = 0.0
+    last: float = 0.0
+    # when the price last differed from the previous observation
+    last_change: float = 0.0
+
+    def add(self, price: float, timestamp: float = 0.0) -> bool:
+        """Fold in ``price``; return whether it is a new all-time low."""
+        self.count += 1
+        if self.count == 1:
+            self.low = self.high = self.mean = price
+            self.avg_short = self.avg_long = self.last = price
+            self.low_at = self.high_at = self.last_change = timestamp
+            return False
+        self.mean += (price - self.mean) / self.count
+        # plain averages until the span is filled, then exponential
+        self.avg_short += ((price - self.avg_short)
+                           * max(2 / (SHORT_SPAN + 1), 1 / self.count))
+        self.avg_long += ((price - self.avg_long)
+                          * max(2 / (LONG_SPAN + 1), 1 / self.count))
+        if price != self.last:
+            self.last_change = timestamp
+        self.last = price
+        if price > self.high:
+            self.high, self.high_at = price, timestamp
+        if price < self.low:
+            self.low, self.low_at = price, timestamp
+            return True
+        return False
+
+    @classmethod
+    def from_points(cls,
+                    points: Iterable[Tuple[float, float]]) -> 'PriceStats':
+        stats = cls()
+        for timestamp, price in points:
+            stats.add(price, timestamp)
+        return stats
+
+    @classmethod
+    def from_history(cls, history: Sequence[float]) -> 'PriceStats':
+        if isinstance(history, PriceHistory):
+            return cls.from_points(history.points())
+        return cls.from_points((0.0, price) for price in history)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]
+                  ) -> Optional['PriceStats']:
+        return cls(**data) if data else None
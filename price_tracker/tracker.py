@@ -1,14 +1,43 @@
+import math
+import multiprocessing
+import os
+import threading
 import time
+from collections import defaultdict, deque
+from concurrent.futures import (Future, ProcessPoolExecutor,
+                                ThreadPoolExecutor, as_completed)
 from pathlib import Path
-from typing import Dict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
 
 from .shop_store import ShopStore, ShopDef
-from .shops.generic import GenericShop
+from .shops.generic import GenericShop, get_prices
 
-from .products import Product, ProductStore
+from .archive import PageArchive, ReextractReport, ReextractResult
+from .bulk import ImportReport, import_products
+from .changes import ChangeLog
+from .concurrency import (CircuitBreaker, HostLimiter, HostUnavailable,
+                          host_of, is_host_failure)
+from .jobs import JobManager
+from .metrics import registry
+from .page_cache import PageCache
+from .pricing import parser_for
+from .products import Product, ProductStore, StoreSnapshot, open_store
+from .scheduler import Scheduler
+from .sessions import HttpConfig, default_pool
 from .notification import send_email
+from .notifier import Notifier, PriceDrop
 from .shops.base import ShopModule
 from .smtp_config import SmtpConfig, SmtpConfigStore
+from .workers import (Result, ShardResult, check_shard, extract_archived,
+                      to_exception)
+
+
+# archived pages re-extracted per worker task at least
+ARCHIVE_SHARD = 25
+# shortest pause of ``run`` between two rounds, and the longest one after
+# rounds that keep failing
+MIN_WAIT = 0.05
+MAX_BACKOFF = 60.0
 
 
 class PriceTracker:
@@ -16,37 +45,159 @@ class PriceTracker:
 
     def __init__(self, store_path: str, interval: int = 3600,
                  email: str | None = None, shops_path: str = 'shops.json',
-                 smtp_path: str = 'smtp.json') -> None:
-        self.store = ProductStore(Path(store_path))
+                 smtp_path: str = 'smtp.json', workers: int = 1,
+                 per_host: int = 2,
+                 http: HttpConfig | None = None,
+                 cache_path: str | None = None,
+                 cache_size: int = 10000,
+                 history_path: str | None = None,
+                 jitter: float = 0.1, host_delay: float = 0.0,
+                 save_interval: float = 60.0,
+                 notify_window: float = 30.0,
+                 processes: int = 0,
+                 max_failures: int = 5,
+                 failure_cooldown: float = 300.0,
+                 changes_path: str | None = None,
+                 archive_path: str | None = None,
+                 archive_size: int = 512 * 1024 * 1024,
+                 archive_age: float = 30 * 86400) -> None:
+        # the product store is loaded on first access, see ``store``
+        self._store_path = Path(store_path)
+        self._history_path = Path(history_path) if history_path else None
+        self._store: ProductStore | None = None
+        self._store_lock = threading.Lock()
+        # serializes changes to shops and products made from any thread;
+        # price updates are serialized by the store itself
+        self._write_lock = threading.RLock()
+        # JSONL feed of price changes (optional), see ``changes.ChangeLog``
+        self.changes = (ChangeLog(Path(changes_path)) if changes_path
+                        else None)
         self.shop_store = ShopStore(Path(shops_path))
         self.smtp_store = SmtpConfigStore(Path(smtp_path))
         self.shops: Dict[str, ShopModule] = {}
+        # prepared extractors keyed by (shop name, product selector)
+        self._extractors: Dict[Tuple[str, str], ShopModule] = {}
         self.interval = interval
         self.email = email
+        # number of products fetched at once by ``check_prices`` and the
+        # maximum number of simultaneous requests sent to a single host
+        self.workers = max(1, workers)
+        self.limiter = HostLimiter(per_host)
+        # hosts failing ``max_failures`` times in a row are skipped for
+        # ``failure_cooldown`` seconds, then probed with a single request
+        self.breaker = CircuitBreaker(max_failures, failure_cooldown)
+        # with ``processes`` > 0 pages are fetched and parsed in that many
+        # worker processes, each running ``workers / processes`` threads
+        self.processes = processes
+        self._process_pool: ProcessPoolExecutor | None = None
+        if http is not None:
+            default_pool.configure(http)
+        # conditional-GET cache shared by all generic shops (optional)
+        self.page_cache = (PageCache(Path(cache_path), cache_size)
+                           if cache_path else None)
+        # last fetched HTML per URL for ``reextract_shop`` (optional)
+        self.archive = (PageArchive(Path(archive_path), archive_size,
+                                    archive_age)
+                        if archive_path else None)
         # flag used by ``run`` to control automatic price checks
         self.paused = False
+        # due-time queue used by ``run``; results of scheduled checks are
+        # persisted at most once per ``save_interval`` seconds
+        self.scheduler = Scheduler(self.interval_for, jitter=jitter,
+                                   host_delay=host_delay)
+        self.save_interval = save_interval
+        # price drop emails are sent in digests from a background thread
+        # started on the first drop
+        self.notify_window = notify_window
+        self.notifier: Notifier | None = None
+        # serializes checks started by ``run``, ``check_prices`` and jobs
+        self._check_lock = threading.Lock()
+        # manual checks started from the web interface
+        self.jobs = JobManager(lambda: self.store.products, self._run_job)
 
         # load shops defined in ``shops.json``
         for name, shop_def in self.shop_store.shops.items():
-            self.register_shop(name, GenericShop(shop_def.selector))
+            self.register_shop(name, self._generic_shop(name,
+                                                        shop_def.selector))
+
+    @property
+    def store(self) -> ProductStore:
+        """The product store, loaded the first time it is needed."""
+        store = self._store
+        if store is None:
+            with self._store_lock:
+                if self._store is None:
+                    store = open_store(self._store_path, self._history_path)
+                    store.changes = self.changes
+                    self._store = store
+                store = self._store
+        return store
+
+    @property
+    def store_loaded(self) -> bool:
+        return self._store is not None
+
+    def _generic_shop(self, name: str, selector: str) -> GenericShop:
+        return GenericShop(selector, self.page_cache, parser_for(name),
+                           self.archive)
 
     def register_shop(self, name: str, shop: ShopModule) -> None:
-        self.shops[name] = shop
+        with self._write_lock:
+            # replaced rather than modified so that readers need no lock
+            self.shops = {**self.shops, name: shop}
+            self._invalidate_extractors(name)
+
+    def _invalidate_extractors(self, name: str) -> None:
+        with self._write_lock:
+            self._extractors = {key: module for key, module
+                                in self._extractors.items()
+                                if key[0] != name}
 
-    def add_shop(self, name: str, selector: str) -> None:
+    def extractor_for(self, product: Product) -> ShopModule:
+        """Return the shop module used to check ``product``.
+
+        The module registered for the product's shop is used unless the
+        product has its own selector, in which case a ``GenericShop`` for
+        that selector is prepared once and reused.
+        """
+        key = (product.shop, product.selector)
+        extractor = self._extractors.get(key)
+        if extractor is None:
+            with self._write_lock:
+                module = self.shops.get(product.shop)
+                if module is None or (product.selector and not (
+                        isinstance(module, GenericShop)
+                        and module.selector == product.selector)):
+                    module = self._generic_shop(product.shop,
+                                                product.selector)
+                extractor = self._extractors[key] = module
+        return extractor
+
+    def add_shop(self, name: str, selector: str, interval: int = 0) -> None:
         """Add a new shop defined by ``selector``."""
-        self.register_shop(name, GenericShop(selector))
-        self.shop_store.add(ShopDef(name=name, selector=selector))
+        with self._write_lock:
+            self.register_shop(name, self._generic_shop(name, selector))
+            self.shop_store.add(ShopDef(name=name, selector=selector,
+                                        interval=interval))
 
-    def update_shop(self, name: str, selector: str) -> None:
+    def update_shop(self, name: str, selector: str,
+                    interval: int = 0) -> None:
         """Update an existing shop."""
-        self.register_shop(name, GenericShop(selector))
-        self.shop_store.update(ShopDef(name=name, selector=selector))
+        with self._write_lock:
+            self.register_shop(name, self._generic_shop(name, selector))
+            self.shop_store.update(ShopDef(name=name, selector=selector,
+                                           interval=interval))
 
-    def rename_shop(self, old_name: str, new_name: str, selector: str) -> None:
+    def rename_shop(self, old_name: str, new_name: str, selector: str,
+                    interval: int = 0) -> None:
         """Rename a shop and optionally update its selector."""
+        with self._write_lock:
+            self._rename_shop(old_name, new_name, selector, interval)
+
+    def _rename_shop(self, old_name: str, new_name: str, selector: str,
+                     interval: int) -> None:
         if old_name == new_name:
-            self.update_shop(old_name, selector)
+            self.update_shop(old_name, selector, interval)
             return
 
         if old_name not in self.shop_store.shops:
@@ -56,35 +207,63 @@ class PriceTracker:
 
         # remove old definition and register new one
         self.shop_store.remove(old_name)
-        self.register_shop(new_name, GenericShop(selector))
-        self.shop_store.add(ShopDef(name=new_name, selector=selector))
+        self.register_shop(new_name, self._generic_shop(new_name, selector))
+        self.shop_store.add(ShopDef(name=new_name, selector=selector,
+                                    interval=interval))
 
         # update in-memory registry
-        if old_name in self.shops:
-            self.shops[new_name] = self.shops.pop(old_name)
+        self.shops = {key: module for key, module in self.shops.items()
+                      if key != old_name}
+        self._invalidate_extractors(old_name)
 
         # update products referencing the old shop name
-        for product in self.store.products:
-            if product.shop == old_name:
-                product.shop = new_name
-        self.store.save()
+        self.store.rename_shop(old_name, new_name)
 
     def remove_shop(self, name: str) -> None:
         """Remove a shop definition and unregister it."""
-        self.shop_store.remove(name)
-        if name in self.shops:
-            del self.shops[name]
+        with self._write_lock:
+            self.shop_store.remove(name)
+            self.shops = {key: module for key, module in self.shops.items()
+                          if key != name}
+            self._invalidate_extractors(name)
+
+    def interval_for(self, product: Product) -> int:
+        """Return the number of seconds between checks of ``product``."""
+        if product.interval:
+            return product.interval
+        shop_def = self.shop_store.shops.get(product.shop)
+        if shop_def is not None and shop_def.interval:
+            return shop_def.interval
+        return self.interval
 
     def add_product(self, name: str, url: str, shop: str, selector: str,
-                    price: float = 0.0) -> None:
-        product = Product(name=name, url=url, shop=shop, selector=selector,
-                          price_history=[price] if price else [],
-                          last_price=price)
-        self.store.add(product)
+                    price: float = 0.0, interval: int = 0) -> None:
+        with self._write_lock:
+            for existing in self.store.products_for_url(url):
+                if existing.selector == selector:
+                    raise ValueError(
+                        f'Product with url {url} already tracked')
+            product = Product(name=name, url=url, shop=shop,
+                              selector=selector,
+                              price_history=[price] if price else [],
+                              last_price=price, interval=interval)
+            self.store.add(product)
+
+    def import_products(self, rows: Iterable[Dict[str, Any]],
+                        batch_size: int = 1000) -> ImportReport:
+        """Add many products at once; see ``bulk.import_products``."""
+        with self._write_lock:
+            return import_products(self.store, self.shop_store.shops, rows,
+                                   batch_size)
+
+    def remove_product(self, url: str, selector: str | None = None) -> None:
+        """Remove a tracked product by URL and, if given, selector."""
+        with self._write_lock:
+            self.store.remove(url, selector)
 
-    def remove_product(self, url: str) -> None:
-        """Remove a tracked product by URL."""
-        self.store.remove(url)
+    def snapshot(self) -> StoreSnapshot:
+        """Return a read-only view of the products; see ``ProductStore``."""
+        return self.store.snapshot()
 
     def update_smtp_config(self, server: str, port: int,
                            username: str | None,
@@ -108,39 +287,342 @@ class PriceTracker:
             password=cfg.password,
         )
 
-    def check_prices(self) -> None:
-        for product in self.store.products:
-            shop = GenericShop(product.selector)
-            try:
-                price = shop.get_price(product.url)
-            except Exception as exc:
-                print(f'Failed to fetch price for {product.name}: {exc}')
+    @staticmethod
+    def _group_by_url(products: List[Product]) -> List[List[int]]:
+        """Return indexes of ``products`` grouped by URL.
+
+        Groups are ordered by their first product, so walking the catalogue
+        in order always reaches a group that is already done or the next
+        one.
+        """
+        groups: Dict[str, List[int]] = {}
+        for index, product in enumerate(products):
+            groups.setdefault(product.url, []).append(index)
+        return list(groups.values())
+
+    def _fetch_group(self, products: List[Product]
+                     ) -> List[Tuple[float | None, Exception | None]]:
+        """Check ``products`` sharing one URL, downloading the page once."""
+        url = products[0].url
+        if not self.breaker.allow(url):
+            return [(None, HostUnavailable(host_of(url)))] * len(products)
+        try:
+            extractors = [self.extractor_for(product)
+                          for product in products]
+            with self.limiter.slot(url), \
+                    registry.context(shop=products[0].shop):
+                prices = get_prices(url, extractors)
+        except Exception as exc:
+            prices = [exc] * len(products)
+        results = [(None, price) if isinstance(price, Exception)
+                   else (price, None) for price in prices]
+        self._record_host(url, results)
+        return results
+
+    def _record_host(self, url: str,
+                     results: List[Tuple[float | None, Exception | None]]
+                     ) -> None:
+        """Feed the outcome of one page's checks to the circuit breaker."""
+        if any(exc is None for _, exc in results):
+            self.breaker.record(url)
+            return
+        self.breaker.record(url, next(
+            (exc for _, exc in results if is_host_failure(exc)), None))
+
+    def host_states(self) -> Dict[str, Dict]:
+        """Return the circuit breaker state of hosts that failed lately."""
+        return self.breaker.states()
+
+    def reset_host(self, host: str) -> None:
+        """Let requests to ``host`` through again right away."""
+        self.breaker.reset(host)
+
+    def _fetch_sequential(self, products: List[Product]
+                          ) -> Iterator[Tuple[Product, float | None,
+                                              Exception | None]]:
+        groups = iter(self._group_by_url(products))
+        done: Dict[int, Tuple[float | None, Exception | None]] = {}
+        for index, product in enumerate(products):
+            if index not in done:
+                group = next(groups)
+                done.update(zip(group, self._fetch_group(
+                    [products[i] for i in group])))
+            yield (product, *done.pop(index))
+
+    def _interleave_hosts(self, products: List[Product]) -> List[int]:
+        """Return indexes of ``products`` with hosts taking turns."""
+        by_host: Dict[str, deque] = defaultdict(deque)
+        for index, product in enumerate(products):
+            by_host[host_of(product.url)].append(index)
+        order: List[int] = []
+        queues = list(by_host.values())
+        while queues:
+            for queue in queues:
+                order.append(queue.popleft())
+            queues = [q for q in queues if q]
+        return order
+
+    def _fetch_concurrent(self, products: List[Product]
+                          ) -> Iterator[Tuple[Product, float | None,
+                                              Exception | None]]:
+        # Interleave hosts so that workers are not all parked on the
+        # per-host limit of a single large shop.
+        groups = self._group_by_url(products)
+        order = self._interleave_hosts([products[g[0]] for g in groups])
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures: Dict[int, Future] = {
+                groups[n][0]: pool.submit(self._fetch_group,
+                                          [products[i] for i in groups[n]])
+                for n in order
+            }
+            # results are handed back in catalogue order so that store
+            # updates and notifications happen exactly as in a serial sweep
+            pending = iter(groups)
+            done: Dict[int, Tuple[float | None, Exception | None]] = {}
+            for index, product in enumerate(products):
+                if index not in done:
+                    done.update(zip(next(pending),
+                                    futures.pop(index).result()))
+                yield (product, *done.pop(index))
+
+    def _fetch_processes(self, products: List[Product]
+                         ) -> Iterator[Tuple[Product, float | None,
+                                             Exception | None]]:
+        pool = self._worker_pool()
+        groups = self._group_by_url(products)
+        order = self._interleave_hosts([products[g[0]] for g in groups])
+        # a few shards per process keep all of them busy until the end
+        shards = self.processes * 4
+        size = max(1, math.ceil(len(order) / shards))
+        threads = max(1, math.ceil(self.workers / self.processes))
+        per_host = max(1, math.ceil(self.limiter.per_host / self.processes))
+        done: Dict[int, Tuple[float | None, Exception | None]] = {}
+        futures: Dict[Future, List[List[int]]] = {}
+        for start in range(0, len(order), size):
+            shard = []
+            for n in order[start:start + size]:
+                url = products[groups[n][0]].url
+                if self.breaker.allow(url):
+                    shard.append(groups[n])
+                    continue
+                skipped = HostUnavailable(host_of(url))
+                done.update((i, (None, skipped)) for i in groups[n])
+            if not shard:
                 continue
+            tasks = [(products[group[0]].url,
+                      [self.extractor_for(products[i]) for i in group])
+                     for group in shard]
+            cache = None
+            if self.page_cache is not None:
+                cache = self.page_cache.export(
+                    (url, extractor.selector) for url, extractors in tasks
+                    for extractor in extractors
+                    if isinstance(extractor, GenericShop))
+            archive = (str(self.archive.directory)
+                       if self.archive is not None else None)
+            shops = [products[group[0]].shop for group in shard]
+            future = pool.submit(check_shard, tasks, threads, per_host,
+                                 default_pool.config, self.breaker.threshold,
+                                 cache, archive, shops)
+            futures[future] = shard
+
+        completed = as_completed(futures)
+        for index, product in enumerate(products):
+            while index not in done:
+                future = next(completed)
+                shard = futures.pop(future)
+                indexes = [i for group in shard for i in group]
+                try:
+                    results = [(price, None if error is None
+                                else to_exception(error, host_failure))
+                               for _, price, error, host_failure
+                               in self._merge_shard(future.result())]
+                except Exception as exc:
+                    results = [(None, exc)] * len(indexes)
+                done.update(zip(indexes, results))
+                for group in shard:
+                    self._record_host(products[group[0]].url,
+                                      [done[i] for i in group])
+            yield (product, *done.pop(index))
+
+    def _merge_shard(self, shard: ShardResult) -> List[Result]:
+        """Take over the metrics, cache entries and archived pages of a
+        shard checked in a worker process; return its results."""
+        registry.merge(shard.metrics)
+        if self.page_cache is not None:
+            self.page_cache.merge(shard.cache, shard.cache_hits,
+                                  shard.cache_misses)
+        if self.archive is not None:
+            for url, digest, fetched in shard.archived:
+                self.archive.record(url, digest, fetched)
+        return shard.results
+
+    def close(self) -> None:
+        """Stop worker processes and deliver pending notifications."""
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+            self._process_pool = None
+        if self.notifier is not None:
+            self.notifier.stop()
+        if self.changes is not None:
+            self.changes.close()
+
+    def _worker_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'))
+        return self._process_pool
+
+    def _save_caches(self) -> None:
+        if self.page_cache is not None:
+            self.page_cache.save()
+        if self.archive is not None:
+            self.archive.save()
+
+    def reextract_shop(self, name: str,
+                       selector: str | None = None) -> ReextractReport:
+        """Extract the prices of shop ``name`` again from archived pages.
+
+        Nothing is fetched or recorded, so ``selector`` can be tried on all
+        of the shop's products before it is saved; without it the current
+        extractors are used. Each archived page is parsed once, in worker
+        processes when there are many.
+        """
+        if self.archive is None:
+            raise ValueError('The page archive is not enabled')
+        start = time.perf_counter()
+        products = self.store.products_for_shop(name)
+        candidate = self._generic_shop(name, selector) if selector else None
+        results = [ReextractResult(p.name, p.url, p.last_price)
+                   for p in products]
+        # distinct extractors per archived page with their products
+        pages: Dict[str, Dict[int, Tuple[GenericShop, List[int]]]] = {}
+        for index, product in enumerate(products):
+            extractor = candidate or self.extractor_for(product)
+            entry = self.archive.entry(product.url)
+            if entry is None:
+                results[index].error = 'Page not archived'
+            elif not isinstance(extractor, GenericShop):
+                results[index].error = (f'{type(extractor).__name__} cannot '
+                                        f'extract from archived pages')
+            else:
+                page = pages.setdefault(entry.digest, {})
+                page.setdefault(id(extractor), (extractor, []))[1].append(
+                    index)
+        tasks = [(digest, [shop for shop, _ in page.values()])
+                 for digest, page in pages.items()]
+        owners = [indexes for page in pages.values()
+                  for _, indexes in page.values()]
+        for indexes, (price, error) in zip(
+                owners, self._extract_archived(tasks)):
+            for index in indexes:
+                results[index].price = price
+                results[index].error = error
+        return ReextractReport(name, selector, results,
+                               time.perf_counter() - start)
+
+    def _extract_archived(self, tasks: List[Tuple[str, List[GenericShop]]]
+                          ) -> List[Tuple[float | None, str | None]]:
+        directory = str(self.archive.directory)
+        processes = self.processes or os.cpu_count() or 1
+        # starting processes only pays off for more than a few pages
+        if processes < 2 or len(tasks) < ARCHIVE_SHARD * 2:
+            return extract_archived(directory, tasks)
+        size = max(ARCHIVE_SHARD, math.ceil(len(tasks) / (processes * 4)))
+        shards = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+        if self.processes:
+            pool = self._worker_pool()
+            futures = [pool.submit(extract_archived, directory, shard)
+                       for shard in shards]
+            return [r for future in futures for r in future.result()]
+        with ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn')) as pool:
+            return [r for results in pool.map(extract_archived,
+                                              [directory] * len(shards),
+                                              shards)
+                    for r in results]
+
+    def check_prices(self) -> None:
+        self.check_products(self.store.products)
+        self._save_caches()
+
+    def _run_job(self, products: List[Product],
+                 progress: Callable[[Product, Exception | None], None]
+                 ) -> None:
+        self.check_products(products, progress)
+        self._save_caches()
 
-            previous_price = product.last_price
-            self.store.update_price(product, price)
-            print(f'{product.name}: {previous_price} -> {price}')
+    def check_products(self, products: List[Product],
+                       progress: Callable[[Product, Exception | None], None]
+                       | None = None) -> None:
+        """Fetch and record current prices of ``products``.
 
-            if previous_price and price < previous_price:
-                self.notify_price_drop(product, previous_price, price)
+        ``progress`` is called with each product and the exception raised
+        while checking it (``None`` on success).
+        """
+        with self._check_lock:
+            self._check_products(list(products), progress)
 
-    def notify_price_drop(self, product: Product,
-                          old: float, new: float) -> None:
-        msg = (f'Price drop for {product.name}: {old} -> {new}\n'
-               f'URL: {product.url}')
+    def _check_products(self, products: List[Product],
+                        progress: Callable[[Product, Exception | None], None]
+                        | None) -> None:
+        if self.processes > 0 and len(products) > 1:
+            results = self._fetch_processes(products)
+        elif self.workers > 1 and len(products) > 1:
+            results = self._fetch_concurrent(products)
+        else:
+            results = self._fetch_sequential(products)
+
+        # only this thread touches the store and sends notifications; the
+        # whole sweep is persisted once at the end of the batch
+        with self.store.batch():
+            for product, price, exc in results:
+                if progress is not None:
+                    progress(product, exc)
+                if exc is not None:
+                    registry.inc('price_tracker_failures_total',
+                                 shop=product.shop,
+                                 host=host_of(product.url),
+                                 exception=getattr(exc, 'type_name',
+                                                   type(exc).__name__))
+                    print(f'Failed to fetch price for {product.name}: {exc}')
+                    continue
+
+                previous_price = product.last_price
+                lowest = self.store.update_price(product, price)
+                print(f'{product.name}: {previous_price} -> {price}')
+
+                if previous_price and price < previous_price:
+                    self.notify_price_drop(product, previous_price, price,
+                                           lowest)
+
+    def notify_price_drop(self, product: Product, old: float, new: float,
+                          lowest: bool = False) -> None:
         if self.email:
-            cfg = self.smtp_store.config
-            send_email(
-                self.email,
-                f'Price drop: {product.name}',
-                msg,
-                smtp_server=cfg.server,
-                smtp_port=cfg.port,
-                username=cfg.username,
-                password=cfg.password,
-            )
+            if self.notifier is None or self.notifier.recipient != self.email:
+                if self.notifier is not None:
+                    # drops queued so far still go to the old recipient;
+                    # its thread sends them without holding up the sweep
+                    self.notifier.stop(wait=False)
+                self.notifier = Notifier(self.email,
+                                         lambda: self.smtp_store.config,
+                                         window=self.notify_window)
+            self.notifier.notify(PriceDrop(product.name, product.url,
+                                           old, new, lowest))
         else:
-            print(msg)
+            note = ' (lowest price ever)' if lowest else ''
+            print(f'Price drop for {product.name}: {old} -> {new}{note}\n'
+                  f'URL: {product.url}')
+
+    def metrics_snapshot(self) -> Dict:
+        """Return current values of all pipeline metrics."""
+        return registry.snapshot()
+
+    def metrics_text(self) -> str:
+        """Return all pipeline metrics in the Prometheus text format."""
+        return registry.render()
 
     def pause(self) -> None:
         """Pause automatic price checking."""
@@ -150,8 +632,48 @@ class PriceTracker:
         """Resume automatic price checking."""
         self.paused = False
 
+    def run_once(self) -> float:
+        """Check the products that are due now.
+
+        Returns the number of seconds until the next product is due.
+        """
+        scheduler = self.scheduler
+        if scheduler.version != self.store.version:
+            scheduler.sync(self.store.products)
+            scheduler.version = self.store.version
+        due = scheduler.pop_due()
+        if due:
+            try:
+                self.check_products(due)
+            finally:
+                scheduler.reschedule(due)
+        next_due = scheduler.next_due()
+        if next_due is None:
+            return float(self.interval)
+        return max(0.0, next_due - scheduler.clock())
+
     def run(self) -> None:
+        """Check every product whenever it becomes due.
+
+        A round that raises is retried after a pause doubling up to
+        ``MAX_BACKOFF`` seconds.
+        """
+        failures = 0
         while True:
-            if not self.paused:
-                self.check_prices()
-            time.sleep(self.interval)
+            # keep a batch open so that results are written once per
+            # ``save_interval`` instead of after every scheduled check
+            deadline = time.monotonic() + self.save_interval
+            with self.store.batch():
+                while time.monotonic() < deadline:
+                    if self.paused:
+                        time.sleep(1.0)
+                        continue
+                    try:
+                        wait = min(max(self.run_once(), MIN_WAIT), 1.0)
+                        failures = 0
+                    except Exception as exc:
+                        failures += 1
+                        wait = min(MIN_WAIT * 2 ** failures, MAX_BACKOFF)
+                        print(f'Scheduled check failed: {exc}')
+                    time.sleep(wait)
+            self._save_caches()
@@ -0,0 +1,170 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .archive import PageArchive
+from .concurrency import (CircuitBreaker, HostLimiter, HostUnavailable,
+                          host_of, is_host_failure)
+from .metrics import MetricsData, registry
+from .page_cache import CacheEntry, PageCache
+from .sessions import HttpConfig, default_pool
+from .shops.base import ShopModule
+from .shops.generic import GenericShop, extract_prices, get_prices
+
+# a URL and the extractors of the products tracked at it
+Task = Tuple[str, List[ShopModule]]
+# url, price, ``"Type: message"`` error and whether the host failed
+Result = Tuple[str, Optional[float], Optional[str], bool]
+
+
+@dataclass
+class ShardResult:
+    """Everything a worker process sends back for one shard."""
+    results: List[Result]
+    # metrics recorded while checking the shard
+    metrics: MetricsData = field(default_factory=dict)
+    # page cache entries of the shard's URLs and selectors
+    cache: Dict[Tuple[str, str], Optional[CacheEntry]] = field(
+        default_factory=dict)
+    cache_hits: int = 0
+    cache_misses: int = 0
+    # ``(url, digest, fetched)`` of pages written to the archive
+    archived: List[Tuple[str, str, float]] = field(default_factory=list)
+
+
+class _ArchiveWriter:
+    """Stands in for a ``PageArchive`` in a worker process.
+
+    Pages go straight to the archive's blobs; the parent, which owns the
+    index, ``record``s them.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.archived: List[Tuple[str, str, float]] = []
+        self._lock = threading.Lock()
+
+    def put(self, url: str, html: str) -> str:
+        digest = PageArchive.write_blob(self.directory, html)
+        with self._lock:
+            self.archived.append((url, digest, time.time()))
+        return digest
+
+
+class WorkerError(Exception):
+    """A price check that failed inside a worker process."""
+
+    def __init__(self, type_name: str, message: str,
+                 host_failure: bool = False) -> None:
+        super().__init__(message)
+        self.type_name = type_name
+        # read by ``concurrency.is_host_failure``
+        self.host_failure = host_failure
+
+
+def check_shard(tasks: List[Task], threads: int = 4, per_host: int = 2,
+                http: Optional[HttpConfig] = None, max_failures: int = 0,
+                cache: Optional[Dict[Tuple[str, str],
+                                     Optional[CacheEntry]]] = None,
+                archive: Optional[str] = None,
+                shops: Optional[List[str]] = None) -> ShardResult:
+    """Fetch and extract the prices of ``tasks`` in a worker process.
+
+    Each page is downloaded once for all of its extractors. The result
+    holds one ``Result`` per extractor in task order; errors are sent back
+    as strings so that only plain data reaches the parent, which stays the
+    single writer of the product store, page cache and archive index.
+    ``http`` is the parent's session configuration, applied to the
+    worker's pool. Hosts failing ``max_failures`` times in a row are
+    skipped for the rest of the shard. ``cache`` holds the parent's page
+    cache entries for the tasks (``PageCache.export``) and ``archive`` the
+    directory of its ``PageArchive``; updated entries, archived pages and
+    the shard's metrics are returned for the parent to merge. ``shops``
+    names the shop of each task; its metrics carry that ``shop`` label, as
+    in the parent's threads.
+    """
+    if http is not None and http != default_pool.config:
+        default_pool.configure(http)
+    # metrics of earlier shards have been sent already
+    registry.drain()
+    page_cache = None
+    if cache is not None:
+        page_cache = PageCache()
+        page_cache.merge(cache)
+    writer = _ArchiveWriter(archive) if archive else None
+    for _, extractors in tasks:
+        for extractor in extractors:
+            if isinstance(extractor, GenericShop):
+                extractor.cache = page_cache
+                extractor.archive = writer
+    limiter = HostLimiter(per_host)
+    breaker = CircuitBreaker(max_failures, cooldown=float('inf'))
+
+    def check(task: Task, shop: Optional[str]) -> List[Result]:
+        url, extractors = task
+        if not breaker.allow(url):
+            prices = [HostUnavailable(host_of(url))] * len(extractors)
+        else:
+            labels = {'shop': shop} if shop is not None else {}
+            try:
+                with limiter.slot(url), registry.context(**labels):
+                    prices = get_prices(url, extractors)
+            except Exception as exc:
+                prices = [exc] * len(extractors)
+            errors = [p for p in prices if isinstance(p, Exception)]
+            breaker.record(url, next(
+                (e for e in errors if is_host_failure(e)), None)
+                if len(errors) == len(prices) else None)
+        return [(url, None, f'{type(price).__name__}: {price}',
+                 is_host_failure(price))
+                if isinstance(price, Exception) else (url, price, None, False)
+                for price in prices]
+
+    if shops is None:
+        shops = [None] * len(tasks)
+    if threads <= 1:
+        checked = [check(task, shop) for task, shop in zip(tasks, shops)]
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            checked = list(pool.map(check, tasks, shops))
+    shard = ShardResult([result for results in checked for result in results],
+                        registry.drain())
+    if page_cache is not None:
+        shard.cache = page_cache.export(cache)
+        shard.cache_hits = page_cache.hits
+        shard.cache_misses = page_cache.misses
+    if writer is not None:
+        shard.archived = writer.archived
+    return shard
+
+
+def extract_archived(directory: str,
+                     tasks: List[Tuple[str, List[GenericShop]]]
+                     ) -> List[Tuple[Optional[float], Optional[str]]]:
+    """Run extractors on archived pages, without any network access.
+
+    ``tasks`` pair the digest of a page in the ``PageArchive`` at
+    ``directory`` with the extractors to run on it. Returns one
+    ``(price, error)`` tuple per extractor in task order.
+    """
+    results: List[Tuple[Optional[float], Optional[str]]] = []
+    for digest, extractors in tasks:
+        try:
+            html = PageArchive.read_blob(Path(directory), digest)
+        except Exception as exc:
+            prices = [exc] * len(extractors)
+        else:
+            prices = extract_prices(html, extractors)
+        results.extend((None, f'{type(price).__name__}: {price}')
+                       if isinstance(price, Exception) else (price, None)
+                       for price in prices)
+    return results
+
+
+def to_exception(error: str, host_failure: bool = False) -> WorkerError:
+    """Rebuild an exception from the error string of a ``Result``."""
+    type_name, _, message = error.partition(': ')
+    return WorkerError(type_name, message, host_failure)
@@ -0,0 +1,81 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker import sessions
+from price_tracker.archive import PageArchive
+from price_tracker.tracker import PriceTracker
+
+
+def test_pages_are_deduplicated_and_evicted(tmp_path):
+    now = [0.0]
+    archive = PageArchive(tmp_path / 'archive', max_bytes=10_000,
+                          max_age=100, clock=lambda: now[0])
+    page = '<p>' + 'same page ' * 500 + '</p>'
+    archive.put('http://a.example/1', page)
+    archive.put('http://a.example/2', page)
+    assert archive.stats()['blobs'] == 1
+    assert archive.get('http://a.example/2') == page
+
+    archive.put('http://a.example/1', '<p>changed</p>')
+    archive.save()
+    reloaded = PageArchive(tmp_path / 'archive', clock=lambda: now[0])
+    assert reloaded.get('http://a.example/1') == '<p>changed</p>'
+    assert reloaded.stats() == archive.stats()
+
+    # pages of random text do not compress; only the newest ones fit
+    for i in range(5):
+        archive.put(f'http://b.example/{i}', os.urandom(3000).hex())
+    assert archive.size <= 10_000
+    assert archive.get('http://a.example/2') is None
+    assert 'http://b.example/4' in archive
+
+    now[0] = 101
+    archive.put('http://c.example/', '<p>new</p>')
+    assert archive.urls() == ['http://c.example/']
+    assert not list((tmp_path / 'archive' / 'blobs').glob('*/*'))[1:]
+
+
+class Page:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, i):
+        self.text = (f"<div class='old'>{i + 1},00 zł</div>"
+                     f"<span class='new'>{i + 1},50 zł</span>")
+
+    def raise_for_status(self):
+        pass
+
+
+def test_reextract_shop_uses_archived_pages_only(tmp_path, monkeypatch):
+    tracker = PriceTracker(str(tmp_path / 'products.json'),
+                           shops_path=str(tmp_path / 'shops.json'),
+                           smtp_path=str(tmp_path / 'smtp.json'),
+                           archive_path=str(tmp_path / 'archive'),
+                           processes=2)
+    tracker.add_shop('shop', 'div.old')
+    for i in range(60):
+        tracker.add_product(f'p{i}', f'http://a.example/{i}', 'shop', '')
+    tracker.add_product('new', 'http://a.example/new', 'shop', '')
+    monkeypatch.setattr(sessions, 'get', lambda url, **kw: Page(
+        int(url.rsplit('/', 1)[1])))
+    monkeypatch.setattr(tracker, 'processes', 0)
+    tracker.check_products(tracker.store.products[:60])
+    monkeypatch.setattr(tracker, 'processes', 2)
+
+    def offline(url, **kwargs):
+        raise AssertionError('fetched ' + url)
+
+    monkeypatch.setattr(sessions, 'get', offline)
+    try:
+        report = tracker.reextract_shop('shop', 'span.new')
+        current = tracker.reextract_shop('shop')
+    finally:
+        tracker.close()
+    assert [r.price for r in report.results[:60]] == [
+        i + 1.5 for i in range(60)]
+    assert report.results[60].error == 'Page not archived'
+    assert (report.found, report.changed, report.failed) == (60, 60, 1)
+    assert (current.found, current.changed) == (60, 0)
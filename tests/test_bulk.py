@@ -0,0 +1,63 @@
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.bulk import (export_products, import_products, iter_export,
+                                read_rows)
+from price_tracker.products import Product, ProductStore
+
+CSV = """name,url,shop,selector,price,interval
+A,http://a.example/1,shop,span.price,"29,99 zł",0
+B,http://a.example/2,shop,,,3600
+dup,http://a.example/1,shop,,,
+C,http://a.example/3,other,,,
+,http://a.example/4,shop,,,
+D,http://a.example/5,shop,,,
+"""
+
+
+def test_import_dedupes_validates_and_saves_per_batch(tmp_path):
+    store = ProductStore(tmp_path / 'products.json')
+    store.add(Product(name='old', url='http://a.example/5', shop='shop'))
+    saves = []
+    original_save = store.save
+    store.save = lambda: (saves.append(len(store)), original_save())
+
+    report = import_products(store, {'shop'}, read_rows(io.StringIO(CSV),
+                                                        'csv'), batch_size=1)
+
+    assert (report.added, report.duplicates, report.invalid) == (2, 2, 2)
+    assert report.errors == ["row 4: unknown shop 'other'",
+                             'row 5: name and url are required']
+    assert saves == [2, 3]
+    first = store.find_by_url('http://a.example/1')
+    assert (first.last_price, first.price_history) == (29.99, [29.99])
+    assert store.find_by_url('http://a.example/2').interval == 3600
+    assert len(ProductStore(tmp_path / 'products.json')) == 3
+
+
+def test_jsonl_round_trip(tmp_path):
+    source = [Product(name='Zażółć', url=f'http://b.example/{i}', shop='shop',
+                      last_price=float(i), interval=i) for i in range(3)]
+    out = io.StringIO()
+    assert export_products(source, out, 'jsonl') == 3
+
+    store = ProductStore(tmp_path / 'products.json')
+    lines = out.getvalue().splitlines() + ['not json']
+    report = import_products(store, {'shop'},
+                             read_rows(io.StringIO('\n'.join(lines)), 'jsonl'))
+    assert (report.added, report.invalid) == (3, 1)
+    assert [(p.name, p.last_price, p.interval) for p in store.products] == [
+        ('Zażółć', 0.0, 0), ('Zażółć', 1.0, 1), ('Zażółć', 2.0, 2)]
+
+
+def test_csv_export_is_streamed_line_by_line():
+    products = [Product(name='A, "quoted"', url='http://c.example/1',
+                        shop='shop', last_price=5.0)]
+    lines = list(iter_export(products, 'csv'))
+    assert lines == ['name,url,shop,selector,price,interval\n',
+                     '"A, ""quoted""",http://c.example/1,shop,,5.0,0\n']
+    assert json.loads(next(iter_export(products, 'jsonl')))['price'] == 5.0
@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.changes import ChangeLog
+from price_tracker.products import Product, ProductStore
+
+
+def test_price_changes_are_logged_and_resumable(tmp_path):
+    store = ProductStore(tmp_path / 'products.json')
+    store.changes = ChangeLog(tmp_path / 'changes.jsonl')
+    product = Product(name='p', url='http://a.example/1', shop='shop',
+                      price_history=[10.0], last_price=10.0)
+    store.add(product)
+    store.update_price(product, 10.0)
+    store.update_price(product, 8.0)
+    store.update_price(product, 9.0)
+
+    events = store.changes.read()
+    assert [(e['old'], e['new'], e['lowest']) for _, e in events] == [
+        (10.0, 8.0, True), (8.0, 9.0, False)]
+    first = events[0][0]
+    assert [e['new'] for _, e in store.changes.read(first)] == [9.0]
+    assert store.changes.read(store.changes.end) == []
+    assert not store.changes.wait(store.changes.end, 0.01)
+
+    # a line cut short by a crash is skipped after reopening
+    store.changes.close()
+    with open(tmp_path / 'changes.jsonl', 'ab') as fh:
+        fh.write(b'{"url": "http://a.exa')
+    log = ChangeLog(tmp_path / 'changes.jsonl')
+    offset = log.append({'new': 7.0})
+    assert [e['new'] for _, e in log.read(first)] == [9.0, 7.0]
+    assert log.read()[-1][0] == offset == log.end
@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.detect import JSONLD_SELECTOR, detect_candidates
+
+
+def test_candidates_are_ranked_by_price_markup():
+    html = (
+        "<ul><li><span class='tile'>12,00 zł</span></li>"
+        "<li><span class='tile'>15,00 zł</span></li></ul>"
+        "<div class='product'><span class='old-price'>199,99 zł</span>"
+        "<span class='price'>149,99 zł</span></div>"
+        "<script>var x = 1.25;</script>"
+    )
+    candidates = detect_candidates(html)
+    assert candidates[0].selector == 'span.price'
+    assert candidates[0].price == 149.99
+    assert [c.selector for c in candidates[1:]] == ['span.tile',
+                                                    'span.old-price']
+
+
+def test_structured_data_is_preferred():
+    html = (
+        "<span class='price'>10,00 zł</span>"
+        "<div class='p' data-product-gtm='{\"current_price\": \"9,50\"}'></div>"
+        "<script type='application/ld+json'>{\"offers\": {\"price\": 9.5}}"
+        "</script>"
+    )
+    candidates = detect_candidates(html, limit=2)
+    assert [(c.selector, c.source) for c in candidates] == [
+        (JSONLD_SELECTOR, 'json-ld'), ('div.p', 'data-attribute')]
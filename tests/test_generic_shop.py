@@ -1,11 +1,13 @@
 import os
 import sys
-import requests
 import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from price_tracker.shops.generic import GenericShop
+from price_tracker import sessions
+from price_tracker.archive import PageArchive
+from price_tracker.sessions import HttpConfig
+from price_tracker.shops.generic import GenericShop, PageWatch, extract_prices
 
 
 class MockResponse:
@@ -16,22 +18,52 @@ class MockResponse:
         pass
 
 
+class StreamedResponse:
+    status_code = 200
+    url = 'http://example.com'
+    encoding = 'utf-8'
+    headers = {}
+
+    def __init__(self, html, chunk_size):
+        self.body = html.encode('utf-8')
+        self.chunk_size = chunk_size
+        self.sent = 0
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), self.chunk_size):
+            self.sent += self.chunk_size
+            yield self.body[start:start + self.chunk_size]
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    monkeypatch.setattr(sessions.default_pool, 'config',
+                        HttpConfig(stream=True, max_bytes=64 * 1024,
+                                   chunk_size=1024))
+
+
 def make_get(html):
-    def _get(url):
+    def _get(url, **kwargs):
         return MockResponse(html)
     return _get
 
 
 def test_price_from_text(monkeypatch):
     html = "<span class='price'>29,99 zł</span>"
-    monkeypatch.setattr(requests, 'get', make_get(html))
+    monkeypatch.setattr(sessions, 'get', make_get(html))
     shop = GenericShop('span.price')
     assert shop.get_price('http://example.com') == 29.99
 
 
 def test_price_from_data_attribute(monkeypatch):
     html = "<div class='p' data-product-gtm='{\"current_price\": \"123,45\"}'></div>"
-    monkeypatch.setattr(requests, 'get', make_get(html))
+    monkeypatch.setattr(sessions, 'get', make_get(html))
     shop = GenericShop('div.p')
     assert shop.get_price('http://example.com') == 123.45
 
@@ -42,7 +74,109 @@ def test_price_from_jsonld(monkeypatch):
         "\"offers\": {\"price\": 49.99, \"priceCurrency\": \"PLN\"}}"
         "</script>"
     )
-    monkeypatch.setattr(requests, 'get', make_get(html))
+    monkeypatch.setattr(sessions, 'get', make_get(html))
     # Selector not found, should still parse from JSON-LD
     shop = GenericShop('span.price')
     assert shop.get_price('http://example.com') == 49.99
+
+
+FILLER = '<p>' + 'x' * 100 + '</p>'
+
+
+def test_streaming_stops_after_the_price_element(monkeypatch, streaming):
+    html = ("<div class='price'><b>12,50</b> zł</div>" + FILLER * 5000)
+    response = StreamedResponse(html, 1024)
+    monkeypatch.setattr(sessions, 'get', lambda url, **kw: response)
+    assert GenericShop('div.price').get_price('http://example.com') == 12.5
+    assert response.sent <= 2048
+
+
+def test_streaming_stops_after_jsonld(monkeypatch, streaming):
+    html = (FILLER * 20 + "<script type='application/ld+json'>"
+            "{\"offers\": {\"price\": \"7.25\"}}</script>" + FILLER * 5000)
+    response = StreamedResponse(html, 1024)
+    monkeypatch.setattr(sessions, 'get', lambda url, **kw: response)
+    assert GenericShop('#missing').get_price('http://example.com') == 7.25
+    assert response.sent <= 4096
+
+
+def test_streaming_reads_at_most_max_bytes(monkeypatch, streaming):
+    html = FILLER * 5000 + "<span class='price'>5 zł</span>"
+    response = StreamedResponse(html, 1024)
+    monkeypatch.setattr(sessions, 'get', lambda url, **kw: response)
+    with pytest.raises(ValueError):
+        GenericShop('span.price').get_price('http://example.com')
+    assert response.sent <= 64 * 1024
+
+
+def test_page_watch_handles_nesting_and_split_tags():
+    watch = PageWatch('div.box')
+    page = ("<div class='other'></div><div class='box'><div>1</div>"
+            "<div>2</div></div>")
+    fed = [watch.feed(page[i:i + 7]) for i in range(0, len(page), 7)]
+    assert fed[-1] and not any(fed[:-1])
+
+
+def test_streaming_archives_only_complete_pages(monkeypatch, streaming,
+                                                tmp_path):
+    archive = PageArchive(tmp_path / 'archive')
+    shop = GenericShop('span.price', archive=archive)
+    early = "<span class='price'>5 zł</span>" + FILLER * 100
+    monkeypatch.setattr(sessions, 'get',
+                        lambda url, **kw: StreamedResponse(early, 1024))
+    assert shop.get_price('http://example.com/early') == 5.0
+    cut = FILLER * 5000 + "<span class='price'>5 zł</span>"
+    monkeypatch.setattr(sessions, 'get',
+                        lambda url, **kw: StreamedResponse(cut, 1024))
+    with pytest.raises(ValueError):
+        shop.get_price('http://example.com/cut')
+    whole = "<div class='price'>5 zł</div>"
+    monkeypatch.setattr(sessions, 'get',
+                        lambda url, **kw: StreamedResponse(whole, 1024))
+    with pytest.raises(ValueError):
+        shop.get_price('http://example.com/whole')
+    assert archive.urls() == ['http://example.com/whole']
+
+
+def test_extract_prices_runs_every_selector_on_one_page():
+    html = ("<div class='a'>1,50 zł</div><div id='b'>2,50 zł</div>"
+            "<script type='application/ld+json'>"
+            "{\"offers\": {\"price\": \"9.99\"}}</script>")
+    shops = [GenericShop('div.a'), GenericShop('#b'), GenericShop('p.none')]
+    assert extract_prices(html, shops) == [1.5, 2.5, 9.99]
+    assert isinstance(extract_prices('<p></p>', shops[:1])[0], ValueError)
+
+
+def _extract(extract, html):
+    try:
+        return extract(html)
+    except ValueError:
+        return ValueError
+
+
+@pytest.mark.parametrize('selector, html', [
+    # the selector matches nothing
+    ('span.price', "<div class='cost'>12,00 zł</div>"),
+    ('#price', "<p id='price-old'>3,00</p><p data-id='price'>4,00</p>"),
+    # the selector matches a nested element
+    ('span.price', "<div><span class='price'><b>12,50</b> zł</span></div>"),
+    ('div.box.price', "<div class='box'>1,00</div>"
+                      "<div class='price box'><div>7,25</div></div>"),
+    # the price is only in JSON-LD
+    ('span.price', "<span class='other'>1</span>"
+                   "<script type='application/ld+json'>"
+                   "{\"offers\": {\"price\": \"19.99\"}}</script>"),
+    # the price is only in a data attribute
+    ('div.product', "<div class='product' "
+                    "data-product-gtm='{\"current_price\": \"8.40\"}'>"
+                    "</div>"),
+    # selector-shaped markup in a comment or a script is not the element
+    ('span.price', "<!-- <span class='price'>10,00</span> -->"
+                   "<span class='price'>20,00</span>"),
+    ('span.price', "<script>var t = \"<span class='price'>10,00</span>\";"
+                   "</script><span class='price'>20,00</span>"),
+])
+def test_extract_price_agrees_with_full_parse(selector, html):
+    shop = GenericShop(selector)
+    assert (_extract(shop.extract_price, html)
+            == _extract(shop.extract_price_full, html))
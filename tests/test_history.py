@@ -0,0 +1,70 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.changes import ChangeLog
+from price_tracker.history import RECORD, HistoryStore
+from price_tracker.products import Product, ProductStore
+
+
+def test_json_store_moves_history_to_segments(tmp_path):
+    path = tmp_path / 'products.json'
+    path.write_text(json.dumps({'products': [
+        {'name': 'A', 'url': 'http://e/a', 'shop': 's',
+         'price_history': [5.0, 4.0], 'last_price': 4.0},
+    ]}))
+    store = ProductStore(path, tmp_path / 'history')
+    product = store.products[0]
+    assert not product.price_history.loaded
+
+    store.update_price(product, 3.5)
+    store.add(Product(name='B', url='http://e/b', shop='s',
+                      price_history=[7.0], last_price=7.0))
+    assert 'price_history' not in json.loads(path.read_text())['products'][0]
+
+    store = ProductStore(path, tmp_path / 'history')
+    history = store.products[0].price_history
+    assert history == [5.0, 4.0, 3.5]
+    assert [ts for ts, _ in history.points()][:2] == [0.0, 0.0]
+    assert history.timestamps[2] > 0
+    assert store.products[1].price_history == [7.0]
+    segment = HistoryStore(tmp_path / 'history').segment('http://e/a')
+    assert segment.stat().st_size == 3 * RECORD.size
+
+
+def test_products_sharing_a_url_keep_separate_segments(tmp_path):
+    path = tmp_path / 'products.json'
+    # a segment written when histories were keyed by URL alone
+    HistoryStore(tmp_path / 'history').write('http://e/x', [(0.0, 9.0)])
+    path.write_text(json.dumps({'products': [
+        {'name': 'a', 'url': 'http://e/x', 'shop': 's', 'selector': 'span.a',
+         'last_price': 9.0},
+    ]}))
+    store = ProductStore(path, tmp_path / 'history')
+    store.add(Product(name='b', url='http://e/x', shop='s',
+                      selector='span.b', price_history=[20.0],
+                      last_price=20.0))
+    store.update_price(store.products[1], 5.0)
+    store.update_price(store.products[0], 8.0)
+
+    store = ProductStore(path, tmp_path / 'history')
+    assert [list(p.price_history) for p in store.products] == [[9.0, 8.0],
+                                                               [20.0, 5.0]]
+    store.remove('http://e/x')
+    store = ProductStore(path, tmp_path / 'history')
+    assert [list(p.price_history) for p in store.products] == [[20.0, 5.0]]
+
+
+def test_prices_of_removed_products_are_dropped(tmp_path):
+    store = ProductStore(tmp_path / 'products.json', tmp_path / 'history')
+    store.changes = ChangeLog(tmp_path / 'changes.jsonl')
+    product = Product(name='A', url='http://e/a', shop='s',
+                      price_history=[5.0], last_price=5.0)
+    store.add(product)
+    store.remove('http://e/a')
+    # a sweep finishing after the product was deleted
+    assert not store.update_price(product, 4.0)
+    assert not list((tmp_path / 'history').iterdir())
+    assert store.changes.read() == []
@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.metrics import MetricsRegistry
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.histogram('fetch_seconds', 'Fetch time.', buckets=(0.1, 1.0))
+    registry.counter('failures_total', 'Failures.')
+    with registry.context(shop='a'):
+        registry.observe('fetch_seconds', 0.05, host='h')
+        registry.observe('fetch_seconds', 0.5, host='h')
+    registry.inc('failures_total', exception='Timeout')
+
+    text = registry.render()
+    assert '# TYPE fetch_seconds histogram' in text
+    assert 'fetch_seconds_bucket{host="h",shop="a",le="0.1"} 1' in text
+    assert 'fetch_seconds_bucket{host="h",shop="a",le="1.0"} 2' in text
+    assert 'fetch_seconds_bucket{host="h",shop="a",le="+Inf"} 2' in text
+    assert 'fetch_seconds_count{host="h",shop="a"} 2' in text
+    assert 'failures_total{exception="Timeout"} 1.0' in text
+
+    snapshot = registry.snapshot()
+    assert snapshot['fetch_seconds'][0]['count'] == 2
+    assert snapshot['failures_total'][0]['labels'] == {'exception': 'Timeout'}
+
+
+def test_drained_series_merge_into_another_registry():
+    worker, parent = MetricsRegistry(), MetricsRegistry()
+    for registry in (worker, parent):
+        registry.histogram('fetch_seconds', 'Fetch time.', buckets=(0.1, 1.0))
+        registry.counter('failures_total', 'Failures.')
+    parent.observe('fetch_seconds', 0.5, host='h')
+    worker.observe('fetch_seconds', 0.05, host='h')
+    worker.inc('failures_total', exception='Timeout')
+
+    parent.merge(worker.drain())
+    assert worker.snapshot() == {'fetch_seconds': [], 'failures_total': []}
+    text = parent.render()
+    assert 'fetch_seconds_bucket{host="h",le="0.1"} 1' in text
+    assert 'fetch_seconds_count{host="h"} 2' in text
+    assert 'failures_total{exception="Timeout"} 1.0' in text
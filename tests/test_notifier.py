@@ -0,0 +1,103 @@
+import os
+import socketserver
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.notifier import Notifier, PriceDrop
+from price_tracker.smtp_config import SmtpConfig
+
+
+class SmtpStub(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server recording connections and received messages."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SmtpHandler)
+        self.connections = 0
+        self.messages = []
+        self.fail_next = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        if server.fail_next:
+            server.fail_next -= 1
+            self.reply('421 try again later')
+            return
+        server.connections += 1
+        self.reply('220 stub ESMTP')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 stub')
+            elif command == 'DATA':
+                self.reply('354 go ahead')
+                data = []
+                while True:
+                    chunk = self.rfile.readline().decode()
+                    if chunk in ('.\r\n', ''):
+                        break
+                    data.append(chunk)
+                server.messages.append(''.join(data))
+                self.reply('250 queued')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+def make_notifier(stub, **kwargs):
+    cfg = SmtpConfig(server='127.0.0.1', port=stub.port)
+    return Notifier('me@example.com', lambda: cfg, **kwargs)
+
+
+def test_drops_are_coalesced_into_digests_over_one_connection():
+    stub = SmtpStub()
+    notifier = make_notifier(stub, window=0.2)
+    try:
+        for i in range(5):
+            notifier.notify(PriceDrop(f'p{i}', f'http://e/{i}', 10.0, 9.0))
+        notifier.flush()
+        notifier.notify(PriceDrop('late', 'http://e/late', 5.0, 4.0))
+        notifier.stop()
+    finally:
+        stub.shutdown()
+        stub.server_close()
+
+    assert len(stub.messages) == 2
+    assert 'Subject: Price drops: 5 products' in stub.messages[0]
+    assert 'Subject: Price drop: late' in stub.messages[1]
+    assert stub.connections == 1
+    assert notifier.sent == 6
+
+
+def test_failed_send_is_retried():
+    stub = SmtpStub()
+    stub.fail_next = 2
+    notifier = make_notifier(stub, window=0.0, backoff=0.01)
+    try:
+        notifier.notify(PriceDrop('p', 'http://e/p', 10.0, 9.0))
+        notifier.stop()
+    finally:
+        stub.shutdown()
+        stub.server_close()
+
+    assert len(stub.messages) == 1
+    assert notifier.failed == 0
@@ -0,0 +1,58 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker import sessions
+from price_tracker.page_cache import PageCache
+from price_tracker.shops.generic import GenericShop
+
+
+class MockResponse:
+    def __init__(self, text, status_code=200, headers=None):
+        self.text = text
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+def test_not_modified_returns_cached_price_without_parsing(tmp_path, monkeypatch):
+    sent = []
+
+    def _get(url, headers=None, **kwargs):
+        sent.append(headers or {})
+        if headers and headers.get('If-None-Match') == '"v1"':
+            return MockResponse('', 304)
+        return MockResponse("<span class='price'>29,99 zł</span>",
+                            headers={'ETag': '"v1"'})
+
+    monkeypatch.setattr(sessions, 'get', _get)
+    cache = PageCache(tmp_path / 'cache.json')
+    shop = GenericShop('span.price', cache)
+    assert shop.get_price('http://example.com/a') == 29.99
+    cache.save()
+
+    cache = PageCache(tmp_path / 'cache.json')
+    shop = GenericShop('span.price', cache)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('page parsed on 304')
+
+    monkeypatch.setattr(GenericShop, 'extract_price', fail)
+    assert shop.get_price('http://example.com/a') == 29.99
+    assert sent[-1]['If-None-Match'] == '"v1"'
+    assert cache.stats() == {'hits': 1, 'misses': 0, 'entries': 1}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PageCache(max_entries=2)
+    cache.store('a', 's', 1.0, '"a"', None)
+    cache.store('b', 's', 2.0, '"b"', None)
+    cache.lookup('a', 's')
+    cache.store('c', 's', 3.0, '"c"', None)
+    assert cache.lookup('b', 's') is None
+    assert cache.lookup('a', 's').price == 1.0
+    assert len(cache) == 2
@@ -0,0 +1,54 @@
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from price_tracker.pricing import (NumberFormat, Price, PriceParser,
+                                   _parse_fast, infer_format, parse_prices)
+from price_tracker.shops.generic import GenericShop
+
+
+def test_parse_prices_captures_currency_and_skips_invalid():
+    assert parse_prices(['29,99 zł', '€12.50', 'n/a', '1 234,56 PLN']) == [
+        Price(29.99, 'PLN'), Price(12.5, 'EUR'), None, Price(1234.56, 'PLN')]
+
+
+def test_locale_hint_fixes_ambiguous_separator():
+    assert parse_prices(['1,234'], 'en_US') == [Price(1234.0)]
+    assert parse_prices(['1.234'], 'pl_PL') == [Price(1234.0)]
+    assert parse_prices(['1,234'], NumberFormat(',', 'PLN')) == [
+        Price(1.234, 'PLN')]
+
+
+def test_parser_learns_shop_format():
+    parser = PriceParser()
+    assert parser.parse('1,234').value == 1.234  # ambiguous, nothing learned
+    assert parser.format is None
+    assert parser.parse('12.50 $') == Price(12.5, 'USD')
+    assert parser.format == NumberFormat('.', 'USD')
+    # read with the learned format, including the default currency
+    assert parser.parse('1,234') == Price(1234.0, 'USD')
+    # texts that do not fit the format still parse
+    assert parser.parse('1.234,56 zł') == Price(1234.56, 'PLN')
+
+
+def test_repeated_texts_are_memoized():
+    parser = PriceParser(NumberFormat(','))
+    parser.parse('99,90 zł')
+    hits = _parse_fast.cache_info().hits
+    parser.parse('99,90 zł')
+    assert _parse_fast.cache_info().hits == hits + 1
+
+
+def test_infer_format():
+    assert infer_format('1 234,56 zł') == NumberFormat(',', 'PLN')
+    assert infer_format('1.234.567') == NumberFormat(',')
+    assert infer_format('1,234') is None
+    assert infer_format('100') is None
+
+
+def test_generic_shop_keeps_learned_format_when_pickled():
+    shop = GenericShop('span.price')
+    shop.extract_price("<span class='price'>12,99 zł</span>")
+    clone = pickle.loads(pickle.dumps(shop))
+    assert clone.prices.format == NumberFormat(',', 'PLN')
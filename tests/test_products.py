@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.products import Product, ProductStore
+from price_tracker.shop_store import ShopDef, ShopStore
+
+
+def make_product(i):
+    return Product(name=f'p{i}', url=f'http://a.example/{i}', shop='shop',
+                   price_history=[10.0], last_price=10.0)
+
+
+def test_writers_are_serialized_and_snapshots_stay_fixed(tmp_path):
+    path = tmp_path / 'products.json'
+    store = ProductStore(path)
+    for i in range(50):
+        store.add(make_product(i))
+    before = store.snapshot()
+    errors = []
+
+    def sweep():
+        try:
+            with store.batch():
+                for _ in range(20):
+                    for product in store.products:
+                        store.update_price(product, 9.0)
+        except Exception as exc:
+            errors.append(exc)
+
+    def add(start):
+        try:
+            for i in range(start, start + 50):
+                store.add(make_product(i))
+                store.snapshot().find_by_url(f'http://a.example/{i}')
+            store.remove(f'http://a.example/{start}')
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=sweep)] + [
+        threading.Thread(target=add, args=(n,)) for n in (100, 200, 300)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(before) == 50
+    assert len(store.snapshot()) == 50 + 3 * 49
+    saved = json.loads(path.read_text())['products']
+    assert len(saved) == 50 + 3 * 49
+    assert all(p['last_price'] == 9.0 for p in saved[:50])
+
+
+def test_batch_changes_are_published_when_it_ends(tmp_path):
+    store = ProductStore(tmp_path / 'products.json')
+    with store.batch():
+        store.add(make_product(1))
+        assert len(store.snapshot()) == 0
+        assert len(store.products) == 1
+    assert store.snapshot().find_by_url('http://a.example/1').name == 'p1'
+
+
+def test_shop_store_replaces_its_dictionary(tmp_path):
+    store = ShopStore(tmp_path / 'shops.json')
+    store.add(ShopDef('a', 'span.price'))
+    shops = store.shops
+    store.rename('a', 'b')
+    store.add(ShopDef('c', 'div.price', 60))
+    assert list(shops) == ['a']
+    assert list(store.shops) == ['b', 'c']
+    assert ShopStore(tmp_path / 'shops.json').shops == store.shops
@@ -0,0 +1,55 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.products import Product
+from price_tracker.scheduler import Scheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(**kwargs):
+    clock = Clock()
+    intervals = {'fast': 60, 'slow': 3600}
+    scheduler = Scheduler(lambda p: intervals[p.shop], clock=clock,
+                          rng=random.Random(1), **kwargs)
+    return scheduler, clock
+
+
+def test_products_are_checked_at_their_own_interval():
+    scheduler, clock = make_scheduler(jitter=0.0)
+    fast = Product(name='f', url='http://a/f', shop='fast')
+    slow = Product(name='s', url='http://b/s', shop='slow')
+    scheduler.sync([fast, slow])
+
+    checks = []
+    while clock.now <= 600:
+        due = scheduler.pop_due()
+        checks.extend(p.name for p in due)
+        scheduler.reschedule(due)
+        clock.now += 1
+    assert checks.count('s') == 1
+    assert checks.count('f') == 11
+
+
+def test_host_delay_spreads_requests_and_sync_drops_removed():
+    scheduler, clock = make_scheduler(jitter=0.0, host_delay=5)
+    products = [Product(name=str(i), url=f'http://a/{i}', shop='slow')
+                for i in range(3)]
+    scheduler.sync(products)
+    assert [p.name for p in scheduler.pop_due()] == ['0']
+    clock.now = 5
+    assert [p.name for p in scheduler.pop_due()] == ['1']
+
+    scheduler.sync(products[:1])
+    clock.now = 10
+    assert scheduler.pop_due() == []
+    assert len(scheduler) == 1
@@ -0,0 +1,41 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.sessions import HttpConfig, SessionPool
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    peers = set()
+
+    def do_GET(self):
+        Handler.peers.add(self.client_address)
+        body = b"<span class='price'>10,00 zl</span>"
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_requests_to_one_host_reuse_connection():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pool = SessionPool(HttpConfig(pool_maxsize=2))
+    try:
+        base = f'http://127.0.0.1:{server.server_port}'
+        for i in range(20):
+            resp = pool.get(f'{base}/product/{i}')
+            assert resp.status_code == 200
+        assert len(Handler.peers) == 1
+        assert 'gzip' in resp.request.headers['Accept-Encoding']
+    finally:
+        pool.close()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,93 @@
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.products import Product
+from price_tracker.sqlite_store import (SCHEMA, SqliteProductStore,
+                                        migrate_json)
+from price_tracker.stats import PriceStats
+
+
+def test_batch_writes_one_row_per_observation(tmp_path):
+    store = SqliteProductStore(tmp_path / 'products.db')
+    for i in range(3):
+        store.add(Product(name=f'p{i}', url=f'http://e/{i}', shop='s',
+                          price_history=[10.0], last_price=10.0))
+    with store.batch():
+        for product in store.products:
+            store.update_price(product, 9.0)
+        assert store._conn.execute(
+            'SELECT COUNT(*) FROM observations').fetchone()[0] == 3
+    store.remove('http://e/1')
+    store.close()
+
+    store = SqliteProductStore(tmp_path / 'products.db')
+    assert [p.url for p in store.products] == ['http://e/0', 'http://e/2']
+    assert store.products[0].price_history == [10.0, 9.0]
+    assert store.products[0].last_price == 9.0
+    assert store._conn.execute(
+        'SELECT COUNT(*) FROM observations').fetchone()[0] == 4
+
+
+def test_migrate_json(tmp_path):
+    src = tmp_path / 'products.json'
+    src.write_text(json.dumps({'products': [
+        {'name': 'A', 'url': 'http://e/a', 'shop': 'shopa',
+         'price_history': [5.0, 4.0], 'last_price': 4.0},
+    ]}))
+    assert migrate_json(src, tmp_path / 'products.db') == 1
+    assert migrate_json(src, tmp_path / 'products.db') == 0
+    store = SqliteProductStore(tmp_path / 'products.db')
+    assert store.products == [Product(name='A', url='http://e/a', shop='shopa',
+                                      price_history=[5.0, 4.0],
+                                      last_price=4.0,
+                                      stats=PriceStats.from_history(
+                                          [5.0, 4.0]))]
+
+
+def test_products_sharing_a_url_keep_their_own_rows(tmp_path):
+    store = SqliteProductStore(tmp_path / 'products.db')
+    for name, selector, price in (('a', 'span.a', 10.0), ('b', 'span.b', 20.0)):
+        store.add(Product(name=name, url='http://e/x', shop='s',
+                          selector=selector, price_history=[price],
+                          last_price=price))
+    store.update_price(store.products[1], 5.0)
+    store.save()
+    store.close()
+
+    store = SqliteProductStore(tmp_path / 'products.db')
+    assert [(p.name, p.selector, list(p.price_history), p.last_price)
+            for p in store.products] == [('a', 'span.a', [10.0], 10.0),
+                                         ('b', 'span.b', [20.0, 5.0], 5.0)]
+    store.close()
+
+    src = tmp_path / 'products.json'
+    src.write_text(json.dumps({'products': [
+        {'name': 'a', 'url': 'http://e/x', 'shop': 's', 'selector': 'span.a',
+         'price_history': [1.0], 'last_price': 1.0},
+        {'name': 'b', 'url': 'http://e/x', 'shop': 's', 'selector': 'span.b',
+         'price_history': [2.0], 'last_price': 2.0},
+    ]}))
+    assert migrate_json(src, tmp_path / 'migrated.db') == 2
+    store = SqliteProductStore(tmp_path / 'migrated.db')
+    assert [list(p.price_history) for p in store.products] == [[1.0], [2.0]]
+
+
+def test_unique_url_databases_are_rebuilt(tmp_path):
+    path = tmp_path / 'products.db'
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA.replace('url TEXT NOT NULL,',
+                                      'url TEXT NOT NULL UNIQUE,'))
+    conn.execute("INSERT INTO products (url, name, shop) "
+                 "VALUES ('http://e/x', 'a', 's')")
+    conn.execute('INSERT INTO observations VALUES (1, 0, 3.0)')
+    conn.commit()
+    conn.close()
+
+    store = SqliteProductStore(path)
+    store.add(Product(name='b', url='http://e/x', shop='s',
+                      selector='span.b', price_history=[4.0]))
+    assert [list(p.price_history) for p in store.products] == [[3.0], [4.0]]
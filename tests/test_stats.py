@@ -0,0 +1,64 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.downsample import history_points, lttb, minmax
+from price_tracker.history import PriceHistory
+from price_tracker.products import Product, ProductStore
+from price_tracker.stats import PriceStats
+
+
+def test_stats_are_updated_incrementally():
+    stats = PriceStats()
+    assert stats.add(10.0, 1.0) is False
+    assert stats.add(12.0, 2.0) is False
+    assert stats.add(12.0, 3.0) is False
+    assert stats.add(8.0, 4.0) is True
+    assert (stats.count, stats.low, stats.low_at, stats.high) == (4, 8.0, 4.0,
+                                                                  12.0)
+    assert stats.mean == 10.5
+    assert stats.avg_short == stats.avg_long == 10.5  # spans not filled yet
+    assert (stats.last, stats.last_change) == (8.0, 4.0)
+    assert PriceStats.from_points([(1.0, 10.0), (2.0, 12.0), (3.0, 12.0),
+                                   (4.0, 8.0)]) == stats
+
+
+def test_store_keeps_stats_and_backfills_old_products(tmp_path):
+    path = tmp_path / 'products.json'
+    store = ProductStore(path)
+    store.add(Product(name='a', url='http://a', shop='s',
+                      price_history=[5.0, 7.0], last_price=7.0))
+    store.products[0].stats = None  # as saved by older versions
+    store.save()
+
+    store = ProductStore(path)
+    product = store.products[0]
+    assert product.stats is None
+    assert store.update_price(product, 4.0) is True
+    assert store.update_price(product, 6.0) is False
+    assert (product.stats.count, product.stats.low,
+            product.stats.high) == (4, 4.0, 7.0)
+    assert ProductStore(path).products[0].stats == product.stats
+
+
+def test_downsampling_keeps_extremes_and_budget():
+    points = [(float(i), 10.0) for i in range(1000)]
+    points[500] = (500.0, 1.0)
+    for sample in (lttb(points, 50), minmax(points, 50)):
+        assert len(sample) <= 50
+        assert (500.0, 1.0) in sample
+        assert sample == sorted(sample)
+    assert lttb(points, 50)[0] == points[0]
+    assert lttb(points, 50)[-1] == points[-1]
+    assert lttb(points[:10], 50) == points[:10]
+
+
+def test_history_points_select_a_time_range():
+    history = PriceHistory()
+    for ts in range(10):
+        history.append(float(ts), float(ts))
+    assert history_points(history, 3, 5) == (
+        [(3.0, 3.0), (4.0, 4.0), (5.0, 5.0)], 'time')
+    assert history_points([1.0, 2.0, 3.0], 1) == ([(1, 2.0), (2, 3.0)],
+                                                  'index')
@@ -0,0 +1,366 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from price_tracker.metrics import registry
+from price_tracker.products import Product
+from price_tracker.shops.base import ShopModule
+from price_tracker.shops.generic import GenericShop
+from price_tracker.tracker import PriceTracker
+
+
+def make_tracker(tmp_path, **kwargs):
+    return PriceTracker(str(tmp_path / 'products.json'),
+                        shops_path=str(tmp_path / 'shops.json'),
+                        smtp_path=str(tmp_path / 'smtp.json'), **kwargs)
+
+
+def test_concurrent_check_applies_results_in_order(tmp_path, monkeypatch):
+    tracker = make_tracker(tmp_path, workers=4, per_host=1)
+    for i in range(6):
+        tracker.add_product(f'p{i}', f'http://shop{i % 2}.example/{i}',
+                            'shop', 'span.price', 100.0)
+
+    active = {}
+    peak = {}
+    lock = threading.Lock()
+
+    def fake_get_price(self, url):
+        host = url.split('/')[2]
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+        # make early products finish last
+        time.sleep(0.02 * (6 - int(url.rsplit('/', 1)[1])))
+        with lock:
+            active[host] -= 1
+        return 50.0 + int(url.rsplit('/', 1)[1])
+
+    drops = []
+    monkeypatch.setattr(GenericShop, 'get_price', fake_get_price)
+    monkeypatch.setattr(tracker, 'notify_price_drop',
+                        lambda p, old, new, lowest:
+                        drops.append((p.name, lowest)))
+    tracker.check_prices()
+
+    assert drops == [(f'p{i}', True) for i in range(6)]
+    assert [p.last_price for p in tracker.store.products] == [
+        50.0 + i for i in range(6)]
+    assert peak == {'shop0.example': 1, 'shop1.example': 1}
+
+
+def test_rename_shop_updates_product_index(tmp_path):
+    tracker = make_tracker(tmp_path)
+    tracker.add_shop('old', 'span.price')
+    tracker.add_shop('other', 'span.price')
+    tracker.add_product('a', 'http://e/a', 'old', '')
+    tracker.add_product('b', 'http://e/b', 'other', '')
+    tracker.rename_shop('old', 'new', 'span.price')
+
+    assert [p.name for p in tracker.store.products_for_shop('new')] == ['a']
+    assert tracker.store.products_for_shop('old') == []
+    assert tracker.store.find_by_url('http://e/a').shop == 'new'
+
+    tracker.remove_product('http://e/a')
+    assert tracker.store.products_for_shop('new') == []
+    assert [p.name for p in tracker.store.products] == ['b']
+
+
+def test_add_product_rejects_duplicates(tmp_path):
+    tracker = make_tracker(tmp_path)
+    tracker.add_product('a', 'http://e/a', 'shop', 'span.price')
+    with pytest.raises(ValueError):
+        tracker.add_product('a', 'http://e/a', 'shop', 'span.price')
+
+
+def test_extractor_uses_registered_module_and_selector_override(tmp_path):
+    class CustomShop(ShopModule):
+        def get_price(self, url):
+            return 1.0
+
+    tracker = make_tracker(tmp_path)
+    custom = CustomShop()
+    tracker.register_shop('custom', custom)
+    tracker.add_shop('generic', 'span.price')
+    a = Product(name='a', url='http://e/a', shop='custom')
+    b = Product(name='b', url='http://e/b', shop='custom', selector='b.p')
+    c = Product(name='c', url='http://e/c', shop='generic')
+
+    assert tracker.extractor_for(a) is custom
+    override = tracker.extractor_for(b)
+    assert override.selector == 'b.p'
+    assert tracker.extractor_for(b) is override
+    assert tracker.extractor_for(c).selector == 'span.price'
+
+    tracker.update_shop('generic', 'div.price')
+    assert tracker.extractor_for(c).selector == 'div.price'
+    tracker.rename_shop('generic', 'renamed', 'em.price')
+    c.shop = 'renamed'
+    assert tracker.extractor_for(c).selector == 'em.price'
+
+
+def test_check_job_reports_progress_and_is_not_started_twice(tmp_path,
+                                                             monkeypatch):
+    tracker = make_tracker(tmp_path)
+    for i in range(3):
+        tracker.add_product(f'p{i}', f'http://e/{i}', 'shop', 'span.price')
+    release = threading.Event()
+
+    def fake_get_price(self, url):
+        release.wait(5)
+        if url.endswith('/1'):
+            raise ValueError('broken page')
+        return 10.0
+
+    monkeypatch.setattr(GenericShop, 'get_price', fake_get_price)
+    job = tracker.jobs.start()
+    assert tracker.jobs.start() is job
+    release.set()
+    for _ in range(100):
+        if not job.running:
+            break
+        time.sleep(0.05)
+
+    status = tracker.jobs.get(job.id).to_dict()
+    assert status['state'] == 'done'
+    assert (status['done'], status['total'], status['failures']) == (3, 3, 1)
+    assert tracker.jobs.start() is not job
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith('/missing'):
+            self.send_error(404)
+            return
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = f"<span class='price'>{self.path[1:]},50 zł</span>".encode()
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _fetch_count(host, **labels):
+    return sum(item['count'] for item in
+               registry.snapshot()['price_tracker_fetch_seconds']
+               if item['labels'].get('host') == host
+               and labels.items() <= item['labels'].items())
+
+
+def test_process_pool_checks_report_prices_and_errors(tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    tracker = make_tracker(tmp_path, workers=2, processes=2,
+                           cache_path=str(tmp_path / 'cache.json'),
+                           archive_path=str(tmp_path / 'pages'))
+    host = '127.0.0.1'
+    fetched = _fetch_count(host)
+    labeled = _fetch_count(host, shop='shop')
+    try:
+        for i in range(1, 6):
+            tracker.add_product(f'p{i}', f'{base}/{i}', 'shop', 'span.price')
+        tracker.add_product('gone', f'{base}/missing', 'shop', 'span.price')
+        tracker.check_prices()
+        # the workers' metrics, cache entries and pages reach the parent
+        assert _fetch_count(host) - fetched == 6
+        # labeled with the shop as in thread mode
+        assert _fetch_count(host, shop='shop') - labeled == 6
+        assert tracker.archive.stats()['pages'] == 5
+        assert tracker.page_cache.stats() == {'hits': 0, 'misses': 5,
+                                              'entries': 5}
+        tracker.check_prices()
+        assert tracker.page_cache.stats()['hits'] == 5
+    finally:
+        tracker.close()
+        server.shutdown()
+        server.server_close()
+
+    prices = {p.name: p.last_price for p in tracker.store.products}
+    assert prices == {'p1': 1.5, 'p2': 2.5, 'p3': 3.5, 'p4': 4.5, 'p5': 5.5,
+                      'gone': 0.0}
+
+
+def test_store_is_loaded_on_first_use(tmp_path):
+    make_tracker(tmp_path).add_product('p', 'http://a.example/1', 'shop', '')
+    tracker = make_tracker(tmp_path)
+    assert not tracker.store_loaded
+    assert [p.name for p in tracker.store.products] == ['p']
+    assert tracker.store_loaded
+
+
+class CategoryPage:
+    status_code = 200
+    headers = {}
+    text = ("<ul><li id='a'>10,00 zł</li><li id='b'>20,00 zł</li>"
+            "<li id='c'>30,00 zł</li></ul>")
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_products_sharing_a_page_fetch_it_once(tmp_path, monkeypatch,
+                                               workers):
+    from price_tracker import sessions
+    tracker = make_tracker(tmp_path, workers=workers)
+    for name in 'abc':
+        tracker.add_product(name, 'http://shop.example/category', 'shop',
+                            f'li#{name}', 100.0)
+    tracker.add_product('other', 'http://shop.example/other', 'shop',
+                        'li#a', 100.0)
+    # a duplicate saved by an older version uses the same extractor, which
+    # still fetches its page once
+    tracker.store.add(Product(name='copy', url='http://shop.example/other',
+                              shop='shop', selector='li#a',
+                              last_price=100.0))
+    fetched = []
+
+    def fake_get(url, **kwargs):
+        fetched.append(url)
+        return CategoryPage()
+
+    monkeypatch.setattr(sessions, 'get', fake_get)
+    tracker.check_prices()
+
+    assert sorted(fetched) == ['http://shop.example/category',
+                               'http://shop.example/other']
+    assert [p.last_price for p in tracker.store.products] == [
+        10.0, 20.0, 30.0, 10.0, 10.0]
+
+
+@pytest.mark.parametrize('store', ['products.json', 'products.db'])
+def test_products_sharing_a_page_keep_their_own_history(tmp_path,
+                                                        monkeypatch, store):
+    from price_tracker import sessions
+
+    def open_tracker():
+        return PriceTracker(str(tmp_path / store),
+                            shops_path=str(tmp_path / 'shops.json'),
+                            smtp_path=str(tmp_path / 'smtp.json'),
+                            history_path=str(tmp_path / 'history'))
+
+    tracker = open_tracker()
+    for name in 'ab':
+        tracker.add_product(name, 'http://shop.example/category', 'shop',
+                            f'li#{name}', 100.0)
+    monkeypatch.setattr(sessions, 'get', lambda url, **kwargs: CategoryPage())
+    tracker.check_prices()
+    tracker.store.save()
+
+    products = open_tracker().store.products
+    assert [(p.name, list(p.price_history)) for p in products] == [
+        ('a', [100.0, 10.0]), ('b', [100.0, 20.0])]
+
+    # removing the second product leaves the first one in place
+    tracker = open_tracker()
+    tracker.remove_product('http://shop.example/category', 'li#b')
+    products = open_tracker().store.products
+    assert [(p.name, list(p.price_history)) for p in products] == [
+        ('a', [100.0, 10.0])]
+
+
+def test_failing_host_is_skipped_then_probed(tmp_path, monkeypatch):
+    import requests
+    from price_tracker import sessions
+    now = [0.0]
+    tracker = make_tracker(tmp_path, max_failures=3, failure_cooldown=60)
+    tracker.breaker.clock = lambda: now[0]
+    for i in range(10):
+        tracker.add_product(f'dead{i}', f'http://dead.example/{i}', 'shop',
+                            'li#a', 100.0)
+    tracker.add_product('ok', 'http://ok.example/1', 'shop', 'li#a', 100.0)
+    fetched = []
+    dead = [True]
+
+    def fake_get(url, **kwargs):
+        fetched.append(url)
+        if 'dead' in url and dead[0]:
+            raise requests.ConnectionError('connection refused')
+        return CategoryPage()
+
+    monkeypatch.setattr(sessions, 'get', fake_get)
+    tracker.check_prices()
+    assert len([u for u in fetched if 'dead' in u]) == 3
+    assert tracker.store.products[-1].last_price == 10.0
+    assert tracker.host_states()['dead.example']['state'] == 'open'
+
+    fetched.clear()
+    now[0] = 61
+    tracker.check_prices()
+    assert len([u for u in fetched if 'dead' in u]) == 1
+    assert tracker.host_states()['dead.example']['state'] == 'open'
+
+    fetched.clear()
+    now[0] = 122
+    dead[0] = False
+    tracker.check_prices()
+    assert len([u for u in fetched if 'dead' in u]) == 10
+    assert tracker.host_states() == {}
+
+
+def test_run_waits_between_rounds_and_backs_off_failures(tmp_path,
+                                                         monkeypatch):
+    class Stop(BaseException):
+        pass
+
+    tracker = make_tracker(tmp_path)
+    results = [RuntimeError('down')] * 3 + [0.0, 0.0, Stop()]
+
+    def run_once():
+        result = results.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    sleeps = []
+    monkeypatch.setattr(tracker, 'run_once', run_once)
+    monkeypatch.setattr('price_tracker.tracker.time.sleep', sleeps.append)
+    with pytest.raises(Stop):
+        tracker.run()
+    assert sleeps == [0.1, 0.2, 0.4, 0.05, 0.05]
+
+
+def test_changing_the_recipient_stops_the_old_notifier(tmp_path,
+                                                       monkeypatch):
+    sent = []
+    release = threading.Event()
+
+    def deliver(self, batch):
+        # a slow SMTP server
+        release.wait(5)
+        sent.append((self.recipient, [d.name for d in batch]))
+
+    monkeypatch.setattr('price_tracker.notifier.Notifier._deliver', deliver)
+    tracker = make_tracker(tmp_path, email='a@example.com',
+                           notify_window=0.05)
+    product = Product(name='p', url='http://e/p', shop='s')
+    tracker.notify_price_drop(product, 10.0, 9.0)
+    old = tracker.notifier
+    old_thread = old._thread
+    tracker.email = 'b@example.com'
+    started = time.monotonic()
+    tracker.notify_price_drop(product, 9.0, 8.0)
+    assert time.monotonic() - started < 1
+    assert old._thread is None and sent == []
+    release.set()
+    old_thread.join(5)
+    assert sent == [('a@example.com', ['p'])]
+    tracker.notifier.stop()
+    assert sent[-1] == ('b@example.com', ['p'])
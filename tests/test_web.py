@@ -0,0 +1,131 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import web
+
+
+def test_create_app_defers_tracker_and_paginates(tmp_path):
+    (tmp_path / 'products.json').write_text(json.dumps({'products': [
+        {'name': 'seed', 'url': 'http://a.example/seed', 'shop': 'shop'}]}))
+    app = web.create_app(str(tmp_path / 'products.json'),
+                         str(tmp_path / 'shops.json'),
+                         str(tmp_path / 'smtp.json'), background=False)
+    handle = app.extensions['price_tracker']
+    assert handle._tracker is None
+
+    client = app.test_client()
+    # without a background thread the first request loads the store
+    page = client.get('/').data
+    assert b'Loading products' not in page
+    assert b'<strong>seed</strong>' in page
+    tracker = handle.get()
+    assert tracker.store_loaded
+    for i in range(web.PAGE_SIZE + 1):
+        tracker.add_product(f'p{i}', f'http://a.example/{i}', 'shop', '')
+
+    page = client.get('/?page=2').data
+    assert b'Page 2 of 2' in page
+    assert b'<strong>p100</strong>' in page
+    assert b'<strong>p0</strong>' not in page
+    assert not handle.started
+    # the change log is opt-in
+    assert tracker.changes is None
+
+
+def test_history_endpoint_returns_downsampled_points(tmp_path):
+    app = web.create_app(str(tmp_path / 'products.json'),
+                         str(tmp_path / 'shops.json'),
+                         str(tmp_path / 'smtp.json'), background=False,
+                         history_path=str(tmp_path / 'history'))
+    tracker = app.extensions['price_tracker'].get()
+    tracker.add_product('p', 'http://a.example/1', 'shop', '', 100.0)
+    product = tracker.store.products[0]
+    for i in range(200):
+        tracker.store.update_price(product, 100.0 - i % 7)
+
+    client = app.test_client()
+    data = client.get('/history?url=http://a.example/1&points=20').get_json()
+    assert (data['x'], data['method'], data['total']) == ('time', 'lttb', 201)
+    assert len(data['points']) == 20
+    assert data['stats']['low'] == 94.0
+    assert client.get('/history?url=http://missing').status_code == 404
+
+    # statistics missing from old stores are computed, not stored, by reads
+    product.stats = None
+    data = client.get('/history?url=http://a.example/1').get_json()
+    assert data['stats']['low'] == 94.0
+    assert product.stats is None
+
+    # another product on the same page is chosen by its selector
+    tracker.add_product('q', 'http://a.example/1', 'shop', 'span.q', 5.0)
+    data = client.get('/history?url=http://a.example/1&selector=span.q'
+                      ).get_json()
+    assert (data['name'], data['total']) == ('q', 1)
+    assert client.get('/history?url=http://a.example/1&selector=span.x'
+                      ).status_code == 404
+
+
+def test_change_feed_streams_price_changes(tmp_path):
+    app = web.create_app(str(tmp_path / 'products.json'),
+                         str(tmp_path / 'shops.json'),
+                         str(tmp_path / 'smtp.json'), background=False,
+                         changes_path=str(tmp_path / 'changes.jsonl'))
+    tracker = app.extensions['price_tracker'].get()
+    tracker.add_product('p', 'http://a.example/1', 'shop', '', 100.0)
+    product = tracker.store.products[0]
+    tracker.store.update_price(product, 90.0)
+    tracker.store.update_price(product, 80.0)
+    assert (tmp_path / 'changes.jsonl').exists()
+
+    client = app.test_client()
+    data = client.get('/changes').get_json()
+    assert [e['new'] for e in data['events']] == [90.0, 80.0]
+    assert data['offset'] == data['events'][-1]['offset']
+
+    first = data['events'][0]['offset']
+    response = client.get('/changes/stream',
+                          headers={'Last-Event-ID': str(first)},
+                          buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunk = next(response.response).decode()
+    response.close()
+    assert chunk.startswith(f'id: {data["offset"]}\nevent: price\n')
+    assert '"new": 80.0' in chunk
+
+
+def test_add_detects_a_missing_selector_or_rejects_the_product(tmp_path):
+    app = web.create_app(str(tmp_path / 'products.json'),
+                         str(tmp_path / 'shops.json'),
+                         str(tmp_path / 'smtp.json'), background=False)
+    tracker = app.extensions['price_tracker'].get()
+    web.recent_pages.put('http://a.example/1',
+                         "<div><span class='price'>12,50 zł</span></div>")
+    web.recent_pages.put('http://a.example/2', '<p>Sold out</p>')
+    client = app.test_client()
+
+    form = {'name': 'p', 'url': 'http://a.example/1', 'shop': 'new'}
+    assert client.post('/add', data=form).status_code == 302
+    product = tracker.store.products[0]
+    assert (product.selector, product.last_price) == ('span.price', 12.5)
+
+    form = {'name': 'q', 'url': 'http://a.example/2', 'shop': 'new'}
+    assert client.post('/add', data=form).status_code == 400
+    assert len(tracker.store.products) == 1
+
+
+def test_delete_removes_the_chosen_variant(tmp_path):
+    app = web.create_app(str(tmp_path / 'products.json'),
+                         str(tmp_path / 'shops.json'),
+                         str(tmp_path / 'smtp.json'), background=False)
+    tracker = app.extensions['price_tracker'].get()
+    for name, selector in [('Variant A', 'span.a'), ('Variant B', 'span.b')]:
+        tracker.add_product(name, 'http://a.example/1', 'shop', selector)
+    client = app.test_client()
+    assert b'name="selector" value="span.b"' in client.get('/').data
+
+    form = {'url': 'http://a.example/1', 'selector': 'span.b'}
+    assert client.post('/delete', data=form).status_code == 302
+    assert [p.name for p in tracker.store.products] == ['Variant A']
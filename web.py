@@ -1,117 +1,415 @@
-from threading import Thread
-import re
+import io
 import json
-import requests
-from bs4 import BeautifulSoup
-from flask import Flask, request, redirect, url_for, render_template, jsonify
-
-from price_tracker.shops.generic import parse_price, _find_price_in_json
+import math
+from threading import Lock, Thread
+from typing import Callable, Optional
+
+from flask import (Flask, Response, current_app, request, redirect, url_for,
+                   render_template, jsonify)
+from werkzeug.local import LocalProxy
+
+from price_tracker import sessions
+from price_tracker.bulk import FORMATS, format_for, iter_export, read_rows
+from price_tracker.detect import RecentPages, detect_candidates
+from price_tracker.downsample import METHODS, downsample, history_points
+from price_tracker.pricing import parser_for
+from price_tracker.shops.generic import GenericShop
+from price_tracker.stats import PriceStats
 
 from price_tracker.tracker import PriceTracker
 
-app = Flask(__name__)
-tracker = PriceTracker(
-    'products.json',
-    interval=3600,
-    shops_path='shops.json',
-    smtp_path='smtp.json',
-)
-
-# start background price checking
-def start_background_tracker():
-    Thread(target=tracker.run, daemon=True).start()
-
-start_background_tracker()
-
-
-@app.route('/')
+# products listed per page on the index
+PAGE_SIZE = 100
+# seconds between keep-alive comments on an idle change stream
+KEEPALIVE = 15.0
+
+
+class TrackerHandle:
+    """Create the tracker on first use and start its background thread."""
+
+    def __init__(self, factory: Callable[[], PriceTracker],
+                 background: bool = True) -> None:
+        self.factory = factory
+        self.background = background
+        self._tracker: Optional[PriceTracker] = None
+        self._thread: Optional[Thread] = None
+        self._lock = Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def loading(self) -> bool:
+        """Whether the store is left to the background thread to load.
+
+        Without a background thread the store is loaded by the first
+        request reading it.
+        """
+        tracker = self._tracker
+        return self.background and (tracker is None
+                                    or not tracker.store_loaded)
+
+    def get(self) -> PriceTracker:
+        tracker = self._tracker
+        if tracker is None:
+            with self._lock:
+                if self._tracker is None:
+                    self._tracker = self.factory()
+                tracker = self._tracker
+        return tracker
+
+    def start(self) -> None:
+        """Start background price checking (which loads the store)."""
+        if not self.background or self.started:
+            return
+        tracker = self.get()
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=tracker.run, daemon=True)
+                self._thread.start()
+
+
+# the tracker of the app handling the current request
+tracker = LocalProxy(lambda: current_app.extensions['price_tracker'].get())
+
+# pages downloaded by ``detect_selector``, reused when the product is added
+recent_pages = RecentPages()
+
+_routes = []
+
+
+def route(rule: str, **options):
+    """Register a view; ``create_app`` adds all of them to each app."""
+    def decorator(func):
+        _routes.append((rule, func, options))
+        return func
+    return decorator
+
+
+def create_app(store_path: str = 'products.json',
+               shops_path: str = 'shops.json', smtp_path: str = 'smtp.json',
+               background: bool = True, **options) -> Flask:
+    """Return the web app; nothing is loaded until the first request.
+
+    ``options`` are passed to ``PriceTracker``. The tracker is created by
+    the first request that needs it, and the background thread (which
+    loads the product store) starts once the first response has been sent.
+    """
+    options.setdefault('interval', 3600)
+    app = Flask(__name__)
+    for rule, func, route_options in _routes:
+        app.add_url_rule(rule, view_func=func, **route_options)
+    handle = TrackerHandle(
+        lambda: PriceTracker(store_path, shops_path=shops_path,
+                             smtp_path=smtp_path, **options),
+        background)
+    app.extensions['price_tracker'] = handle
+
+    @app.after_request
+    def start_background_tracker(response):
+        if handle.background and not handle.started:
+            response.call_on_close(handle.start)
+        return response
+
+    return app
+
+
+def __getattr__(name):
+    # ``web:app`` keeps working for WSGI servers and existing scripts
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+@route('/')
 def index():
     paused = getattr(tracker, 'paused', False)
     if not hasattr(tracker, 'paused'):
-        app.logger.warning("PriceTracker instance missing 'paused' attribute")
+        current_app.logger.warning(
+            "PriceTracker instance missing 'paused' attribute")
+    # a large store is still loading right after startup; the page reloads
+    loading = current_app.extensions['price_tracker'].loading
+    # reads use a snapshot so they never wait for a running sweep
+    products = () if loading else tracker.snapshot().products
+    pages = max(1, math.ceil(len(products) / PAGE_SIZE))
+    page = min(max(1, request.args.get('page', 1, type=int)), pages)
     return render_template(
         'index.html',
-        products=tracker.store.products,
+        products=products[(page - 1) * PAGE_SIZE:page * PAGE_SIZE],
+        total=len(products),
+        page=page,
+        pages=pages,
+        loading=loading,
         shops=tracker.shops.keys(),
+        hosts=tracker.host_states(),
         paused=paused,
+        job_id=request.args.get('job'),
+        imported=request.args.get('imported'),
     )
 
 
-@app.route('/shops')
+def _interval_arg() -> int:
+    try:
+        return max(0, int(request.form.get('interval') or 0))
+    except ValueError:
+        return 0
+
+
+@route('/shops')
 def list_shops():
     shops = {name: s.selector for name, s in tracker.shop_store.shops.items()}
-    return render_template('shops.html', shops=shops)
+    intervals = {name: s.interval
+                 for name, s in tracker.shop_store.shops.items()}
+    return render_template('shops.html', shops=shops, intervals=intervals)
 
 
-@app.route('/shops/add', methods=['POST'])
+@route('/shops/add', methods=['POST'])
 def add_shop():
-    tracker.add_shop(request.form['name'], request.form['selector'])
+    tracker.add_shop(request.form['name'], request.form['selector'],
+                     _interval_arg())
     return redirect(url_for('list_shops'))
 
 
-@app.route('/shops/edit/<name>')
+@route('/shops/edit/<name>')
 def edit_shop_form(name):
     shop = tracker.shop_store.shops.get(name)
     if not shop:
         return redirect(url_for('list_shops'))
-    return render_template('edit_shop.html', name=name, selector=shop.selector)
+    return render_template('edit_shop.html', name=name, selector=shop.selector,
+                           interval=shop.interval)
 
 
-@app.route('/shops/update/<name>', methods=['POST'])
+@route('/shops/update/<name>', methods=['POST'])
 def update_shop(name):
     new_name = request.form.get('new_name', name)
     selector = request.form['selector']
-    tracker.rename_shop(name, new_name, selector)
+    tracker.rename_shop(name, new_name, selector, _interval_arg())
     return redirect(url_for('list_shops'))
 
 
-@app.route('/shops/delete/<name>', methods=['POST'])
+@route('/shops/reextract/<name>', methods=['POST'])
+def reextract_shop(name):
+    """Try a shop's (or a new) selector on the archived pages."""
+    selector = request.form.get('selector', '').strip() or None
+    try:
+        report = tracker.reextract_shop(name, selector)
+    except ValueError as exc:
+        return render_template('reextract.html', name=name, error=str(exc))
+    if request.args.get('format') == 'json':
+        return jsonify(report.to_dict())
+    return render_template('reextract.html', name=name, report=report)
+
+
+@route('/shops/delete/<name>', methods=['POST'])
 def delete_shop(name):
     tracker.remove_shop(name)
     return redirect(url_for('list_shops'))
 
-@app.route('/add', methods=['POST'])
+def _fetch_page(url: str) -> str:
+    """Return the page at ``url``, downloading it unless fetched lately."""
+    html = recent_pages.get(url)
+    if html is None:
+        resp = sessions.get(url)
+        resp.raise_for_status()
+        html = resp.text
+        recent_pages.put(url, html)
+    return html
+
+
+@route('/add', methods=['POST'])
 def add_product():
+    url = request.form['url']
+    shop = request.form['shop']
+    selector = request.form.get('selector', '').strip()
+    module = tracker.shops.get(shop)
+    if not selector and module is None:
+        # neither the product nor its shop says where the price is
+        try:
+            candidates = detect_candidates(_fetch_page(url), 1)
+        except Exception as exc:
+            return str(exc), 400
+        if not candidates:
+            return 'No price found on the page; enter a selector', 400
+        selector = candidates[0].selector
+
     price_str = request.form.get('price', '')
     try:
-        price_val = parse_price(price_str) if price_str else 0.0
+        price_val = (parser_for(shop).parse(price_str).value
+                     if price_str else 0.0)
     except Exception:
         price_val = 0.0
+    html = recent_pages.get(url)
+    # an empty product selector stands for the shop's one
+    page_selector = selector or getattr(module, 'selector', '')
+    if not price_val and html is not None and page_selector:
+        # the page was just fetched for detection; read the price from it
+        try:
+            price_val = GenericShop(
+                page_selector, prices=parser_for(shop)).extract_price(html)
+        except Exception:
+            price_val = 0.0
 
-    tracker.add_product(
-        request.form['name'],
-        request.form['url'],
-        request.form['shop'],
-        request.form.get('selector', ''),
-        price_val
-    )
+    try:
+        tracker.add_product(request.form['name'], url, shop, selector,
+                            price_val, _interval_arg())
+    except ValueError as exc:
+        current_app.logger.warning('Product not added: %s', exc)
     return redirect(url_for('index'))
 
 
-@app.route('/delete', methods=['POST'])
+@route('/delete', methods=['POST'])
 def delete_product():
-    tracker.remove_product(request.form['url'])
+    tracker.remove_product(request.form['url'],
+                           request.form.get('selector'))
     return redirect(url_for('index'))
 
-@app.route('/check')
-def check_now():
-    tracker.check_prices()
+
+@route('/hosts/reset', methods=['POST'])
+def reset_host():
+    tracker.reset_host(request.form['host'])
     return redirect(url_for('index'))
 
+@route('/import', methods=['POST'])
+def import_products():
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return 'File required', 400
+    fmt = request.form.get('format') or format_for(upload.filename)
+    if fmt not in FORMATS:
+        return f'Unknown format {fmt}', 400
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig',
+                              newline='')
+    report = tracker.import_products(read_rows(stream, fmt))
+    for error in report.errors:
+        current_app.logger.warning('Import: %s', error)
+    return redirect(url_for(
+        'index', imported=f'{report.added} added, {report.duplicates} '
+                          f'duplicates, {report.invalid} invalid'))
+
+
+@route('/export')
+def export_products():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return f'Unknown format {fmt}', 400
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(iter_export(tracker.snapshot().products, fmt),
+                    mimetype=mimetype, headers={
+                        'Content-Disposition':
+                            f'attachment; filename=products.{fmt}'})
+
+
+@route('/check')
+def check_now():
+    job = tracker.jobs.start()
+    return redirect(url_for('index', job=job.id))
+
+
+@route('/jobs/<job_id>')
+def job_status(job_id):
+    job = tracker.jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify(job.to_dict())
+
+
+@route('/history')
+def price_history():
+    url = request.args.get('url')
+    if not url:
+        return 'URL required', 400
+    try:
+        product = tracker.snapshot().find_by_url(
+            url, request.args.get('selector'))
+    except ValueError:
+        return jsonify({'error': 'unknown product'}), 404
+    method = request.args.get('method', 'lttb')
+    if method not in METHODS:
+        return f'Unknown method {method}', 400
+    budget = min(max(request.args.get('points', 500, type=int), 2), 10000)
+    points, x = history_points(product.price_history,
+                               request.args.get('start', type=float),
+                               request.args.get('end', type=float))
+    # products saved before statistics were kept get them on their next
+    # update; a read only computes them
+    stats = product.stats or PriceStats.from_history(product.price_history)
+    return jsonify({
+        'name': product.name,
+        'url': product.url,
+        'stats': stats.to_dict(),
+        'x': x,
+        'method': method,
+        'total': len(points),
+        'points': downsample(points, budget, method),
+    })
+
+
+@route('/changes')
+def changes():
+    """Return price change events after ``offset`` as JSON."""
+    log = tracker.changes
+    if log is None:
+        return 'Change log disabled', 404
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(max(1, request.args.get('limit', 1000, type=int)), 1000)
+    events = log.read(offset, limit)
+    return jsonify(events=[{'offset': o, **event} for o, event in events],
+                   offset=events[-1][0] if events else offset)
+
+
+@route('/changes/stream')
+def change_stream():
+    """Stream price change events as server-sent events.
+
+    Each event's id is its offset; clients resume with ``Last-Event-ID``
+    (sent automatically by ``EventSource``) or ``?offset=``. Without either
+    only new changes are sent.
+    """
+    log = tracker.changes
+    if log is None:
+        return 'Change log disabled', 404
+    start = request.headers.get('Last-Event-ID') or request.args.get('offset')
+    try:
+        offset = max(0, int(start)) if start is not None else log.end
+    except ValueError:
+        return 'Invalid offset', 400
+
+    def stream(offset: int):
+        while True:
+            events = log.read(offset)
+            for offset, event in events:
+                yield (f'id: {offset}\nevent: price\n'
+                       f'data: {json.dumps(event, ensure_ascii=False)}\n\n')
+            if not events and not log.wait(offset, KEEPALIVE):
+                yield ': keep-alive\n\n'
 
-@app.route('/pause')
+    return Response(stream(offset), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache',
+                             'X-Accel-Buffering': 'no'})
+
+
+@route('/metrics')
+def metrics():
+    return Response(tracker.metrics_text(),
+                    mimetype='text/plain; version=0.0.4')
+
+
+@route('/pause')
 def pause():
     tracker.pause()
     return redirect(url_for('index'))
 
 
-@app.route('/resume')
+@route('/resume')
 def resume():
     tracker.resume()
     return redirect(url_for('index'))
 
 
-@app.route('/smtp')
+@route('/smtp')
 def smtp_settings():
     cfg = tracker.smtp_store.config
     return render_template(
@@ -124,7 +422,7 @@ def smtp_settings():
     )
 
 
-@app.route('/smtp', methods=['POST'])
+@route('/smtp', methods=['POST'])
 def update_smtp_settings():
     server = request.form.get('server', 'localhost')
     port = int(request.form.get('port', 25))
@@ -134,7 +432,7 @@ def update_smtp_settings():
     return redirect(url_for('smtp_settings', status='saved'))
 
 
-@app.route('/smtp/test', methods=['POST'])
+@route('/smtp/test', methods=['POST'])
 def send_test_email_route():
     recipient = request.form.get('recipient')
     if not recipient:
@@ -143,78 +441,31 @@ def send_test_email_route():
         tracker.send_test_email(recipient)
         status = 'sent'
     except Exception as exc:
-        app.logger.exception('Failed to send test email: %s', exc)
+        current_app.logger.exception('Failed to send test email: %s', exc)
         status = 'error'
     return redirect(url_for('smtp_settings', status=status))
 
 
-@app.route('/detect_selector')
+@route('/detect_selector')
 def detect_selector():
     url = request.args.get('url')
     if not url:
         return 'URL required', 400
     try:
-        resp = requests.get(url)
-        resp.raise_for_status()
+        html = _fetch_page(url)
     except Exception as exc:
         return str(exc), 400
 
-    soup = BeautifulSoup(resp.text, 'html.parser')
-
-    # First try JSON-LD scripts which often contain the exact price
-    for script in soup.find_all('script', type='application/ld+json'):
-        if not script.string:
-            continue
-        try:
-            data = json.loads(script.string)
-        except Exception:
-            continue
-        val = _find_price_in_json(data)
-        if val is not None:
-            return jsonify({
-                'selector': "script[type='application/ld+json']",
-                'price': parse_price(str(val))
-            })
-
-    pattern = re.compile(r'\d+[\.,]\d+\s*(?:zł|pln|eur|€|usd|\$)?', re.I)
-
-    # Ignore matches located inside <script> or <style> tags
-    element = None
-    price_value = None
-    for el in soup.find_all(string=pattern):
-        if el.parent.name not in ('script', 'style'):
-            try:
-                price_value = parse_price(str(el))
-            except Exception:
-                continue
-            element = el
-            break
-
-    if element is not None:
-        elem = element.parent
-        selector = elem.name
-        if elem.get('id'):
-            selector += f"#{elem.get('id')}"
-        elif elem.get('class'):
-            selector += '.' + '.'.join(elem.get('class'))
-        return jsonify({'selector': selector, 'price': price_value})
-
-    # Fallback to JSON-LD scripts
-    for script in soup.find_all('script', type='application/ld+json'):
-        if not script.string:
-            continue
-        try:
-            data = json.loads(script.string)
-        except Exception:
-            continue
-        val = _find_price_in_json(data)
-        if val is not None:
-            return jsonify({
-                'selector': "script[type='application/ld+json']",
-                'price': parse_price(str(val))
-            })
-
-    return '', 404
+    limit = request.args.get('limit', 5, type=int)
+    candidates = detect_candidates(html, limit)
+    if not candidates:
+        return '', 404
+    best = candidates[0]
+    return jsonify({
+        'selector': best.selector,
+        'price': best.price,
+        'candidates': [c.to_dict() for c in candidates],
+    })
 
 if __name__ == '__main__':
-    app.run()
+    create_app().run()